@@ -1,27 +1,123 @@
-import json
+import asyncio
+import logging
 
-from channels.generic.websocket import WebsocketConsumer
 from asgiref.sync import async_to_sync
-from ast import literal_eval
+from channels.consumer import get_handler_name
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer, WebsocketConsumer
+from django.conf import settings
 from core.chess_classes.chess_logic import ChessLogic
-from .models import Board
+from core.chess_classes.chess_bitboard import Position, SQUARES, SQUARE_INDEX
+from core.chess_classes.chess_movegen import legal_targets
+from .engine import athink, move_message, think
+from .game_cache import GAMES
+from .models import Board, diff_grids
+from .protocol import decode, negotiate
+from .throttle import STATS, COALESCE_WINDOW, TokenBucket, is_committed, is_preview
 
-class ChessConsumer(WebsocketConsumer):
-    model = Board()
-    game = ChessLogic()
+logger = logging.getLogger(__name__)
 
-    def connect(self):
-        self.accept()
+# Close code of a socket for a game that doesn't exist, the client doesn't
+# reconnect after it. A refused handshake looks like a network error to it
+GAME_NOT_FOUND = 4404
+
+# A client further behind than this many plies gets a snapshot instead of the deltas
+RESYNC_LIMIT = getattr(settings, 'CHESS_RESYNC_LIMIT', 50)
+
+
+class ChessMoveMixin:
+    """
+    What the chess consumers do with a message, independent of sync or async.
+    handle_message is blocking, it reads and writes the database and runs the engine.
+
+    On ws/chess/<game_id>/ the consumer plays that board and joins the game's
+    group, every played move is sent once to the group for the opponent and
+    the spectators. The board lives in the GAMES cache, moves are validated
+    and played in memory and written behind by GAMES.flush.
+    ws/chess/ plays the last board straight from the database, without a group.
+
+    In a game against the computer every move of the player is answered by
+    the engine, searched in the engine's process pool and sent to the whole group.
+    """
+
+    def setup_game(self):
+        # Per connection, so nothing about a game is shared through class attributes
+        self.model = Board()
+        self.game = ChessLogic()
+
+        self.game_id = self.scope['url_route']['kwargs'].get('game_id')
+        self.group_name = f'chess_{self.game_id}' if self.game_id else None
+
+        # JSON text frames, or msgpack binary frames when the client asks for them
+        self.protocol = negotiate(self.scope.get('subprotocols', []))
+
+        # Everything but played moves is rate limited per connection
+        self.bucket = TokenBucket()
+
+    def admit(self, data: dict) -> bool:
+        """Whether the message is handled, played moves always are"""
+
+        if is_committed(data) or self.bucket.take():
+            STATS['processed'] += 1
+            return True
+
+        STATS['dropped'] += 1
+        return False
+
+    def get_board(self, check: bool = False):
+        """The board of the socket, with check a cached one is up to date with the database"""
+
+        if self.game_id:
+            return GAMES.get(self.game_id, check)
 
-    def close(self, code=None):
-        print(f"Closed connection with code: {code}")
+        return self.model.initialize_board()
 
-    def receive(self, text_data=None):
+    def game_exists(self) -> bool:
+        return self.game_id in GAMES or Board.objects.filter(pk=self.game_id).exists()
 
-        last_obj = self.model.initialize_board()
-        board = literal_eval(last_obj.grid) if type(last_obj.grid) == str else {}
+    def needs_database(self, data: dict) -> bool:
+        """
+        Whether handling the message may query. Played moves and syncs do,
+        everything else about a cached game is answered from the board in memory
+        """
 
-        data = json.loads(text_data)
+        return (
+            not self.game_id
+            or self.game_id not in GAMES
+            or is_committed(data)
+            or data.get('eventType') == 'sync'
+        )
+
+    def handle_message(self, data: dict):
+        """
+        Validates the move in the decoded message and stores it when it is played
+
+        Returns:
+            (reply, move), the reply for the client, the move info dict or
+            the encoded position bytes, and the delta of the played move
+            to send to the group, None when nothing was played
+        """
+
+        # A move is played on the board as stored, whichever process stored it
+        last_obj = self.get_board(check=is_committed(data))
+
+        # The client asks for the whole position, sent as one binary frame
+        if data.get('eventType') == 'position':
+            return last_obj.to_bytes(), None
+
+        # Picking a piece up gets every cell it can go to in one reply,
+        # the client checks its drops against them without asking again
+        if data.get('eventType') == 'pieceSelected':
+            return self.targets(last_obj, data.get('oldCell')), None
+
+        # A client (re)connecting tells the last move it has seen
+        if data.get('eventType') == 'sync':
+            return self.sync(last_obj, data.get('seq')), None
+
+        grid = last_obj.grid
+        # From the FEN, the grid has no en passant cell or castling rights
+        board = Position.from_fen(last_obj.fen)
+        state = last_obj.get_state()
 
         old_cell = data.get('oldCell')
         new_cell = data.get('newCell')
@@ -30,12 +126,354 @@ class ChessConsumer(WebsocketConsumer):
         castle = data.get('castle')
         promoted_to = data.get('pawnPromotedTo')
 
-        move_info = self.game.handle_move(old_cell, new_cell, piece, board)
-   
-        if event == 'dragend' or event == 'click':
-            if move_info['checkmate']:
-                self.model.create_game(move_info['checkmate'])
+        # Any socket of the game can send moves, the server decides whose they are
+        if not self.may_move(grid, state, old_cell, new_cell, piece):
+            return {**self.game.output, 'processed_cell': new_cell}, None
+
+        move_info = self.game.handle_move(
+            old_cell, new_cell, piece, board, state, promoted_to
+        )
+
+        if event != 'dragend' and event != 'click':
+            return move_info, None
+
+        # Dropping the piece back on its cell plays nothing
+        if not old_cell and not new_cell and not piece or old_cell == new_cell:
+            return move_info, None
+
+        # Nor does a move the rules reject, the client takes it back
+        if not move_info['move_valid']:
+            return move_info, None
+
+        game_over = move_info['checkmate'] or move_info['stalemate']
+
+        # Checkmate and stalemate both end the game, the next one gets a fresh board
+        if game_over:
+            self.model.create_game(True)
+
+        if self.game_id:
+            GAMES.play(
+                self.game_id, old_cell, new_cell, piece, castle, promoted_to, state=state
+            )
+
+            # A finished game is written right away
+            if game_over:
+                GAMES.flush(self.game_id)
+        else:
+            self.model.update_board(
+                last_obj, old_cell, new_cell, piece, castle, promoted_to, state
+            )
+
+        # Every move is numbered by its ply and sent as the cells it changed,
+        # the rook of a castle, a pawn taken en passant and a promotion included
+        move_info['seq'] = last_obj.ply
+
+        move = {
+            'type': 'move',
+            'seq': last_obj.ply,
+            'changes': diff_grids(grid, last_obj.grid),
+            'check': move_info['check'],
+            'checkmate': move_info['checkmate'],
+            'stalemate': move_info['stalemate'],
+            'winner': move_info['winner'],
+        }
+
+        return move_info, move
+
+    def may_move(self, grid: dict, state, old_cell, new_cell, piece) -> bool:
+        """
+        Whether piece stands on old_cell and its side is to move. While a pawn
+        waits on the last rank only the piece chosen for it may come, the pawn's
+        move passed the turn already
+        """
+
+        if not isinstance(piece, str) or len(piece) != 2:
+            return False
+
+        pawn = self.game.handle_promotion_choice(grid)
+
+        if pawn:
+            return new_cell == pawn and grid[pawn][0] == piece[0]
+
+        return grid.get(old_cell) == piece and piece[0] == 'WB'[state.side_to_move]
+
+    def sync(self, last_obj, seq) -> dict:
+        """
+        The moves after seq as deltas, or a snapshot of the board
+        when seq is too far behind or isn't a ply of this game
+        """
+
+        state = last_obj.get_state()
+        reply = {'seq': last_obj.ply, 'checked_king': state.checked_king}
+
+        if (
+            isinstance(seq, int)
+            and 0 <= seq <= last_obj.ply
+            and last_obj.ply - seq <= RESYNC_LIMIT
+        ):
+            # Replaying reads the moves table, the cached moves go there first
+            if self.game_id and seq < last_obj.ply:
+                GAMES.flush(self.game_id)
+
+            return {'type': 'sync', 'deltas': last_obj.deltas(seq), **reply}
+
+        board = {
+            cell: piece for cell, piece in last_obj.grid.items() if piece != 'empty'
+        }
+
+        return {'type': 'snapshot', 'board': board, **reply}
+
+    def targets(self, last_obj, cell) -> dict:
+        square = SQUARE_INDEX.get(cell)
+        targets = []
+
+        if square is not None:
+            position = Position.from_fen(last_obj.fen)
+            targets = [SQUARES[target] for target in legal_targets(position, square)]
+
+        return {'type': 'targets', 'cell': cell, 'targets': targets}
+
+    def bot_position(self) -> str | None:
+        """The FEN for the engine to search when the computer is to move, else None"""
+
+        if not self.game_id:
+            return None
+
+        last_obj = self.get_board()
+
+        return last_obj.fen if last_obj.bot_to_move() else None
+
+    def play_bot_move(self, fen: str, result: dict):
+        """
+        Plays the move the engine found in the position of the FEN
+
+        Returns:
+            the delta of the move for the group, None when nothing was played
+        """
+
+        data = move_message(fen, result)
+
+        # The position changed while the engine was searching it
+        if data is None or self.get_board().fen != fen:
+            return None
+
+        _, move = self.handle_message(data)
+
+        return move
+
+    def group_message(self, move, bot: bool = False) -> dict:
+        """
+        The group event of a played move, the mover already has its reply.
+        Nobody played the computer's moves, every socket gets them
+        """
+
+        sender = None if bot else self.channel_name
+
+        return {'type': 'chess.move', 'move': move, 'sender': sender}
+
+    def frame(self, reply) -> dict:
+        """Keyword arguments of send for the reply, in the protocol of the socket"""
+
+        return self.protocol.encode(reply)
+
+
+class ChessConsumer(ChessMoveMixin, WebsocketConsumer):
+
+    def connect(self):
+        self.setup_game()
+
+        if self.game_id:
+            if not self.game_exists():
+                self.accept(self.protocol.subprotocol)
+                self.close(GAME_NOT_FOUND)
+                return
+
+            async_to_sync(self.channel_layer.group_add)(
+                self.group_name, self.channel_name
+            )
+
+        self.accept(self.protocol.subprotocol)
+
+    def disconnect(self, code):
+        if self.group_name:
+            async_to_sync(self.channel_layer.group_discard)(
+                self.group_name, self.channel_name
+            )
+            GAMES.flush(self.game_id)
+
+        logger.debug('Closed connection with code: %s', code)
+
+    def receive(self, text_data=None, bytes_data=None):
+        data = decode(text_data, bytes_data)
+
+        if not self.admit(data):
+            return
+
+        reply, move = self.handle_message(data)
+
+        self.send(**self.frame(reply))
+
+        if move and self.group_name:
+            async_to_sync(self.channel_layer.group_send)(
+                self.group_name, self.group_message(move)
+            )
+
+            # Without an event loop to flush later on, the move is written through
+            GAMES.flush(self.game_id)
+
+            self.play_bot()
+
+    def play_bot(self):
+        """Answers with the computer's move, the socket waits for the search"""
+
+        fen = self.bot_position()
+
+        if fen is None:
+            return
+
+        move = self.play_bot_move(fen, think(fen))
+
+        if move:
+            async_to_sync(self.channel_layer.group_send)(
+                self.group_name, self.group_message(move, bot=True)
+            )
+            GAMES.flush(self.game_id)
+
+    def chess_move(self, event):
+        if event['sender'] != self.channel_name:
+            self.send(**self.frame(event['move']))
+
+
+class AsyncChessConsumer(ChessMoveMixin, AsyncWebsocketConsumer):
+    """
+    ChessConsumer on the event loop. Every message makes one
+    database_sync_to_async call that does all of its queries and the move
+    validation, so the loop never blocks and a message takes one thread hop.
+    Messages that can't query don't wait for the thread the queries run on.
+    The moves of a game are written in batches, CHESS_FLUSH_DELAY seconds
+    after the first unwritten one and when a socket of the game disconnects.
+    Drag previews are coalesced, CHESS_COALESCE_WINDOW seconds after the first one
+    only the latest preview of every piece is validated.
+    The computer's moves are searched in a task, the socket keeps
+    handling messages while the engine thinks
+    """
+
+    async def dispatch(self, message):
+        # AsyncConsumer.dispatch closes stale connections on the database thread
+        # before every message, so every message would wait for whatever query
+        # runs there. Every query here goes through database_sync_to_async,
+        # which closes them around the query itself
+        handler = getattr(self, get_handler_name(message), None)
+
+        if handler is None:
+            raise ValueError(f'No handler for message type {message["type"]}')
+
+        await handler(message)
+
+    async def connect(self):
+        self.setup_game()
+
+        # The drag previews waiting for the coalescing window, by the cell dragged from
+        self.previews = {}
+        self.preview_task = None
+        self.bot_task = None
+
+        if self.game_id:
+            if not await database_sync_to_async(self.game_exists)():
+                await self.accept(self.protocol.subprotocol)
+                await self.close(GAME_NOT_FOUND)
+                return
+
+            await self.channel_layer.group_add(self.group_name, self.channel_name)
+
+        await self.accept(self.protocol.subprotocol)
+
+    async def disconnect(self, code):
+        for task in (self.preview_task, self.bot_task):
+            if task is not None:
+                task.cancel()
+
+        if self.group_name:
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+            await GAMES.aflush(self.game_id)
+
+        logger.debug('Closed connection with code: %s', code)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        data = decode(text_data, bytes_data)
+
+        if is_preview(data):
+            self.queue_preview(data)
+            return
+
+        # A played move makes the waiting previews of its piece pointless
+        if is_committed(data) and self.previews.pop(data.get('oldCell'), None):
+            STATS['coalesced'] += 1
+
+        if self.admit(data):
+            await self.process(data)
+
+    def queue_preview(self, data: dict) -> None:
+        """
+        Keeps the preview until the end of the coalescing window, a newer preview
+        of the same piece replaces it and only the latest one is validated
+        """
+
+        if data.get('oldCell') in self.previews:
+            STATS['coalesced'] += 1
+
+        self.previews[data.get('oldCell')] = data
+
+        if self.preview_task is None:
+            self.preview_task = asyncio.create_task(self.process_previews())
+
+    async def process_previews(self) -> None:
+        await asyncio.sleep(COALESCE_WINDOW)
+
+        previews, self.previews = self.previews, {}
+        self.preview_task = None
+
+        for data in previews.values():
+            if self.admit(data):
+                await self.process(data)
+
+    async def process(self, data: dict) -> None:
+        # database_sync_to_async runs every query of the process on one thread by
+        # default, only the messages that may query wait for it. Drag previews,
+        # targets and positions of cached games go to the thread pool instead,
+        # the GIL still runs their validation one at a time but never behind a query
+        handle = database_sync_to_async(
+            self.handle_message, thread_sensitive=self.needs_database(data)
+        )
+        reply, move = await handle(data)
+
+        await self.send(**self.frame(reply))
+
+        if move and self.group_name:
+            await self.channel_layer.group_send(
+                self.group_name, self.group_message(move)
+            )
+            GAMES.flush_later(self.game_id)
+
+            if self.bot_task is None or self.bot_task.done():
+                self.bot_task = asyncio.create_task(self.play_bot())
+
+    async def play_bot(self) -> None:
+        fen = await database_sync_to_async(self.bot_position)()
+
+        if fen is None:
+            return
+
+        # The search runs in the engine's process pool, the event loop only awaits it
+        result = await athink(fen)
+        move = await database_sync_to_async(self.play_bot_move)(fen, result)
+
+        if move:
+            await self.channel_layer.group_send(
+                self.group_name, self.group_message(move, bot=True)
+            )
+            GAMES.flush_later(self.game_id)
 
-            self.model.update_board(last_obj, old_cell, new_cell, piece, castle, promoted_to)
-            
-        async_to_sync(self.send(json.dumps(move_info))) # ? Maybe shouldn't do that
\ No newline at end of file
+    async def chess_move(self, event):
+        if event['sender'] != self.channel_name:
+            await self.send(**self.frame(event['move']))
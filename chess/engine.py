@@ -0,0 +1,100 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from core.chess_classes.chess_bitboard import Position, PIECE_LETTERS, SQUARES, CASTLE
+from core.chess_classes.chess_search import parallel_search, search_fen, start_pool
+
+# Processes the bot searches in, every search takes one for its whole budget
+WORKERS = getattr(settings, 'CHESS_ENGINE_WORKERS', 2)
+
+# Processes one move is searched in together, with parallel_search above 1.
+# The pool grows to fit them, and a move takes them all for its budget
+SEARCHERS = getattr(settings, 'CHESS_ENGINE_SEARCHERS', 1)
+
+# The budget of one bot move, the search stops at whichever runs out first
+TIME_LIMIT = getattr(settings, 'CHESS_BOT_TIME', 1.0)
+NODE_LIMIT = getattr(settings, 'CHESS_BOT_NODES', 100000)
+DEPTH_LIMIT = getattr(settings, 'CHESS_BOT_DEPTH', 64)
+
+_pool = None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """The pool of engine processes, started with the first bot move"""
+
+    global _pool
+
+    if _pool is None:
+        _pool = start_pool(max(WORKERS, SEARCHERS))
+
+    return _pool
+
+
+def search_task(fen: str):
+    """The search of the position within the bot budget, ready for the pool"""
+
+    return partial(search_fen, fen, DEPTH_LIMIT, TIME_LIMIT, NODE_LIMIT)
+
+
+def think(fen: str) -> dict:
+    """Searches in the pool and waits for the result, see search_fen"""
+
+    if SEARCHERS > 1:
+        return parallel_search(
+            Position.from_fen(fen),
+            SEARCHERS,
+            DEPTH_LIMIT,
+            TIME_LIMIT,
+            NODE_LIMIT,
+            pool=get_pool(),
+        )
+
+    return get_pool().submit(search_task(fen)).result()
+
+
+async def athink(fen: str) -> dict:
+    """think without blocking the event loop, only this coroutine waits"""
+
+    # parallel_search waits for its workers, it does so in a thread
+    if SEARCHERS > 1:
+        return await asyncio.to_thread(think, fen)
+
+    loop = asyncio.get_running_loop()
+
+    return await loop.run_in_executor(get_pool(), search_task(fen))
+
+
+def move_message(fen: str, result: dict) -> dict | None:
+    """
+    The socket message the client would send to play the engine's move,
+    None when the side to move has no move
+
+    Arguments:
+        fen: string, the position the engine searched
+        result: dict returned by search_fen
+    """
+
+    move = result['move']
+
+    if not move:
+        return None
+
+    from_square = move & 63
+    to_square = move >> 6 & 63
+    promotion = move >> 12 & 7
+
+    piece = Position.from_fen(fen)[SQUARES[from_square]]
+    promoted_to = piece[0] + PIECE_LETTERS[promotion] if promotion else None
+
+    return {
+        # The pawn is validated by its own rules, whatever it becomes
+        'pieceMoved': piece,
+        'oldCell': SQUARES[from_square],
+        'newCell': SQUARES[to_square],
+        'eventType': 'click',
+        'castle': move >> 15 == CASTLE,
+        'pawnPromotedTo': promoted_to,
+    }
+
@@ -0,0 +1,178 @@
+import asyncio
+import atexit
+from collections import OrderedDict
+from threading import RLock
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+from .models import Board
+
+
+class GameCache:
+    """
+    The live boards of the active games, kept in memory and evicted least
+    recently used first. Moves are played on the cached Board and their rows
+    wait in memory until flush writes them, so a move costs no query.
+
+    The cache is per process. When the sockets of a game reach several Daphne
+    processes, a move is only played after get(check=True) read the ply stored
+    in the database, and a flush only writes over the ply it last read or wrote.
+    Moves another process stored first win, the conflicting moves of this one
+    are dropped and its board is loaded again.
+    """
+
+    def __init__(self, size: int = 256, flush_delay: float = 1.0):
+        self.size = size
+        self.flush_delay = flush_delay
+        self.games = OrderedDict()
+        # Unsaved Move and Checkpoint rows of every game, in the order played
+        self.pending = {}
+        # The scheduled flush of every game, see flush_later
+        self.flushes = {}
+        # The ply of every game in the database when this process last read or wrote it
+        self.stored = {}
+        self.lock = RLock()
+
+    def __contains__(self, game_id) -> bool:
+        return int(game_id) in self.games
+
+    def __len__(self) -> int:
+        return len(self.games)
+
+    def get(self, game_id, check: bool = False) -> Board:
+        """
+        The cached board of the game, loaded and set up when it isn't cached.
+        With check, a board that another process stored moves of since is
+        loaded again, which costs a query reading the ply
+        """
+
+        game_id = int(game_id)
+        stored = ply = self.stored.get(game_id)
+
+        # Read without the lock, the sockets of the other games don't wait for it
+        if check and stored is not None:
+            ply = Board.objects.filter(pk=game_id).values_list("ply", flat=True).first()
+
+        with self.lock:
+            board = self.games.get(game_id)
+
+            # After a flush of this process since the read, the board is current
+            if board is not None and self.stored.get(game_id) == stored != ply:
+                self.discard(game_id)
+                board = None
+
+            if board is not None:
+                self.games.move_to_end(game_id)
+                return board
+
+            board = Board().initialize_board(Board.objects.get(pk=game_id))
+
+            self.games[game_id] = board
+            self.pending[game_id] = []
+            self.stored[game_id] = board.ply
+
+            while len(self.games) > self.size:
+                self.evict(next(iter(self.games)))
+
+            return board
+
+    def play(self, game_id, *move, state=None) -> Board:
+        """Board.play on the cached board, the rows are written by the next flush"""
+
+        with self.lock:
+            board = self.get(game_id)
+            self.pending[int(game_id)] += board.play(*move, state=state)
+
+            return board
+
+    def flush(self, game_id=None) -> int:
+        """
+        Writes the moves played since the last flush, of one game or every game
+
+        Returns:
+            int, the number of rows written
+        """
+
+        with self.lock:
+            if game_id is None:
+                return sum(self.flush(game_id) for game_id in list(self.games))
+
+            game_id = int(game_id)
+            rows = self.pending.get(game_id)
+
+            if not rows:
+                return 0
+
+            board = self.games[game_id]
+
+            # Every move since the last flush goes in one transaction
+            if not board.save_moves(rows, self.stored[game_id]):
+                self.discard(game_id)
+                return 0
+
+            self.pending[game_id] = []
+            self.stored[game_id] = board.ply
+
+            return len(rows)
+
+    def flush_later(self, game_id) -> None:
+        """
+        Schedules a flush of the game flush_delay seconds from now, on the running
+        event loop. Moves played until then are written with it in one batch
+        """
+
+        game_id = int(game_id)
+
+        if game_id not in self.flushes:
+            self.flushes[game_id] = asyncio.create_task(self._flush_after(game_id))
+
+    async def _flush_after(self, game_id: int) -> None:
+        try:
+            await asyncio.sleep(self.flush_delay)
+        finally:
+            self.flushes.pop(game_id, None)
+
+        await database_sync_to_async(self.flush)(game_id)
+
+    async def aflush(self, game_id) -> None:
+        """Flushes the game now, in place of its scheduled flush"""
+
+        task = self.flushes.pop(int(game_id), None)
+
+        if task is not None:
+            task.cancel()
+
+        await database_sync_to_async(self.flush)(game_id)
+
+    def evict(self, game_id) -> None:
+        """Flushes the game and drops it from memory"""
+
+        with self.lock:
+            self.flush(game_id)
+            self.discard(game_id)
+
+    def discard(self, game_id) -> None:
+        """Drops the game without writing its pending moves, after a reset"""
+
+        with self.lock:
+            self.games.pop(int(game_id), None)
+            self.pending.pop(int(game_id), None)
+            self.stored.pop(int(game_id), None)
+
+    def clear(self) -> None:
+        """Drops every game without writing anything"""
+
+        with self.lock:
+            self.games.clear()
+            self.pending.clear()
+            self.stored.clear()
+
+
+GAMES = GameCache(
+    getattr(settings, "CHESS_GAME_CACHE_SIZE", 256),
+    getattr(settings, "CHESS_FLUSH_DELAY", 1.0),
+)
+
+# Whatever is still pending when the process stops
+atexit.register(GAMES.flush)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.chess_classes.chess_bench import SUITES
+
+
+class Command(BaseCommand):
+    help = "Times the hot paths of the chess engine in microseconds per call"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "suites", nargs="*", help=f"any of {', '.join(SUITES)}, all by default"
+        )
+        parser.add_argument("--number", type=int, default=200)
+
+    def handle(self, *args, **options):
+        suites = options["suites"] or list(SUITES)
+        unknown = [suite for suite in suites if suite not in SUITES]
+
+        if unknown:
+            raise CommandError(f"Unknown suite: {', '.join(unknown)}")
+
+        for suite in suites:
+            for label, seconds in SUITES[suite](options["number"]):
+                self.stdout.write(f"{suite} {label}: {seconds * 1e6:.1f} us")
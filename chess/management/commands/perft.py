@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from core.chess_classes.chess_bitboard import Position, START_FEN
+from core.chess_classes.chess_movegen import run_perft
+
+
+class Command(BaseCommand):
+    help = "Counts the legal move tree of a position and reports nodes per second"
+
+    def add_arguments(self, parser):
+        parser.add_argument("depth", type=int)
+        parser.add_argument("--fen", default=START_FEN)
+        parser.add_argument(
+            "--hash",
+            action="store_true",
+            help="count transpositions once, keyed by the Zobrist key",
+        )
+
+    def handle(self, *args, **options):
+        position = Position.from_fen(options["fen"])
+        cache = {} if options["hash"] else None
+
+        for depth in range(1, options["depth"] + 1):
+            report = run_perft(position, depth, cache)
+
+            self.stdout.write(
+                f"depth {report['depth']}: {report['nodes']} nodes "
+                f"in {report['seconds']:.3f}s ({report['nps']} nps)"
+            )
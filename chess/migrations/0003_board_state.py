@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chess', '0002_alter_board_grid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='board',
+            name='state',
+            field=models.JSONField(default=dict),
+        ),
+    ]
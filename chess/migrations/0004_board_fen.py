@@ -0,0 +1,173 @@
+from ast import literal_eval
+
+from django.db import migrations, models
+
+# The FEN conversion is copied here as it was when the fen column was added,
+# so the migration keeps working whatever happens to core.chess_classes later
+
+BLANK_FEN = "8/8/8/8/8/8/8/8 w KQkq - 0 1"
+
+CHECK_FIELDS = ("checked_king", "check_position")
+
+# What a GameState stored before this migration holds, missing keys included
+DEFAULT_STATE = {
+    "side_to_move": 0,
+    "castling": 15,
+    "en_passant": "",
+    "checked_king": "",
+    "check_position": "",
+    "halfmove_clock": 0,
+    "fullmove_number": 1,
+}
+
+# Cell names in the order FEN lists them, a8 to h8 first and a1 to h1 last
+FEN_ORDER = [col + str(row) for row in range(8, 0, -1) for col in "abcdefgh"]
+
+# FEN uses N for the knight, the grid calls it a horse (H)
+LETTERS = {
+    color + piece: letter if color == "W" else letter.lower()
+    for color in "WB"
+    for piece, letter in zip("PHBRQK", "PNBRQK")
+}
+PIECES = {letter: piece for piece, letter in LETTERS.items()}
+
+# (FEN letter, GameState bit, king cell, rook cell) of every castling right
+CASTLING = (
+    ("K", 1, "e1", "h1"),
+    ("Q", 2, "e1", "a1"),
+    ("k", 4, "e8", "h8"),
+    ("q", 8, "e8", "a8"),
+)
+
+
+def blank_grid() -> dict:
+    return {cell: "empty" for cell in FEN_ORDER}
+
+
+def castling(grid: dict, rights: int) -> str:
+    """
+    The rights of the state that the board still allows, like Position.from_grid
+    a right needs its king and rook on their starting cells
+    """
+
+    fen = ""
+
+    for letter, right, king, rook in CASTLING:
+        color = "W" if letter.isupper() else "B"
+
+        if rights & right and grid[king] == color + "K" and grid[rook] == color + "R":
+            fen += letter
+
+    return fen or "-"
+
+
+def to_fen(grid: dict, state: dict) -> str:
+    ranks = []
+
+    for start in range(0, 64, 8):
+        rank = ""
+        empty = 0
+
+        for cell in FEN_ORDER[start : start + 8]:
+            letter = LETTERS.get(grid[cell])
+
+            if letter is None:
+                empty += 1
+                continue
+
+            if empty:
+                rank += str(empty)
+                empty = 0
+
+            rank += letter
+
+        ranks.append(rank + str(empty) if empty else rank)
+
+    return " ".join(
+        (
+            "/".join(ranks),
+            "w" if state["side_to_move"] == 0 else "b",
+            castling(grid, state["castling"]),
+            state["en_passant"] or "-",
+            str(state["halfmove_clock"]),
+            str(state["fullmove_number"]),
+        )
+    )
+
+
+def parse_fen(fen: str) -> tuple:
+    placement, turn, rights, en_passant, halfmove_clock, fullmove_number = fen.split()
+
+    cells = []
+
+    for char in placement.replace("/", ""):
+        cells += ["empty"] * int(char) if char.isdigit() else [PIECES[char]]
+
+    state = {
+        **DEFAULT_STATE,
+        "side_to_move": 0 if turn == "w" else 1,
+        "castling": sum(right for letter, right, *_ in CASTLING if letter in rights),
+        "en_passant": "" if en_passant == "-" else en_passant,
+        "halfmove_clock": int(halfmove_clock),
+        "fullmove_number": int(fullmove_number),
+    }
+
+    return dict(zip(FEN_ORDER, cells)), state
+
+
+def grid_to_fen(apps, schema_editor):
+    """Turns the dict repr in grid and the GameState in state into the fen column"""
+
+    Board = apps.get_model("chess", "Board")
+
+    for board in Board.objects.all():
+        try:
+            grid = {**blank_grid(), **literal_eval(board.grid)}
+        except (ValueError, SyntaxError):
+            grid = blank_grid()
+
+        state = {**DEFAULT_STATE, **board.state}
+
+        # A board nobody set up yet gets the default of the fen column
+        if all(piece == "empty" for piece in grid.values()):
+            board.fen = BLANK_FEN
+        else:
+            board.fen = to_fen(grid, state)
+
+        board.state = {name: state[name] for name in CHECK_FIELDS}
+        board.save(update_fields=["fen", "state"])
+
+
+def fen_to_grid(apps, schema_editor):
+    Board = apps.get_model("chess", "Board")
+
+    for board in Board.objects.all():
+        grid, state = parse_fen(board.fen)
+
+        for name in CHECK_FIELDS:
+            if name in board.state:
+                state[name] = board.state[name]
+
+        board.grid = str(grid)
+        board.state = state
+        board.save(update_fields=["grid", "state"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chess", "0003_board_state"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="board",
+            name="fen",
+            field=models.CharField(default=BLANK_FEN, max_length=100),
+        ),
+        migrations.RunPython(grid_to_fen, fen_to_grid),
+        migrations.RemoveField(
+            model_name="board",
+            name="grid",
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The default of the fen column, copied so the migration stays frozen
+BLANK_FEN = "8/8/8/8/8/8/8/8 w KQkq - 0 1"
+
+
+def checkpoint_current_positions(apps, schema_editor):
+    """Games in progress have no moves logged, their current position becomes ply 0"""
+
+    Board = apps.get_model("chess", "Board")
+    Checkpoint = apps.get_model("chess", "Checkpoint")
+
+    blank = BLANK_FEN.split(" ", 1)[0]
+
+    Checkpoint.objects.bulk_create(
+        Checkpoint(board=board, ply=0, fen=board.fen)
+        for board in Board.objects.exclude(fen__startswith=blank + " ")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chess', '0004_board_fen'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='board',
+            name='ply',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='Checkpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ply', models.PositiveIntegerField()),
+                ('fen', models.CharField(max_length=100)),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='chess.board')),
+            ],
+            options={
+                'ordering': ['ply'],
+                'constraints': [models.UniqueConstraint(fields=('board', 'ply'), name='unique_checkpoint_ply')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Move',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ply', models.PositiveIntegerField()),
+                ('from_cell', models.CharField(max_length=2)),
+                ('to_cell', models.CharField(max_length=2)),
+                ('piece', models.CharField(max_length=2)),
+                ('promotion', models.CharField(blank=True, default='', max_length=2)),
+                ('castle', models.BooleanField(default=False)),
+                ('board', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='moves', to='chess.board')),
+            ],
+            options={
+                'ordering': ['ply'],
+                'constraints': [models.UniqueConstraint(fields=('board', 'ply'), name='unique_move_ply')],
+            },
+        ),
+        migrations.RunPython(checkpoint_current_positions, migrations.RunPython.noop),
+    ]
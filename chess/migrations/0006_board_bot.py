@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chess', '0005_move_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='board',
+            name='bot',
+            field=models.CharField(blank=True, default='', max_length=5),
+        ),
+    ]
@@ -1,24 +1,164 @@
-from django.db import models
-from ast import literal_eval
+from django.db import models, transaction
+from django.utils import timezone
 from core.generic_models.time_stamp_model import TimeStampedModel
-from core.base_board import base
-from core.chess_classes.chess_pieces import Piece, Pawn, King, Rook
-from core.chess_classes.chess_utils import update_king_move_count, update_rook_move_count
-from core.chess_classes.chess_logic import ChessLogic
+from core.chess_classes.chess_bitboard import (
+    Position,
+    WHITE,
+    BLACK,
+    COLOR_LETTERS,
+    SQUARES,
+    lsb,
+)
+from core.chess_classes.chess_fen import (
+    BLANK_FEN,
+    START_FEN,
+    fen_to_grid,
+    grid_to_placement,
+    parse_fen,
+    to_fen,
+)
+from core.chess_classes.chess_encoding import decode, encode
+from core.chess_classes.chess_state import GameState
+
+# The parts of GameState FEN has no field for, kept in Board.state
+CHECK_FIELDS = ("checked_king", "check_position")
+
+# Every CHECKPOINT_INTERVAL plies the whole position is stored as a Checkpoint,
+# any other position is rebuilt from the checkpoint before it and the moves since
+CHECKPOINT_INTERVAL = 10
+
+LETTERS = ["a", "b", "c", "d", "e", "f", "g", "h"]
+
+
+def apply_move(
+    grid: dict,
+    state: GameState,
+    old_cell: str,
+    new_cell: str,
+    piece: str,
+    castle: bool,
+    promoted_to: str = None,
+) -> None:
+    """Plays the move on the dict grid in place and records it in the state"""
+
+    # The piece chosen for a pawn already on the last rank only replaces it,
+    # the pawn's move was the one that passed the turn
+    if promoted_to and grid[old_cell] == "empty" and grid[new_cell] == piece[0] + "P":
+        grid[new_cell] = promoted_to
+        return
+
+    captured = grid[new_cell] != "empty"
+
+    # The pawn captured en passant stands next to the moved pawn
+    if piece[1] == "P" and new_cell == state.en_passant and old_cell[0] != new_cell[0]:
+        grid[new_cell[0] + old_cell[1]] = "empty"
+        captured = True
+
+    state.record_move(piece, old_cell, new_cell, captured)
+
+    grid[old_cell] = "empty"
+
+    if castle:
+        # Short castle
+        if LETTERS.index(old_cell[0]) < LETTERS.index(new_cell[0]):
+
+            grid["h" + new_cell[1]] = "empty"  # Rook
+            grid["f" + new_cell[1]] = piece[0] + "R"
+
+            grid["g" + new_cell[1]] = piece[0] + "K"
+
+        # Long castle
+        elif LETTERS.index(old_cell[0]) > LETTERS.index(new_cell[0]):
+            grid["a" + new_cell[1]] = "empty"  # Rook
+            grid["d" + new_cell[1]] = piece[0] + "R"
+
+            grid["c" + new_cell[1]] = piece[0] + "K"
+
+    elif promoted_to:
+        grid[new_cell] = promoted_to
+
+    else:
+        grid[new_cell] = piece
+
+
+def find_check(grid: dict, state: GameState) -> None:
+    """Sets the check fields of the state from the position, like handle_check does"""
+
+    position = Position.from_grid(grid)
+
+    for color in (WHITE, BLACK):
+        checkers = position.check_info(color)[0]
+
+        if checkers:
+            state.checked_king = COLOR_LETTERS[color] + "K"
+            state.check_position = SQUARES[lsb(checkers)]
+            return
+
+    state.clear_check()
+
+
+def diff_grids(before: dict, after: dict) -> dict:
+    """The cells that changed between the two grids, with what is on them now"""
+
+    return {cell: piece for cell, piece in after.items() if before[cell] != piece}
 
 
 class Board(TimeStampedModel):
 
-    # Can't just set default to mutable dict, so use a callable
-    grid = models.TextField(default=base)
-    letters = ["a", "b", "c", "d", "e", "f", "g", "h"]
+    # The position with side to move, castling rights, en passant and move clocks
+    fen = models.CharField(max_length=100, default=BLANK_FEN)
+    # The rest of the GameState: the checked king and the cell of the checking piece
+    state = models.JSONField(default=dict)
+    # Number of moves played, the ply of the last Move row
+    ply = models.PositiveIntegerField(default=0)
+    # The side the computer plays, "white" or "black", blank when people play both
+    bot = models.CharField(max_length=5, blank=True, default="")
+    letters = LETTERS
 
     def __str__(self) -> str:
         return f"Chess board: {self.id}"
 
+    @property
+    def grid(self) -> dict:
+        """The position as the dict grid the pieces and the JS client use"""
+
+        return fen_to_grid(self.fen)
+
+    @grid.setter
+    def grid(self, grid: dict) -> None:
+        self.fen = grid_to_placement(grid) + " " + self.fen.split(" ", 1)[1]
+
     def get_object(self):
         return Board.objects.last()
 
+    def get_state(self) -> GameState:
+        _, state = parse_fen(self.fen)
+
+        for name in CHECK_FIELDS:
+            if name in self.state:
+                setattr(state, name, self.state[name])
+
+        return state
+
+    def set_position(self, grid: dict, state: GameState) -> None:
+        self.fen = to_fen(grid, state)
+        self.state = {name: getattr(state, name) for name in CHECK_FIELDS}
+
+    def bot_to_move(self) -> bool:
+        """Whether the computer plays the side to move"""
+
+        return bool(self.bot) and self.fen.split(" ")[1] == self.bot[0]
+
+    def to_bytes(self) -> bytes:
+        """The position in the compact binary form of chess_encoding"""
+
+        return encode(self.grid, self.get_state())
+
+    def load_bytes(self, data: bytes) -> None:
+        """Sets the position from bytes made by to_bytes, save() stores it"""
+
+        self.set_position(*decode(data))
+
     def update_board(
         self,
         last_obj,
@@ -27,117 +167,257 @@ class Board(TimeStampedModel):
         piece: str,
         castle: bool,
         promoted_to: str = None,
+        state: GameState = None,
     ) -> None:
         if not old_cell and not new_cell and not piece or old_cell == new_cell:
             return last_obj
 
-        update_rook_move_count(old_cell, piece)
-        update_king_move_count(piece)
+        if state is None:
+            state = last_obj.get_state()
 
-        Piece.last_moved_piece = (piece, old_cell, new_cell)
-        Pawn.is_en_passant = False
+        rows = last_obj.play(old_cell, new_cell, piece, castle, promoted_to, state)
+        last_obj.save_moves(rows)
 
-        board = literal_eval(last_obj.grid) if type(last_obj.grid) == str else {}
-
-        board[old_cell] = "empty"
+        return last_obj
 
-        # ChessLogic.last_side_to_move = piece[0]
+    def play(
+        self,
+        old_cell: str,
+        new_cell: str,
+        piece: str,
+        castle: bool,
+        promoted_to: str = None,
+        state: GameState = None,
+    ) -> list:
+        """
+        Plays the move on this board in memory, nothing is written
+
+        Returns:
+            list, the unsaved Move and Checkpoint rows of the move for save_moves
+        """
+
+        if state is None:
+            state = self.get_state()
+
+        board = self.grid
+        apply_move(board, state, old_cell, new_cell, piece, castle, promoted_to)
+
+        self.ply += 1
+        self.set_position(board, state)
+
+        # One small row per move instead of the whole board
+        rows = [
+            Move(
+                board=self,
+                ply=self.ply,
+                from_cell=old_cell,
+                to_cell=new_cell,
+                piece=piece,
+                promotion=promoted_to or "",
+                castle=bool(castle),
+            )
+        ]
+
+        if self.ply % CHECKPOINT_INTERVAL == 0:
+            rows.append(Checkpoint(board=self, ply=self.ply, fen=self.fen))
+
+        return rows
+
+    def save_moves(self, rows: list, stored_ply: int = None) -> bool:
+        """
+        Stores the position and the rows of one or more played moves at once.
+        With stored_ply they are only stored while the row still has that ply,
+        nothing is written when another process stored moves of the game since
+
+        Returns:
+            bool, whether the moves were stored
+        """
+
+        with transaction.atomic():
+            if stored_ply is None:
+                self.save(update_fields=["fen", "state", "ply", "modified"])
+
+            elif not Board.objects.filter(pk=self.pk, ply=stored_ply).update(
+                fen=self.fen, state=self.state, ply=self.ply, modified=timezone.now()
+            ):
+                return False
+
+            Move.objects.bulk_create(row for row in rows if isinstance(row, Move))
+            Checkpoint.objects.bulk_create(
+                row for row in rows if isinstance(row, Checkpoint)
+            )
+
+        return True
+
+    def position_at(self, ply: int) -> tuple:
+        """
+        Rebuilds the position after the given number of moves,
+        from the nearest checkpoint and the moves played since
+
+        Returns:
+            (grid, state), the dict grid and the GameState
+        """
+
+        if not 0 <= ply <= self.ply:
+            raise ValueError(f"Board {self.id} has no ply {ply}, only 0 to {self.ply}")
+
+        checkpoint = self.checkpoints.filter(ply__lte=ply).order_by("-ply").first()
+
+        if checkpoint is None:
+            checkpoint = Checkpoint(board=self, ply=0, fen=START_FEN)
+
+        grid, state = parse_fen(checkpoint.fen)
+
+        for move in self.moves.filter(ply__gt=checkpoint.ply, ply__lte=ply):
+            apply_move(
+                grid,
+                state,
+                move.from_cell,
+                move.to_cell,
+                move.piece,
+                move.castle,
+                move.promotion,
+            )
+
+        find_check(grid, state)
+
+        return grid, state
+
+    def deltas(self, since: int) -> list:
+        """
+        The changes of every move played after the given ply, for a client
+        that has seen the game up to it
+
+        Returns:
+            list of {"seq": ply, "changes": {cell: piece}}, oldest first
+        """
 
-        if castle:
-            # Short castle
-            if self.letters.index(old_cell[0]) < self.letters.index(new_cell[0]):
+        if since == self.ply:
+            return []
 
-                board["h" + new_cell[1]] = "empty"  # Rook
-                board["f" + new_cell[1]] = piece[0] + "R"
+        grid, state = self.position_at(since)
+        deltas = []
+
+        for move in self.moves.filter(ply__gt=since):
+            before = grid.copy()
+            apply_move(
+                grid,
+                state,
+                move.from_cell,
+                move.to_cell,
+                move.piece,
+                move.castle,
+                move.promotion,
+            )
+            deltas.append({"seq": move.ply, "changes": diff_grids(before, grid)})
 
-                board["g" + new_cell[1]] = piece[0] + "K"
+        return deltas
 
-            # Long castle
-            elif self.letters.index(old_cell[0]) > self.letters.index(new_cell[0]):
-                board["a" + new_cell[1]] = "empty"  # Rook
-                board["d" + new_cell[1]] = piece[0] + "R"
+    def history(self) -> list:
+        """The moves of the game in the order they were played"""
 
-                board["c" + new_cell[1]] = piece[0] + "K"
-    
-            last_obj.grid = board
-            last_obj.save()
+        return list(self.moves.all())
 
-        elif promoted_to:
-            board[new_cell] = promoted_to
+    def takeback(self, plies: int = 1):
+        """Undoes the last moves, the board goes back to the position before them"""
 
-            last_obj.grid = board
-            last_obj.save()
+        ply = max(self.ply - plies, 0)
+        grid, state = self.position_at(ply)
 
-        else:
-            board[new_cell] = piece
+        with transaction.atomic():
+            self.moves.filter(ply__gt=ply).delete()
+            # The ply 0 checkpoint is the position the game started from
+            self.checkpoints.filter(ply__gt=ply).exclude(ply=0).delete()
 
-            last_obj.grid = board
-            last_obj.save()
+            self.ply = ply
+            self.set_position(grid, state)
+            self.save(update_fields=["fen", "state", "ply", "modified"])
 
-        return last_obj
-    
+        return self
 
-    def create_game(self, is_checkmate) -> None:
-        if is_checkmate:
+    def create_game(self, is_game_over) -> None:
+        if is_game_over:
             Board.objects.create()
 
-    def game_status(self) -> dict:
-        last_obj = Board.objects.last()
-        default = base()
-        current_board = (
-            literal_eval(last_obj.grid) if type(last_obj.grid) == str else {}
-        )
+    def game_status(self, last_obj=None) -> dict:
+        if last_obj is None:
+            last_obj = Board.objects.last()
 
-        if current_board == default:
+        # Only the placement matters, a blank board waits to be set up
+        if last_obj.fen.split(" ", 1)[0] == BLANK_FEN.split(" ", 1)[0]:
             return {"code": "initialize", "last_obj": last_obj}
         return {"code": False, "last_obj": last_obj}
 
-    def initialize_board(self) -> None:
+    def initialize_board(self, last_obj=None) -> None:
+        """Sets up the pieces on a blank board, the last board unless one is given"""
+
         # ? Sometimes this method fires twice when moving piece quickly
-        game_status = self.game_status()
+        game_status = self.game_status(last_obj)
 
         if game_status["code"] == "initialize":
             print("initializing...")
-            board = base()
-
-            initial_positions = {
-                "a1": "WR",
-                "h1": "WR",
-                "b1": "WH",
-                "g1": "WH",
-                "c1": "WB",
-                "f1": "WB",
-                "d1": "WQ",
-                "e1": "WK",
-                "a8": "BR",
-                "h8": "BR",
-                "b8": "BH",
-                "g8": "BH",
-                "c8": "BB",
-                "f8": "BB",
-                "d8": "BQ",
-                "e8": "BK",
-            }
-
-            board.update(initial_positions)
-            board.update({f"{char}2": "WP" for char in "abcdefgh"})  # White pawns
-            board.update({f"{char}7": "BP" for char in "abcdefgh"})  # Black pawns
-
-            # self.grid = board will update the instance's grid not the actual database's grid
-            game_status["last_obj"].grid = board
+
+            # self.fen = START_FEN will update the instance's fen not the actual database's fen
+            game_status["last_obj"].fen = START_FEN
 
             game_status["last_obj"].save()
 
+            Checkpoint.objects.get_or_create(
+                board=game_status["last_obj"], ply=0, defaults={"fen": START_FEN}
+            )
+
         return game_status["last_obj"]
 
     def reset_board(self, last_obj):
-        last_obj.grid = base()
-        King.black_move_count = King.white_move_count = 0
-        Rook.black_left_move_count = Rook.black_right_move_count = 0
-        Rook.white_left_move_count = Rook.white_right_move_count = 0
-        King.last_checked_king = King.enemy_check_position = ""
-        Piece.last_moved_piece = ()
-        Pawn.is_en_passant = False
-        # ChessLogic.last_side_to_move = "B"
-
-        last_obj.save()
+        last_obj.fen = BLANK_FEN
+        last_obj.state = {}
+        last_obj.ply = 0
+
+        with transaction.atomic():
+            last_obj.moves.all().delete()
+            last_obj.checkpoints.all().delete()
+            last_obj.save()
+
+
+class Move(models.Model):
+    """One row per move of a board, appended by Board.update_board"""
+
+    board = models.ForeignKey(Board, on_delete=models.CASCADE, related_name="moves")
+    # 1 for the first move of the game
+    ply = models.PositiveIntegerField()
+    from_cell = models.CharField(max_length=2)
+    to_cell = models.CharField(max_length=2)
+    piece = models.CharField(max_length=2)
+    # The piece the pawn was promoted to, like 'WQ'
+    promotion = models.CharField(max_length=2, blank=True, default="")
+    castle = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ["ply"]
+        constraints = [
+            models.UniqueConstraint(fields=["board", "ply"], name="unique_move_ply")
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.ply}. {self.piece} {self.from_cell}{self.to_cell}"
+
+
+class Checkpoint(models.Model):
+    """The whole position of a board after the ply, stored every CHECKPOINT_INTERVAL"""
+
+    board = models.ForeignKey(
+        Board, on_delete=models.CASCADE, related_name="checkpoints"
+    )
+    ply = models.PositiveIntegerField()
+    fen = models.CharField(max_length=100)
+
+    class Meta:
+        ordering = ["ply"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["board", "ply"], name="unique_checkpoint_ply"
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f"Checkpoint {self.ply} of board {self.board_id}"
@@ -0,0 +1,53 @@
+import json
+
+import msgpack
+
+# Clients that list this subprotocol when opening the socket get every message
+# as a msgpack binary frame, everyone else keeps JSON text frames
+MSGPACK_SUBPROTOCOL = 'chess.msgpack'
+
+
+def decode(text_data=None, bytes_data=None) -> dict:
+    """The message of a frame, JSON in a text frame and msgpack in a binary one"""
+
+    if text_data is not None:
+        return json.loads(text_data)
+
+    return msgpack.unpackb(bytes_data)
+
+
+class JsonProtocol:
+    subprotocol = None
+
+    def encode(self, message) -> dict:
+        """Keyword arguments of send for the message, a dict or position bytes"""
+
+        # The encoded position goes out as it is, in a binary frame
+        if isinstance(message, bytes):
+            return {'bytes_data': message}
+
+        return {'text_data': json.dumps(message)}
+
+
+class MsgpackProtocol:
+    subprotocol = MSGPACK_SUBPROTOCOL
+
+    def encode(self, message) -> dict:
+        if isinstance(message, bytes):
+            message = {'type': 'position', 'position': message}
+
+        return {'bytes_data': msgpack.packb(message)}
+
+
+JSON = JsonProtocol()
+PROTOCOLS = {MSGPACK_SUBPROTOCOL: MsgpackProtocol()}
+
+
+def negotiate(subprotocols) -> object:
+    """The protocol of the first known subprotocol the client offers, JSON otherwise"""
+
+    for subprotocol in subprotocols:
+        if subprotocol in PROTOCOLS:
+            return PROTOCOLS[subprotocol]
+
+    return JSON
@@ -1,6 +1,7 @@
 from django.urls import re_path
-from .consumers import ChessConsumer
+from .consumers import AsyncChessConsumer
 
 websocket_urlpatterns = [
-    re_path('ws/chess/', ChessConsumer.as_asgi()),
+    re_path(r'ws/chess/(?P<game_id>\d+)/$', AsyncChessConsumer.as_asgi()),
+    re_path('ws/chess/', AsyncChessConsumer.as_asgi()),
 ]
\ No newline at end of file
@@ -1,3 +1,945 @@
-from django.test import TestCase
+import asyncio
+import json
+import time
+from ast import literal_eval
+from itertools import product
+from threading import Thread
+from unittest.mock import patch
 
-# Create your tests here.
+import msgpack
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.urls import re_path, reverse
+from core.base_board import base
+from core.chess_classes.chess_bitboard import BLACK, CASTLE, QUEEN, encode_move
+from core.chess_classes.chess_fen import BLANK_FEN, START_FEN, to_fen
+from core.chess_classes.chess_state import GameState
+from core.chess_classes.chess_encoding import decode
+from .consumers import GAME_NOT_FOUND, AsyncChessConsumer, ChessConsumer
+from .engine import move_message, think
+from .game_cache import GAMES, GameCache
+from .models import Board, CHECKPOINT_INTERVAL
+from .protocol import MSGPACK_SUBPROTOCOL
+from .throttle import STATS, TokenBucket
+
+
+BLACK_PIECES = ("BP", "BH", "BB", "BR", "BQ", "BK")
+
+
+class BoardTests(TestCase):
+
+    def test_update_board_stores_game_state(self) -> None:
+        """Test update_board keeps the game state of every board separately"""
+
+        other_board = Board.objects.create()
+        model = Board()
+        board = Board.objects.create()
+        model.initialize_board()
+        board.refresh_from_db()
+
+        model.update_board(board, "e2", "e4", "WP", False)
+        board.refresh_from_db()
+
+        self.assertEqual(board.get_state().en_passant, "e3")
+        self.assertEqual(other_board.get_state(), GameState())
+
+        model.update_board(board, "e1", "e2", "WK", False)
+        board.refresh_from_db()
+
+        self.assertFalse(board.get_state().can_castle("white", short=True))
+        self.assertEqual(board.grid["e2"], "WK")
+
+    def test_update_board_en_passant_capture(self) -> None:
+        """Test the pawn captured en passant is removed from the grid"""
+
+        model = Board()
+        board = Board.objects.create()
+        model.initialize_board()
+
+        for move in [("e2", "e5", "WP"), ("d7", "d5", "BP"), ("e5", "d6", "WP")]:
+            board.refresh_from_db()
+            model.update_board(board, *move, False)
+
+        board.refresh_from_db()
+        grid = board.grid
+
+        self.assertEqual(grid["d6"], "WP")
+        self.assertEqual(grid["d5"], "empty")
+
+    def test_binary_position(self) -> None:
+        """Test the position round trips through to_bytes and load_bytes"""
+
+        model = Board()
+        board = Board.objects.create()
+        model.initialize_board()
+        board.refresh_from_db()
+        model.update_board(board, "e2", "e4", "WP", False)
+
+        data = board.to_bytes()
+        other = Board.objects.create()
+        other.load_bytes(data)
+        other.save()
+        other.refresh_from_db()
+
+        self.assertEqual(other.fen, board.fen)
+        self.assertLess(len(data), len(board.fen))
+
+
+class MoveLogTests(TestCase):
+
+    # A game where white castles short and black checks after move 12
+    MOVES = [
+        ("e2", "e4", "WP", False), ("e7", "e5", "BP", False),
+        ("g1", "f3", "WH", False), ("b8", "c6", "BH", False),
+        ("f1", "c4", "WB", False), ("g8", "f6", "BH", False),
+        ("e1", "g1", "WK", True), ("f8", "c5", "BB", False),
+        ("d2", "d3", "WP", False), ("d7", "d6", "BP", False),
+        ("c1", "g5", "WB", False), ("c5", "f2", "BB", False),
+    ]
+
+    def setUp(self) -> None:
+        self.model = Board()
+        self.board = Board.objects.create()
+        self.model.initialize_board()
+        self.board.refresh_from_db()
+
+        self.fens = [self.board.fen]
+
+        for move in self.MOVES:
+            self.model.update_board(self.board, *move)
+            self.board.refresh_from_db()
+            self.fens.append(self.board.fen)
+
+    def test_update_board_appends_moves_and_checkpoints(self) -> None:
+        """Test every move adds one Move row and every N plies a Checkpoint"""
+
+        self.assertEqual(self.board.ply, len(self.MOVES))
+        self.assertEqual(
+            [(move.from_cell, move.to_cell) for move in self.board.history()],
+            [move[:2] for move in self.MOVES],
+        )
+        self.assertEqual(
+            list(self.board.checkpoints.values_list("ply", "fen")),
+            [(0, self.fens[0]), (CHECKPOINT_INTERVAL, self.fens[CHECKPOINT_INTERVAL])],
+        )
+
+    def test_position_at_replays_from_checkpoints(self) -> None:
+        """Test every position of the game is rebuilt from the log"""
+
+        for ply, fen in enumerate(self.fens):
+            grid, state = self.board.position_at(ply)
+            self.assertEqual(to_fen(grid, state), fen)
+
+        # In the last position the black bishop checks the king
+        self.assertEqual(state.checked_king, "WK")
+        self.assertEqual(state.check_position, "f2")
+
+        with self.assertRaises(ValueError):
+            self.board.position_at(len(self.fens))
+
+    def test_takeback(self) -> None:
+        """Test takeback restores the position and drops the later log rows"""
+
+        self.board.takeback(3)
+        self.board.refresh_from_db()
+
+        self.assertEqual(self.board.ply, len(self.MOVES) - 3)
+        self.assertEqual(self.board.fen, self.fens[-4])
+        self.assertEqual(self.board.get_state().checked_king, "")
+        self.assertEqual(self.board.moves.count(), len(self.MOVES) - 3)
+        self.assertEqual(self.board.checkpoints.count(), 1)
+
+        # The game carries on from the restored position
+        self.model.update_board(self.board, *self.MOVES[-3])
+        self.board.refresh_from_db()
+
+        self.assertEqual(self.board.fen, self.fens[-3])
+        self.assertEqual(self.board.checkpoints.count(), 2)
+
+    def test_reset_board_clears_the_log(self) -> None:
+        """Test a reset board starts a new log"""
+
+        self.model.reset_board(self.board)
+        self.board.refresh_from_db()
+
+        self.assertEqual(self.board.ply, 0)
+        self.assertFalse(self.board.moves.exists())
+        self.assertFalse(self.board.checkpoints.exists())
+
+
+class ConsumerTests(TestCase):
+
+    def setUp(self) -> None:
+        GAMES.clear()
+
+    def tearDown(self) -> None:
+        GAMES.clear()
+
+    MOVE = {
+        "oldCell": "e2",
+        "newCell": "e4",
+        "pieceMoved": "WP",
+        "eventType": "dragend",
+    }
+
+    def application(self, consumer):
+        return URLRouter(
+            [
+                re_path(r"ws/chess/(?P<game_id>\d+)/$", consumer.as_asgi()),
+                re_path("ws/chess/", consumer.as_asgi()),
+            ]
+        )
+
+    async def play(self, consumer, path: str = "/ws/chess/") -> tuple:
+        communicator = WebsocketCommunicator(self.application(consumer), path)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        await communicator.send_to(text_data=json.dumps(self.MOVE))
+        move_info = json.loads(await communicator.receive_from())
+
+        await communicator.send_to(text_data=json.dumps({"eventType": "position"}))
+        position = (await communicator.receive_output())["bytes"]
+
+        await communicator.disconnect()
+
+        return move_info, position
+
+    async def test_consumers_play_the_move(self) -> None:
+        """Test the sync and async consumers validate and store the move alike"""
+
+        for consumer in (ChessConsumer, AsyncChessConsumer):
+            await Board.objects.acreate()
+
+            move_info, position = await self.play(consumer)
+            grid, state = decode(position)
+
+            self.assertFalse(move_info["check"])
+            self.assertEqual(move_info["processed_cell"], "e4")
+            self.assertEqual(grid["e4"], "WP")
+            self.assertEqual(state.en_passant, "e3")
+
+    async def test_game_rooms(self) -> None:
+        """Test a move is played on its game's board and sent to the others in it"""
+
+        for consumer in (ChessConsumer, AsyncChessConsumer):
+            game = await Board.objects.acreate()
+            other_game = await Board.objects.acreate()
+            path = f"/ws/chess/{game.id}/"
+
+            players = [
+                WebsocketCommunicator(self.application(consumer), path)
+                for _ in range(3)
+            ]
+            outsider = WebsocketCommunicator(
+                self.application(consumer), f"/ws/chess/{other_game.id}/"
+            )
+
+            for communicator in players + [outsider]:
+                self.assertTrue((await communicator.connect())[0])
+
+            mover, *others = players
+
+            await mover.send_to(text_data=json.dumps(self.MOVE))
+            self.assertTrue(json.loads(await mover.receive_from())["move_valid"])
+
+            for communicator in others:
+                move = json.loads(await communicator.receive_from())
+
+                self.assertEqual(move["type"], "move")
+                self.assertEqual(move["seq"], 1)
+                self.assertEqual(move["changes"], {"e2": "empty", "e4": "WP"})
+
+            # The mover got its reply only once and other games heard nothing
+            self.assertTrue(await mover.receive_nothing())
+            self.assertTrue(await outsider.receive_nothing())
+
+            for communicator in players + [outsider]:
+                await communicator.disconnect()
+
+            # Written behind, at the latest when the sockets disconnect
+            await game.arefresh_from_db()
+            await other_game.arefresh_from_db()
+
+            self.assertEqual(game.ply, 1)
+            self.assertEqual(await game.moves.acount(), 1)
+            self.assertEqual(other_game.fen, BLANK_FEN)
+
+    async def test_piece_selected(self) -> None:
+        """Test picking a piece up gets its legal targets in one reply"""
+
+        game = await Board.objects.acreate()
+        communicator = WebsocketCommunicator(
+            self.application(AsyncChessConsumer), f"/ws/chess/{game.id}/"
+        )
+        await communicator.connect()
+
+        for cell, targets in (("g1", ["f3", "h3"]), ("e8", []), ("z9", [])):
+            await communicator.send_to(
+                text_data=json.dumps({"eventType": "pieceSelected", "oldCell": cell})
+            )
+            reply = json.loads(await communicator.receive_from())
+
+            self.assertEqual(reply, {"type": "targets", "cell": cell, "targets": targets})
+
+        await communicator.disconnect()
+
+    async def test_sync(self) -> None:
+        """Test a reconnecting client gets the deltas it missed or a snapshot"""
+
+        game = await Board.objects.acreate()
+        moves = [
+            ("e2", "e4", "WP"), ("d7", "d5", "BP"), ("e4", "d5", "WP"),
+            ("e8", "d7", "BK"), ("d5", "d6", "WP"), ("g8", "f6", "BH"),
+            ("d6", "c7", "WP"), ("a7", "a6", "BP"), ("c7", "b8", "WP"),
+        ]
+
+        communicator = WebsocketCommunicator(
+            self.application(AsyncChessConsumer), f"/ws/chess/{game.id}/"
+        )
+        await communicator.connect()
+
+        for old_cell, new_cell, piece in moves:
+            move = {"oldCell": old_cell, "newCell": new_cell, "pieceMoved": piece}
+            promotion = {"pawnPromotedTo": "WQ"} if new_cell == "b8" else {}
+
+            await communicator.send_to(
+                text_data=json.dumps({**move, **promotion, "eventType": "dragend"})
+            )
+            await communicator.receive_from()
+
+        async def sync(seq) -> dict:
+            await communicator.send_to(
+                text_data=json.dumps({"eventType": "sync", "seq": seq})
+            )
+            return json.loads(await communicator.receive_from())
+
+        self.assertEqual(
+            await sync(9),
+            {"type": "sync", "seq": 9, "deltas": [], "checked_king": ""},
+        )
+
+        reply = await sync(7)
+
+        self.assertEqual(reply["type"], "sync")
+        self.assertEqual(
+            reply["deltas"],
+            [
+                {"seq": 8, "changes": {"a7": "empty", "a6": "BP"}},
+                # The promotion lands the queen on the cell of the captured horse
+                {"seq": 9, "changes": {"c7": "empty", "b8": "WQ"}},
+            ],
+        )
+
+        for seq in (-1, 10, "x", None):
+            self.assertEqual((await sync(seq))["type"], "snapshot")
+
+        with patch("chess.consumers.RESYNC_LIMIT", 1):
+            self.assertEqual((await sync(7))["type"], "snapshot")
+
+        snapshot = await sync(None)
+
+        self.assertEqual(snapshot["board"]["b8"], "WQ")
+        self.assertNotIn("c7", snapshot["board"])
+        self.assertEqual(len(snapshot["board"]), 29)
+
+        await communicator.disconnect()
+
+    async def test_msgpack_subprotocol(self) -> None:
+        """Test a msgpack client gets binary frames while a JSON one keeps text"""
+
+        for consumer in (ChessConsumer, AsyncChessConsumer):
+            game = await Board.objects.acreate()
+            path = f"/ws/chess/{game.id}/"
+
+            packed = WebsocketCommunicator(
+                self.application(consumer), path, subprotocols=[MSGPACK_SUBPROTOCOL]
+            )
+            plain = WebsocketCommunicator(self.application(consumer), path)
+
+            self.assertEqual(await packed.connect(), (True, MSGPACK_SUBPROTOCOL))
+            self.assertEqual(await plain.connect(), (True, None))
+
+            await packed.send_to(bytes_data=msgpack.packb(self.MOVE))
+            reply = msgpack.unpackb(await packed.receive_from())
+
+            self.assertTrue(reply["move_valid"])
+            self.assertEqual(json.loads(await plain.receive_from())["type"], "move")
+
+            await packed.send_to(bytes_data=msgpack.packb({"eventType": "position"}))
+            position = msgpack.unpackb(await packed.receive_from())
+
+            self.assertEqual(position["type"], "position")
+            self.assertEqual(decode(position["position"])[0]["e4"], "WP")
+
+            await packed.disconnect()
+            await plain.disconnect()
+
+    async def test_previews_are_coalesced(self) -> None:
+        """Test only the latest drag preview of a piece in the window is validated"""
+
+        game = await Board.objects.acreate()
+        communicator = WebsocketCommunicator(
+            self.application(AsyncChessConsumer), f"/ws/chess/{game.id}/"
+        )
+        await communicator.connect()
+        coalesced = STATS["coalesced"]
+
+        with patch("chess.consumers.COALESCE_WINDOW", 0.01):
+            for cell in ("e3", "d3", "f3", "e4"):
+                preview = {"oldCell": "e2", "newCell": cell, "pieceMoved": "WP"}
+                await communicator.send_to(text_data=json.dumps(preview))
+
+            reply = json.loads(await communicator.receive_from())
+
+        self.assertEqual(reply["processed_cell"], "e4")
+        self.assertTrue(await communicator.receive_nothing())
+        self.assertEqual(STATS["coalesced"] - coalesced, 3)
+
+        await communicator.disconnect()
+
+    async def test_rate_limit_never_drops_moves(self) -> None:
+        """Test messages over the limit are dropped but played moves go through"""
+
+        for consumer in (ChessConsumer, AsyncChessConsumer):
+            game = await Board.objects.acreate()
+            communicator = WebsocketCommunicator(
+                self.application(consumer), f"/ws/chess/{game.id}/"
+            )
+            dropped = STATS["dropped"]
+
+            # One token and none coming back
+            with patch("chess.consumers.TokenBucket", lambda: TokenBucket(0, 1)):
+                await communicator.connect()
+
+            selected = {"eventType": "pieceSelected", "oldCell": "e2"}
+
+            for _ in range(3):
+                await communicator.send_to(text_data=json.dumps(selected))
+
+            self.assertEqual(
+                json.loads(await communicator.receive_from())["type"], "targets"
+            )
+            self.assertTrue(await communicator.receive_nothing())
+            self.assertEqual(STATS["dropped"] - dropped, 2)
+
+            await communicator.send_to(text_data=json.dumps(self.MOVE))
+
+            self.assertEqual(json.loads(await communicator.receive_from())["seq"], 1)
+
+            await communicator.disconnect()
+
+    async def test_invalid_moves_are_rejected(self) -> None:
+        """Test a move the rules reject is neither played nor sent to the game"""
+
+        for consumer in (ChessConsumer, AsyncChessConsumer):
+            game = await Board.objects.acreate()
+            path = f"/ws/chess/{game.id}/"
+            mover, other = (
+                WebsocketCommunicator(self.application(consumer), path)
+                for _ in range(2)
+            )
+
+            for communicator in (mover, other):
+                await communicator.connect()
+
+            await mover.send_to(text_data=json.dumps({**self.MOVE, "newCell": "e5"}))
+
+            self.assertFalse(json.loads(await mover.receive_from())["move_valid"])
+            self.assertTrue(await other.receive_nothing())
+
+            for communicator in (mover, other):
+                await communicator.disconnect()
+
+            await game.arefresh_from_db()
+
+            self.assertEqual(game.ply, 0)
+            self.assertFalse(await game.moves.aexists())
+
+    async def test_only_the_side_to_move_moves_its_pieces(self) -> None:
+        """Test moves of the wrong colour, out of turn or of a missing piece aren't played"""
+
+        for consumer in (ChessConsumer, AsyncChessConsumer):
+            game = await Board.objects.acreate()
+            communicator = WebsocketCommunicator(
+                self.application(consumer), f"/ws/chess/{game.id}/"
+            )
+            await communicator.connect()
+
+            moves = (
+                ({"oldCell": "e7", "newCell": "e5", "pieceMoved": "BP"}, False),
+                ({"oldCell": "d1", "newCell": "d3", "pieceMoved": "WQ"}, False),
+                ({"oldCell": "e3", "newCell": "e4", "pieceMoved": "WP"}, False),
+                ({}, True),
+                ({"oldCell": "d2", "newCell": "d4", "pieceMoved": "WP"}, False),
+                ({"oldCell": "e7", "newCell": "e5", "pieceMoved": "BP"}, True),
+            )
+
+            for move, valid in moves:
+                await communicator.send_to(text_data=json.dumps({**self.MOVE, **move}))
+                reply = json.loads(await communicator.receive_from())
+
+                self.assertEqual(reply["move_valid"], valid)
+
+            await communicator.disconnect()
+            await game.arefresh_from_db()
+
+            self.assertEqual(game.ply, 2)
+
+    async def test_promotion(self) -> None:
+        """Test the pawn reaching the last rank and the piece chosen for it are played"""
+
+        game = await Board.objects.acreate(fen="4k3/P7/8/8/8/8/8/4K3 w - - 0 1")
+        communicator = WebsocketCommunicator(
+            self.application(AsyncChessConsumer), f"/ws/chess/{game.id}/"
+        )
+        await communicator.connect()
+
+        move = {**self.MOVE, "oldCell": "a7", "newCell": "a8", "pieceMoved": "WP"}
+        choice = {
+            **move,
+            "pieceMoved": "WQ",
+            "pawnPromotedTo": "WQ",
+            "eventType": "click",
+        }
+
+        for data in (move, choice):
+            await communicator.send_to(text_data=json.dumps(data))
+            self.assertTrue(json.loads(await communicator.receive_from())["move_valid"])
+
+        await communicator.disconnect()
+        await game.arefresh_from_db()
+
+        self.assertEqual(game.grid["a8"], "WQ")
+        # Choosing the piece doesn't pass the turn back to white
+        self.assertEqual(game.fen.split(" ")[1], "b")
+
+    async def test_cached_game_skips_the_database_thread(self) -> None:
+        """Test a query in progress doesn't hold up picking a piece up in a cached game"""
+
+        game = await Board.objects.acreate()
+        communicator = WebsocketCommunicator(
+            self.application(AsyncChessConsumer), f"/ws/chess/{game.id}/"
+        )
+        await communicator.connect()
+
+        selected = {"eventType": "pieceSelected", "oldCell": "e2"}
+
+        # The first message loads the game into the cache
+        await communicator.send_to(text_data=json.dumps(selected))
+        await communicator.receive_from()
+
+        # A slow query keeps the database thread busy for a second
+        busy = asyncio.create_task(database_sync_to_async(time.sleep)(1))
+        await asyncio.sleep(0.05)
+
+        started = time.monotonic()
+        await communicator.send_to(text_data=json.dumps(selected))
+        reply = json.loads(await communicator.receive_from())
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(reply["targets"], ["e3", "e4"])
+
+        await busy
+        await communicator.disconnect()
+
+    async def test_bot_answers_the_move(self) -> None:
+        """Test the computer's move follows the player's and goes to every socket"""
+
+        for consumer in (ChessConsumer, AsyncChessConsumer):
+            game = await Board.objects.acreate(bot="black")
+            await database_sync_to_async(Board().initialize_board)(game)
+
+            communicator = WebsocketCommunicator(
+                self.application(consumer), f"/ws/chess/{game.id}/"
+            )
+            await communicator.connect()
+
+            with patch("chess.engine.NODE_LIMIT", 2000):
+                await communicator.send_to(text_data=json.dumps(self.MOVE))
+
+                reply = json.loads(await communicator.receive_from())
+                self.assertEqual(reply["seq"], 1)
+
+                move = json.loads(await communicator.receive_from(timeout=10))
+
+            self.assertEqual(move["seq"], 2)
+            # Only black pieces moved, whatever the engine chose
+            self.assertLessEqual(
+                set(move["changes"].values()), {"empty", *BLACK_PIECES}
+            )
+
+            await communicator.disconnect()
+
+            await game.arefresh_from_db()
+            self.assertEqual(game.ply, 2)
+            self.assertEqual(game.fen.split(" ")[1], "w")
+
+    async def test_bot_under_promotes(self) -> None:
+        """Test the computer's promotion to a knight is played like any other move"""
+
+        for consumer in (ChessConsumer, AsyncChessConsumer):
+            # After Kd3 the pawn becomes a knight with check, forking the queen
+            game = await Board.objects.acreate(
+                fen="1k6/8/8/8/8/2K5/4p1Q1/8 w - - 0 1", bot="black"
+            )
+            communicator = WebsocketCommunicator(
+                self.application(consumer), f"/ws/chess/{game.id}/"
+            )
+            await communicator.connect()
+
+            with patch("chess.engine.NODE_LIMIT", 2000):
+                await communicator.send_to(
+                    text_data=json.dumps(
+                        {**self.MOVE, "oldCell": "c3", "newCell": "d3", "pieceMoved": "WK"}
+                    )
+                )
+                self.assertTrue(json.loads(await communicator.receive_from())["move_valid"])
+
+                move = json.loads(await communicator.receive_from(timeout=10))
+
+            self.assertEqual(move["changes"], {"e2": "empty", "e1": "BH"})
+            self.assertTrue(move["check"])
+
+            await communicator.disconnect()
+
+            await game.arefresh_from_db()
+            self.assertEqual(game.fen, "1k6/8/8/8/8/3K4/6Q1/4n3 w - - 0 2")
+
+    async def test_en_passant_escape_keeps_the_game(self) -> None:
+        """
+        Test neither a check the pawn can be taken en passant from nor a position
+        where taking en passant is the only move ends the game
+        """
+
+        fens = (
+            "8/8/R7/4k3/2B1p3/8/3PN3/5R1K w - - 0 1",
+            "7k/5K2/5N2/8/4p3/4P3/3P4/8 w - - 0 1",
+        )
+
+        for consumer, fen in product((ChessConsumer, AsyncChessConsumer), fens):
+            game = await Board.objects.acreate(fen=fen)
+            games = await Board.objects.acount()
+
+            communicator = WebsocketCommunicator(
+                self.application(consumer), f"/ws/chess/{game.id}/"
+            )
+            self.assertTrue((await communicator.connect())[0])
+
+            await communicator.send_to(
+                text_data=json.dumps(
+                    {**self.MOVE, "oldCell": "d2", "newCell": "d4", "pieceMoved": "WP"}
+                )
+            )
+            move_info = json.loads(await communicator.receive_from())
+
+            await communicator.disconnect()
+
+            self.assertTrue(move_info["move_valid"])
+            self.assertFalse(move_info["checkmate"])
+            self.assertFalse(move_info["stalemate"])
+            self.assertEqual(await Board.objects.acount(), games)
+
+    async def test_unknown_game_is_rejected(self) -> None:
+        """Test a socket for a game that doesn't exist is closed"""
+
+        for consumer in (ChessConsumer, AsyncChessConsumer):
+            communicator = WebsocketCommunicator(
+                self.application(consumer), "/ws/chess/999999/"
+            )
+            await communicator.connect()
+            closed = await communicator.receive_output()
+
+            self.assertEqual(
+                closed, {"type": "websocket.close", "code": GAME_NOT_FOUND}
+            )
+
+
+class EngineTests(TestCase):
+
+    def test_move_message(self) -> None:
+        """Test the engine's moves are sent like the client sends them"""
+
+        castle = "r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1"
+        message = move_message(castle, {"move": encode_move(4, 6, flag=CASTLE)})
+
+        self.assertEqual(message["pieceMoved"], "WK")
+        self.assertEqual((message["oldCell"], message["newCell"]), ("e1", "g1"))
+        self.assertTrue(message["castle"])
+
+        promotion = "4k3/8/8/8/8/8/p7/4K3 b - - 0 1"
+        message = move_message(
+            promotion, {"move": encode_move(8, 0, promotion=QUEEN)}
+        )
+
+        self.assertEqual(message["pieceMoved"], "BP")
+        self.assertEqual(message["pawnPromotedTo"], "BQ")
+        self.assertFalse(message["castle"])
+
+        self.assertIsNone(move_message(START_FEN, {"move": 0}))
+
+    def test_parallel_think(self) -> None:
+        """Test the bot searches with several processes when configured to"""
+
+        with patch("chess.engine.SEARCHERS", 2):
+            with patch("chess.engine.NODE_LIMIT", 2000):
+                result = think(START_FEN)
+
+        self.assertEqual(result["workers"], 2)
+        self.assertTrue(result["move"])
+
+
+class GameCacheTests(TestCase):
+
+    def setUp(self) -> None:
+        self.cache = GameCache(size=2)
+        self.boards = [Board.objects.create() for _ in range(3)]
+
+    def test_moves_are_written_on_flush(self) -> None:
+        """Test played moves stay in memory until the flush writes them together"""
+
+        board = self.boards[0]
+
+        self.cache.play(board.id, "e2", "e4", "WP", False)
+        self.cache.play(board.id, "e7", "e5", "BP", False)
+
+        self.assertEqual(self.cache.get(board.id).ply, 2)
+        self.assertFalse(board.moves.exists())
+
+        # One board update and one insert for both moves, in a savepoint
+        with self.assertNumQueries(4):
+            self.assertEqual(self.cache.flush(), 2)
+
+        board.refresh_from_db()
+
+        self.assertEqual(board.ply, 2)
+        self.assertEqual(board.fen, self.cache.get(board.id).fen)
+        self.assertEqual(board.moves.count(), 2)
+        self.assertEqual(self.cache.flush(), 0)
+
+    def test_eviction(self) -> None:
+        """Test the least recently used game is flushed and dropped for a new one"""
+
+        first, second, third = self.boards
+
+        self.cache.play(first.id, "e2", "e4", "WP", False)
+        self.cache.get(second.id)
+        self.cache.get(first.id)
+        self.cache.get(third.id)
+
+        self.assertIn(first.id, self.cache)
+        self.assertNotIn(second.id, self.cache)
+
+        self.cache.get(second.id)
+
+        self.assertNotIn(first.id, self.cache)
+        self.assertEqual(first.moves.count(), 1)
+
+    def test_moves_of_another_process(self) -> None:
+        """Test a checked get loads the board again when another process moved"""
+
+        board = self.boards[0]
+        fen = "8/8/8/8/4P3/8/8/8 b KQkq e3 0 1"
+
+        self.cache.get(board.id)
+        # Another process played and flushed the first move
+        Board.objects.filter(pk=board.id).update(fen=fen, ply=1)
+
+        self.assertEqual(self.cache.get(board.id).ply, 0)
+        self.assertEqual(self.cache.get(board.id, check=True).fen, fen)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.cache.get(board.id, check=True).ply, 1)
+
+    def test_checked_get_queries_without_the_lock(self) -> None:
+        """Test the ply of a checked get is read while other games can take the lock"""
+
+        board = self.boards[0]
+        self.cache.get(board.id)
+        free = []
+
+        def take_lock() -> None:
+            if self.cache.lock.acquire(blocking=False):
+                free.append(True)
+                self.cache.lock.release()
+
+        def query(execute, *args):
+            thread = Thread(target=take_lock)
+            thread.start()
+            thread.join()
+
+            return execute(*args)
+
+        with connection.execute_wrapper(query):
+            self.cache.get(board.id, check=True)
+
+        self.assertEqual(free, [True])
+
+    def test_flush_conflict(self) -> None:
+        """Test a flush over moves another process stored writes nothing"""
+
+        board = self.boards[0]
+        fen = "8/8/8/8/3P4/8/8/8 b KQkq d3 0 1"
+
+        self.cache.play(board.id, "e2", "e4", "WP", False)
+        Board.objects.filter(pk=board.id).update(fen=fen, ply=1)
+
+        self.assertEqual(self.cache.flush(board.id), 0)
+        self.assertNotIn(board.id, self.cache)
+
+        board.refresh_from_db()
+
+        self.assertEqual(board.fen, fen)
+        self.assertFalse(board.moves.exists())
+
+    def test_discard(self) -> None:
+        """Test a discarded game drops its pending moves"""
+
+        board = self.boards[0]
+
+        self.cache.play(board.id, "e2", "e4", "WP", False)
+        self.cache.discard(board.id)
+
+        self.assertEqual(self.cache.flush(), 0)
+        self.assertEqual(self.cache.get(board.id).ply, 0)
+
+
+class TokenBucketTests(TestCase):
+
+    def test_take(self) -> None:
+        """Test the bucket lets a burst through and then refills at its rate"""
+
+        bucket = TokenBucket(rate=1000, capacity=2)
+
+        self.assertTrue(bucket.take())
+        self.assertTrue(bucket.take())
+        self.assertFalse(bucket.take())
+
+        bucket.updated -= 0.001
+
+        self.assertTrue(bucket.take())
+        self.assertFalse(TokenBucket(rate=0, capacity=0).take())
+
+
+class ChessPageTests(TestCase):
+
+    def test_game_page(self) -> None:
+        """Test every game has its own page, passing its id to the socket"""
+
+        board = Board.objects.create()
+
+        response = self.client.get(reverse("chess_game", args=[board.id]))
+
+        self.assertContains(response, f'data-game-id="{board.id}"')
+        self.assertEqual(
+            self.client.get(reverse("chess_game", args=[board.id + 1])).status_code,
+            404,
+        )
+
+    def test_stats_are_for_staff(self) -> None:
+        """Test the socket counters are only shown to staff"""
+
+        self.assertEqual(self.client.get(reverse("chess_stats")).status_code, 302)
+
+        staff = get_user_model().objects.create_user(
+            username="staff", password="password", is_staff=True
+        )
+        self.client.force_login(staff)
+        response = self.client.get(reverse("chess_stats"))
+
+        self.assertEqual(response.json(), dict(STATS))
+
+    def test_play_bot(self) -> None:
+        """Test the computer button starts a new game where it plays black"""
+
+        response = self.client.post(reverse("chess"), {"play_bot": ""})
+        board = Board.objects.last()
+
+        self.assertRedirects(response, reverse("chess_game", args=[board.id]))
+        self.assertEqual(board.bot, "black")
+        self.assertEqual(board.fen, START_FEN)
+
+    def test_reset_only_touches_its_game(self) -> None:
+        """Test the reset button of a game page resets that board"""
+
+        board, last = Board.objects.create(), Board.objects.create()
+
+        for game in (board, last):
+            Board().initialize_board(game)
+
+        self.client.post(reverse("chess_game", args=[board.id]), {"reset": ""})
+
+        board.refresh_from_db()
+        last.refresh_from_db()
+
+        self.assertEqual(board.fen, BLANK_FEN)
+        self.assertEqual(last.fen, START_FEN)
+
+
+class BoardFenMigrationTests(TransactionTestCase):
+
+    def migrate(self, target: str):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([("chess", target)])
+
+        return executor.loader.project_state([("chess", target)]).apps
+
+    def tearDown(self) -> None:
+        call_command("migrate", verbosity=0)
+
+    def test_dict_repr_rows_become_fen(self) -> None:
+        """Test the migration turns the stored dict repr and state into FEN"""
+
+        apps = self.migrate("0003_board_state")
+        OldBoard = apps.get_model("chess", "Board")
+
+        grid = base()
+        grid.update({"e1": "WK", "e4": "WP", "e8": "BK"})
+        state = GameState(BLACK, 0, "e3", "BK", "h5")
+
+        # Rights stored for a rook that is gone are dropped
+        rook = base()
+        rook.update({"a1": "WR", "e1": "WK", "d4": "WP", "e8": "BK"})
+
+        OldBoard.objects.create(grid=str(grid), state=state.to_dict())
+        OldBoard.objects.create()
+        OldBoard.objects.create(grid=str(rook))
+
+        self.migrate("0004_board_fen")
+        call_command("migrate", verbosity=0)
+
+        moved, blank, rook = Board.objects.order_by("id")
+
+        self.assertEqual(moved.fen, "4k3/8/8/8/4P3/8/8/4K3 b - e3 0 1")
+        self.assertEqual(moved.get_state(), state)
+        self.assertEqual(blank.fen, BLANK_FEN)
+        self.assertEqual(rook.fen, "4k3/8/8/8/3P4/8/8/R3K3 w Q - 0 1")
+
+        # Games in progress start their move log from the stored position
+        self.assertEqual(moved.position_at(0)[0], moved.grid)
+        self.assertFalse(blank.checkpoints.exists())
+
+    def test_fen_rows_go_back_to_dict_repr(self) -> None:
+        """Test the reverse migration stores the grid and the whole state again"""
+
+        apps = self.migrate("0005_move_log")
+        apps.get_model("chess", "Board").objects.create(
+            fen="4k3/8/8/8/4P3/8/8/4K3 b - e3 0 1", state={"checked_king": "BK"}
+        )
+
+        apps = self.migrate("0003_board_state")
+        board = apps.get_model("chess", "Board").objects.get()
+
+        grid = base()
+        grid.update({"e1": "WK", "e4": "WP", "e8": "BK"})
+
+        self.assertEqual(literal_eval(board.grid), grid)
+        self.assertEqual(
+            GameState.from_dict(board.state), GameState(BLACK, 0, "e3", "BK")
+        )
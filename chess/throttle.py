@@ -0,0 +1,55 @@
+from collections import Counter
+from time import monotonic
+
+from django.conf import settings
+
+# Messages a socket may send per second that aren't played moves, and the burst
+# it can send at once. Played moves are never limited
+RATE = getattr(settings, 'CHESS_MESSAGE_RATE', 20)
+BURST = getattr(settings, 'CHESS_MESSAGE_BURST', 40)
+
+# Seconds drag previews wait so that only the latest one per piece is validated
+COALESCE_WINDOW = getattr(settings, 'CHESS_COALESCE_WINDOW', 0.05)
+
+# Counters of this process: 'processed', 'dropped' by the rate limit
+# and 'coalesced', previews replaced by a later one before they were validated
+STATS = Counter()
+
+COMMITTED_EVENTS = ('dragend', 'click')
+
+
+def is_committed(data: dict) -> bool:
+    return data.get('eventType') in COMMITTED_EVENTS
+
+
+def is_preview(data: dict) -> bool:
+    """A move sent while dragging, validated but not played"""
+
+    return data.get('eventType') is None
+
+
+class TokenBucket:
+    """
+    Holds up to capacity tokens and gets rate tokens back every second,
+    a message is let through when it can take one
+    """
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float = RATE, capacity: float = BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = monotonic()
+
+    def take(self) -> bool:
+        now = monotonic()
+
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens < 1:
+            return False
+
+        self.tokens -= 1
+        return True
@@ -1,6 +1,8 @@
 from django.urls import path
-from .views import chess_page
+from .views import chess_page, chess_stats
 
 urlpatterns = [
-    path('chess/', chess_page, name='chess')
-]
\ No newline at end of file
+    path('chess/', chess_page, name='chess'),
+    path('chess/<int:game_id>/', chess_page, name='chess_game'),
+    path('chess/stats/', chess_stats, name='chess_stats'),
+]
@@ -1,17 +1,41 @@
-from django.shortcuts import render
-from django.http import HttpRequest
+from django.contrib.admin.views.decorators import staff_member_required
+from django.shortcuts import render, redirect, get_object_or_404
+from django.http import HttpRequest, JsonResponse
+from .game_cache import GAMES
 from .models import Board
+from .throttle import STATS
 
-def chess_page(request: HttpRequest):
+def chess_page(request: HttpRequest, game_id: int = None):
     template_name = 'chess.html'
     model = Board()
 
+    # Without a game id the page plays the last board, like it always did
+    if game_id is None:
+        last_obj = Board.objects.last() or Board.objects.create()
+    else:
+        last_obj = get_object_or_404(Board, pk=game_id)
+
+    context = {'game_id': last_obj.id}
+
     if request.method == "POST":
 
-        last_obj = model.initialize_board()
+        # A new game against the computer, which takes the black pieces
+        if 'play_bot' in request.POST:
+            last_obj = model.initialize_board(Board.objects.create(bot='black'))
+            return redirect('chess_game', game_id=last_obj.id)
+
+        last_obj = model.initialize_board(last_obj)
 
         if 'reset' in request.POST:
             model.reset_board(last_obj)
-            return render(request, template_name)
+            # The cached board of a live game would bring the old position back
+            GAMES.discard(last_obj.id)
+            return render(request, template_name, context)
         
-    return render(request, template_name)
+    return render(request, template_name, context)
+
+
+@staff_member_required
+def chess_stats(request: HttpRequest):
+    # Socket message counters of this process, for tuning the rate limit
+    return JsonResponse(dict(STATS))
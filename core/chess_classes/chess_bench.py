@@ -0,0 +1,568 @@
+import json
+from ast import literal_eval
+from timeit import Timer
+
+import msgpack
+
+from .chess_bitboard import Position, START_FEN
+from .chess_encoding import decode, decode_position, encode
+from .chess_eval import evaluate, evaluate_from_scratch
+from .chess_fen import fen_to_grid, parse_fen, to_fen
+from .chess_logic import ChessLogic
+from .chess_movegen import generate_legal_moves, move_to_uci
+from .chess_pieces import King
+from .chess_utils import get_path_between_positions
+from .chess_search import parallel_search, search, start_pool
+from .chess_zobrist import PIECE_KEYS
+
+# (name, fen, king that may be mated, cell of the piece that moved last)
+CHECKMATE_POSITIONS = [
+    ("back_rank_mate", "R5k1/5ppp/8/8/8/8/8/6K1 b - - 0 1", "BK", "a8"),
+    ("smothered_mate", "6rk/5Npp/8/8/8/8/8/6K1 b - - 0 1", "BK", "f7"),
+    ("double_check_mate", "3qkb2/5p2/8/1B6/8/8/8/K3R3 b - - 0 1", "BK", "b5"),
+    ("blockable_check", "4k3/8/8/8/8/2N5/PPP2PPP/r3K3 w - - 0 1", "WK", "a1"),
+    (
+        "no_check",
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        "WK",
+        "e5",
+    ),
+]
+
+# A short game with captures, checks and castling, replayed through handle_move
+GAME = [
+    "e2e4", "e7e5", "g1f3", "b8c6", "f1c4", "g8f6", "f3g5", "d7d5", "e4d5", "f6d5",
+    "g5f7", "e8f7", "d1f3", "f7e6", "b1c3", "c6b4", "f3e4", "c7c6", "a2a3", "b4a6",
+    "d2d4", "a6c7", "c1f4", "e6f7", "f4e5", "c8e6", "e1g1", "f8e7", "c4d5", "c6d5",
+    "c3d5", "c7d5", "e4f5",
+]
+
+# Positions with pieces hanging and exchanges pending, for the search benchmarks
+TACTICAL_POSITIONS = [
+    (
+        "scholars_mate",
+        "r1bqkbnr/pppp1ppp/2n5/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 2 3",
+    ),
+    ("kiwipete", CHECKMATE_POSITIONS[-1][1]),
+    (
+        "promotions",
+        "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+    ),
+    (
+        "pinned_bishops",
+        "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+    ),
+    ("knight_on_f6", "2rr3k/pp3pp1/1nnqbN1p/3pN3/2pP4/2P3Q1/PPB4P/R4RK1 w - - 0 1"),
+]
+
+# (name in TACTICAL_POSITIONS, depth) of the quiescence benchmark. Unordered
+# quiescence needs millions of nodes on kiwipete and promotions, so the depths
+# are the deepest ones where every search of a position finishes
+QUIESCENCE_POSITIONS = (("scholars_mate", 3), ("knight_on_f6", 2), ("pinned_bishops", 1))
+
+# Searches without move ordering grow huge, they are stopped after this many nodes
+NODE_CAP = 250000
+
+# The pruning and ordering techniques of Search, compared one at a time
+# against a search without any of them, to TECHNIQUE_DEPTH and in TIME_BUDGET
+TECHNIQUES = ("null_move", "reductions", "killers", "history")
+TECHNIQUE_DEPTH = 4
+TECHNIQUE_NODE_CAP = 250000
+TIME_BUDGET = 1.0
+
+# Worker counts of the parallel search compared to one worker, to PARALLEL_DEPTH
+PARALLEL_WORKERS = (1, 2, 4)
+PARALLEL_DEPTH = 5
+
+# What a move puts on the chess socket: the pickup, its targets, the committed move,
+# the reply to the mover and the delta every other socket of the game gets
+WIRE_MESSAGES = {
+    "pieceSelected": {"eventType": "pieceSelected", "oldCell": "g1"},
+    "targets": {"type": "targets", "cell": "g1", "targets": ["e2", "f3", "h3"]},
+    "dragend": {
+        "pieceMoved": "WH",
+        "oldCell": "g1",
+        "newCell": "f3",
+        "eventType": "dragend",
+        "castle": False,
+    },
+    "reply": {
+        "move_valid": True,
+        "checkmate": False,
+        "stalemate": False,
+        "winner": "somebody",
+        "check": False,
+        "en_passant": False,
+        "processed_cell": "f3",
+        "seq": 3,
+    },
+    "delta": {
+        "type": "move",
+        "seq": 3,
+        "changes": {"g1": "empty", "f3": "WH"},
+        "check": False,
+        "checkmate": False,
+        "stalemate": False,
+        "winner": "somebody",
+    },
+}
+
+
+def time_call(function, number: int) -> float:
+    """Best of three runs, in seconds per call"""
+
+    return min(Timer(function).repeat(repeat=3, number=number)) / number
+
+
+def reference_is_checkmate(move: str, board: dict, king_identifier: str) -> bool:
+    """
+    ChessLogic.is_checkmate as it was before check_info and has_legal_move,
+    kept to time the current one against. It tries every piece of the
+    checked side on every cell of the check path, then the king's neighbours
+
+    Arguments:
+        move: str, cell of the piece that gave the check
+        board: dictionary instance, consisting of cells and their state
+        king_identifier: string, like 'WK' or 'BK'
+    """
+
+    columns = ChessLogic.column_labels
+    king_position = None
+    king_color = "white" if king_identifier[0] == "W" else "black"
+
+    for position, piece in board.items():
+        if piece == king_identifier:
+            king_position = position
+            break
+
+    if not king_position:
+        return False
+
+    current_col = columns.index(king_position[0])
+    current_row = int(king_position[1])
+
+    move_directions = [
+        (0, 1),
+        (0, -1),
+        (1, 0),
+        (-1, 0),
+        (1, 1),
+        (-1, -1),
+        (-1, 1),
+        (1, -1),
+    ]
+
+    if not King.is_king_in_check(board, king_color, king_identifier):
+        return False
+
+    for cell in get_path_between_positions(move, king_position):
+        for position, piece in board.items():
+            if piece == "empty":
+                continue
+
+            if piece[0] == king_color[0].upper() and piece[1] != "K":
+                piece_class = ChessLogic.piece_classes[piece[1]]
+                chess_piece = piece_class(king_color, board)
+
+                if chess_piece.validate_move(position, cell):
+                    return False
+
+    king = King(king_color, board)
+
+    for col_delta, row_delta in move_directions:
+        new_col = current_col + col_delta
+        new_row = current_row + row_delta
+
+        if 0 <= new_col <= 7 and 1 <= new_row <= 8:
+            new_position = columns[new_col] + str(new_row)
+
+            if not king.validate_move(king_position, new_position):
+                continue
+
+            # Probe the cell by moving the king in place, then put the board back
+            captured = board[new_position]
+            board[king_position] = "empty"
+            board[new_position] = king_identifier
+
+            try:
+                in_check = King.is_king_in_check(board, king_color, king_identifier)
+            finally:
+                board[new_position] = captured
+                board[king_position] = king_identifier
+
+            if not in_check:
+                return False
+
+    return True
+
+
+class ReferencePosition(Position):
+    """
+    Position as it was before Position.score, put_piece and remove_piece
+    update only the bitboards and the key. Its score stays 0
+    """
+
+    def put_piece(self, square: int, piece: int) -> None:
+        if self.squares[square] is not None:
+            self.remove_piece(square)
+
+        mask = 1 << square
+
+        self.pieces[piece] |= mask
+        self.occupancy[piece // 6] |= mask
+        self.occupied |= mask
+        self.squares[square] = piece
+        self.key ^= PIECE_KEYS[piece][square]
+
+    def remove_piece(self, square: int) -> int | None:
+        piece = self.squares[square]
+
+        if piece is None:
+            return None
+
+        mask = ~(1 << square)
+
+        self.pieces[piece] &= mask
+        self.occupancy[piece // 6] &= mask
+        self.occupied &= mask
+        self.squares[square] = None
+        self.key ^= PIECE_KEYS[piece][square]
+
+        return piece
+
+
+def bench_checkmate(number: int = 200) -> list:
+    """
+    Times ChessLogic.is_checkmate on the Position the consumer passes
+    and on the dict grid, and reference_is_checkmate on the dict grid
+
+    Returns:
+        list of (label, seconds per call)
+    """
+
+    logic = ChessLogic()
+    results = []
+
+    for name, fen, king, move in CHECKMATE_POSITIONS:
+        position = Position.from_fen(fen)
+        grid = position.to_grid()
+
+        results.append(
+            (
+                f"{name} (position)",
+                time_call(lambda: logic.is_checkmate(move, position, king), number),
+            )
+        )
+        results.append(
+            (
+                f"{name} (grid)",
+                time_call(lambda: logic.is_checkmate(move, grid, king), number),
+            )
+        )
+        results.append(
+            (
+                f"{name} (reference)",
+                time_call(lambda: reference_is_checkmate(move, grid, king), number),
+            )
+        )
+
+    return results
+
+
+def bench_check_scan(number: int = 200) -> list:
+    """
+    Times King.is_king_in_check scanning the dict grid, where every enemy piece
+    is validated against the king cell
+
+    Returns:
+        list of (label, seconds per call)
+    """
+
+    results = []
+
+    for name, fen, king, _ in CHECKMATE_POSITIONS:
+        grid = Position.from_fen(fen).to_grid()
+        color = "white" if king[0] == "W" else "black"
+
+        results.append(
+            (name, time_call(lambda: King.is_king_in_check(grid, color, king), number))
+        )
+
+    return results
+
+
+def bench_fen(number: int = 2000) -> list:
+    """
+    Times reading and writing Board's stored position, the dict repr
+    read with literal_eval against FEN
+
+    Returns:
+        list of (label, seconds per call)
+    """
+
+    fen = CHECKMATE_POSITIONS[-1][1]
+    grid, state = parse_fen(fen)
+    text = str(grid)
+
+    return [
+        ("literal_eval grid repr", time_call(lambda: literal_eval(text), number)),
+        ("fen_to_grid", time_call(lambda: fen_to_grid(fen), number)),
+        ("parse_fen", time_call(lambda: parse_fen(fen), number)),
+        ("str grid repr", time_call(lambda: str(grid), number)),
+        ("to_fen", time_call(lambda: to_fen(grid, state), number)),
+        ("Position.from_fen", time_call(lambda: Position.from_fen(fen), number)),
+    ]
+
+
+def bench_encoding(number: int = 2000) -> list:
+    """
+    Times the binary position encoding next to FEN
+
+    Returns:
+        list of (label, seconds per call)
+    """
+
+    fen = CHECKMATE_POSITIONS[-1][1]
+    grid, state = parse_fen(fen)
+    position = Position.from_fen(fen)
+    data = encode(grid, state)
+
+    return [
+        ("encode grid", time_call(lambda: encode(grid, state), number)),
+        ("encode position", time_call(lambda: encode(position), number)),
+        ("decode", time_call(lambda: decode(data), number)),
+        ("decode_position", time_call(lambda: decode_position(data), number)),
+        ("to_fen", time_call(lambda: to_fen(grid, state), number)),
+        ("parse_fen", time_call(lambda: parse_fen(fen), number)),
+    ]
+
+
+def bench_wire(number: int = 20000) -> list:
+    """
+    Times encoding and decoding the socket messages of a move with JSON
+    and msgpack, the frame size in bytes is in the label
+
+    Returns:
+        list of (label, seconds per call)
+    """
+
+    results = []
+
+    for name, message in WIRE_MESSAGES.items():
+        text = json.dumps(message)
+        packed = msgpack.packb(message)
+
+        results += [
+            (
+                f"{name} json encode ({len(text.encode())} B)",
+                time_call(lambda: json.dumps(message), number),
+            ),
+            (f"{name} json decode", time_call(lambda: json.loads(text), number)),
+            (
+                f"{name} msgpack encode ({len(packed)} B)",
+                time_call(lambda: msgpack.packb(message), number),
+            ),
+            (
+                f"{name} msgpack decode",
+                time_call(lambda: msgpack.unpackb(packed), number),
+            ),
+        ]
+
+    return results
+
+
+def bench_handle_move(number: int = 20) -> list:
+    """
+    Replays GAME through ChessLogic.handle_move like the consumer does,
+    every move validated on a Position of the game so far
+
+    Returns:
+        list of (label, seconds per move)
+    """
+
+    logic = ChessLogic()
+    position = Position.from_fen(START_FEN)
+    moves = []
+
+    for uci in GAME:
+        move = next(
+            move for move in generate_legal_moves(position) if move_to_uci(move) == uci
+        )
+        moves.append((uci[:2], uci[2:4], position[uci[:2]], position.copy()))
+        position.make_move(move)
+
+    def replay() -> None:
+        for old_cell, new_cell, piece, board in moves:
+            logic.handle_move(old_cell, new_cell, piece, board)
+
+    return [("per move", time_call(replay, number) / len(moves))]
+
+
+def bench_quiescence(number: int = 1) -> list:
+    """
+    Searches QUIESCENCE_POSITIONS with the leaves evaluated as they stand, with
+    quiescence trying captures in the order they are generated and with
+    quiescence in MVV-LVA order. Every search runs once, number is ignored
+
+    Returns:
+        list of (label with the node count, seconds of the search)
+    """
+
+    searches = (
+        ("no quiescence", {"quiescence": False}),
+        ("quiescence unordered", {"ordering": False}),
+        ("quiescence mvv_lva", {}),
+    )
+    results = []
+
+    fens = dict(TACTICAL_POSITIONS)
+
+    for name, depth in QUIESCENCE_POSITIONS:
+        for label, options in searches:
+            position = Position.from_fen(fens[name])
+            result = search(position, depth, nodes=NODE_CAP, **options)
+
+            if result["nodes"] < NODE_CAP:
+                nodes = f"{result['nodes']} nodes"
+            else:
+                nodes = f"stopped at {NODE_CAP} nodes"
+
+            results.append(
+                (f"{name} depth {depth} {label} ({nodes})", result["seconds"])
+            )
+
+    return results
+
+
+def bench_search(number: int = 1) -> list:
+    """
+    Searches TACTICAL_POSITIONS and the starting position to TECHNIQUE_DEPTH
+    without the techniques of TECHNIQUES, with each one alone and with all of
+    them, then reports the depth reached in TIME_BUDGET seconds without and with
+    all of them. Every search runs once, number is ignored
+
+    Returns:
+        list of (label with the node count or depth, seconds of the search)
+    """
+
+    baseline = dict.fromkeys(TECHNIQUES, False)
+    searches = [("baseline", baseline)]
+    searches += [(name, {**baseline, name: True}) for name in TECHNIQUES]
+    searches.append(("all", {}))
+
+    positions = TACTICAL_POSITIONS[1:] + [("start", START_FEN)]
+    results = []
+
+    for name, fen in positions:
+        for label, options in searches:
+            position = Position.from_fen(fen)
+            result = search(
+                position, TECHNIQUE_DEPTH, nodes=TECHNIQUE_NODE_CAP, **options
+            )
+
+            if result["nodes"] < TECHNIQUE_NODE_CAP:
+                nodes = f"{result['nodes']} nodes"
+            else:
+                nodes = f"stopped at {TECHNIQUE_NODE_CAP} nodes"
+
+            results.append(
+                (f"{name} {label} depth {TECHNIQUE_DEPTH} ({nodes})", result["seconds"])
+            )
+
+        for label, options in (searches[0], searches[-1]):
+            result = search(Position.from_fen(fen), time_limit=TIME_BUDGET, **options)
+
+            results.append(
+                (
+                    f"{name} {label} in {TIME_BUDGET * 1000:.0f} ms "
+                    f"(depth {result['depth']})",
+                    result["seconds"],
+                )
+            )
+
+    return results
+
+
+def bench_parallel(number: int = 1) -> list:
+    """
+    Times parallel_search to PARALLEL_DEPTH with every count of PARALLEL_WORKERS,
+    the speedup over one worker is in the label. The machine needs a core per
+    worker for any speedup. Every search runs once, number is ignored
+
+    Returns:
+        list of (label with the nodes and the speedup, seconds of the search)
+    """
+
+    results = []
+
+    for name, fen in (TACTICAL_POSITIONS[-1], ("start", START_FEN)):
+        single = None
+
+        for workers in PARALLEL_WORKERS:
+            with start_pool(workers) as pool:
+                # The processes start before the clock does
+                list(pool.map(abs, range(workers)))
+
+                position = Position.from_fen(fen)
+                result = parallel_search(position, workers, PARALLEL_DEPTH, pool=pool)
+
+            single = single or result["seconds"]
+
+            results.append(
+                (
+                    f"{name} {workers} workers depth {PARALLEL_DEPTH} "
+                    f"({result['nodes']} nodes, {single / result['seconds']:.2f}x)",
+                    result["seconds"],
+                )
+            )
+
+    return results
+
+
+def bench_evaluation(number: int = 200) -> list:
+    """
+    Plays every legal move of TACTICAL_POSITIONS and the starting position,
+    evaluates and takes it back. Position keeps the score up to date in
+    make_move and unmake_move and evaluate reads it, ReferencePosition
+    skips the update and evaluate_from_scratch sums the board instead
+
+    Returns:
+        list of (label with the evaluated moves per second, seconds per move)
+    """
+
+    results = []
+
+    for name, fen in TACTICAL_POSITIONS + [("start", START_FEN)]:
+        moves = generate_legal_moves(Position.from_fen(fen))
+
+        for label, position_class, function in (
+            ("incremental", Position, evaluate),
+            ("from scratch", ReferencePosition, evaluate_from_scratch),
+        ):
+            position = position_class.from_fen(fen)
+
+            def play():
+                for move in moves:
+                    position.make_move(move)
+                    function(position)
+                    position.unmake_move()
+
+            seconds = time_call(play, number) / len(moves)
+
+            results.append((f"{name} {label} ({1 / seconds:,.0f}/s)", seconds))
+
+    return results
+
+
+SUITES = {
+    "checkmate": bench_checkmate,
+    "check_scan": bench_check_scan,
+    "fen": bench_fen,
+    "encoding": bench_encoding,
+    "handle_move": bench_handle_move,
+    "wire": bench_wire,
+    "quiescence": bench_quiescence,
+    "search": bench_search,
+    "parallel": bench_parallel,
+    "evaluation": bench_evaluation,
+}
@@ -0,0 +1,646 @@
+from collections.abc import MutableMapping
+from .chess_tables import (
+    HORSE_ATTACKS,
+    KING_ATTACKS,
+    PAWN_ATTACKS,
+    BETWEEN,
+    LINE,
+    ROOK_LINES,
+    BISHOP_LINES,
+    rook_attacks,
+    bishop_attacks,
+)
+from .chess_zobrist import PIECE_KEYS, CASTLING_KEYS, EN_PASSANT_KEYS, SIDE_KEY
+from .chess_eval import PIECE_SQUARE
+
+WHITE, BLACK = 0, 1
+PAWN, HORSE, BISHOP, ROOK, QUEEN, KING = range(6)
+
+COLOR_LETTERS = "WB"
+PIECE_LETTERS = "PHBRQK"
+
+EMPTY = "empty"
+
+# Squares are numbered a1 = 0, b1 = 1, ..., h1 = 7, a2 = 8, ..., h8 = 63
+SQUARES = [col + str(row) for row in range(1, 9) for col in "abcdefgh"]
+SQUARE_INDEX = {name: index for index, name in enumerate(SQUARES)}
+
+# Piece codes used by Board.grid and the JS client, indexed by color * 6 + piece type
+PIECE_CODES = [color + piece for color in COLOR_LETTERS for piece in PIECE_LETTERS]
+PIECE_INDEX = {code: index for index, code in enumerate(PIECE_CODES)}
+
+FULL_BOARD = (1 << 64) - 1
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+RANK_1 = 0xFF
+RANK_8 = RANK_1 << 56
+
+# Castling rights, one bit per side and color
+WHITE_SHORT, WHITE_LONG, BLACK_SHORT, BLACK_LONG = 1, 2, 4, 8
+ALL_CASTLING = WHITE_SHORT | WHITE_LONG | BLACK_SHORT | BLACK_LONG
+
+# Rights that survive a move touching the square (king or rook leaving, rook captured)
+CASTLING_MASKS = [ALL_CASTLING] * 64
+CASTLING_MASKS[4] &= ~(WHITE_SHORT | WHITE_LONG)  # e1
+CASTLING_MASKS[0] &= ~WHITE_LONG  # a1
+CASTLING_MASKS[7] &= ~WHITE_SHORT  # h1
+CASTLING_MASKS[60] &= ~(BLACK_SHORT | BLACK_LONG)  # e8
+CASTLING_MASKS[56] &= ~BLACK_LONG  # a8
+CASTLING_MASKS[63] &= ~BLACK_SHORT  # h8
+
+# Moves are plain ints: from square | to square << 6 | promotion << 12 | flag << 15,
+# where promotion is the piece type the pawn turns into (0 when it is not a promotion)
+NORMAL, DOUBLE_PUSH, EN_PASSANT, CASTLE = range(4)
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# FEN uses N for the knight, the rest of the site calls it a horse (H)
+FEN_PIECES = {
+    letter if color == WHITE else letter.lower(): color * 6 + piece_type
+    for color in (WHITE, BLACK)
+    for piece_type, letter in enumerate("PNBRQK")
+}
+FEN_CASTLING = {"K": WHITE_SHORT, "Q": WHITE_LONG, "k": BLACK_SHORT, "q": BLACK_LONG}
+
+
+def piece_index(color: int, piece_type: int) -> int:
+    return color * 6 + piece_type
+
+
+def encode_move(
+    from_square: int, to_square: int, promotion: int = 0, flag: int = NORMAL
+) -> int:
+    return from_square | to_square << 6 | promotion << 12 | flag << 15
+
+
+def lsb(bitboard: int) -> int:
+    """Index of the least significant set bit"""
+
+    return (bitboard & -bitboard).bit_length() - 1
+
+
+def iter_squares(bitboard: int):
+    """Yields the index of every set bit, from a1 towards h8"""
+
+    while bitboard:
+        low = bitboard & -bitboard
+        yield low.bit_length() - 1
+        bitboard ^= low
+
+
+class Position(MutableMapping):
+    """
+    Bitboard representation of a chess position: one 64-bit integer
+    per piece code plus occupancy masks for each color and both colors.
+
+    It also behaves like the dict grid ({"e1": "WK", "e2": "empty", ...}),
+    so the piece classes and ChessLogic can run on it unchanged.
+    """
+
+    def __init__(self):
+        self.pieces = [0] * 12
+        self.occupancy = [0, 0]
+        self.occupied = 0
+        # Piece index standing on every square, None when the square is empty
+        self.squares = [None] * 64
+
+        self.turn = WHITE
+        self.castling = 0
+        self.ep_square = None
+        self.halfmove_clock = 0
+        self.fullmove_number = 1
+
+        # Zobrist key, updated incrementally with every change of the position
+        self.key = 0
+        # Material and piece-square score for white, kept up to date the same way
+        self.score = 0
+
+        # check_info of both kings with the key they were computed for
+        self._check_cache = [None, None]
+
+        # What make_move needs to take every played move back
+        self.history = []
+
+    @classmethod
+    def from_grid(
+        cls,
+        grid: dict,
+        turn: int = WHITE,
+        castling: int = None,
+        ep_square: int = None,
+    ) -> "Position":
+        """
+        Builds a position from the dict grid stored in Board.grid
+
+        Arguments:
+            grid: dictionary instance, consisting of cells and their state
+            turn: WHITE or BLACK, the side to move
+            castling: castling rights, when None every king and rook
+                still standing on its starting cell keeps its right
+            ep_square: square a pawn can capture en passant on, if any
+
+        Returns:
+            Position
+        """
+
+        position = cls()
+
+        for cell, piece in grid.items():
+            if piece != EMPTY:
+                position.put_piece(SQUARE_INDEX[cell], PIECE_INDEX[piece])
+
+        position.turn = turn
+        if castling is None:
+            castling = position._home_castling()
+
+        position.castling = castling
+        position.ep_square = ep_square
+        position.key = position.compute_key()
+
+        return position
+
+    @classmethod
+    def from_fen(cls, fen: str) -> "Position":
+        """Builds a position from a FEN string"""
+
+        placement, turn, castling, ep_square, *clocks = fen.split()
+
+        position = cls()
+
+        for row, rank in enumerate(reversed(placement.split("/"))):
+            col = 0
+
+            for char in rank:
+                if char.isdigit():
+                    col += int(char)
+                else:
+                    position.put_piece(row * 8 + col, FEN_PIECES[char])
+                    col += 1
+
+        position.turn = WHITE if turn == "w" else BLACK
+
+        for char in castling:
+            position.castling |= FEN_CASTLING.get(char, 0)
+
+        position.ep_square = None if ep_square == "-" else SQUARE_INDEX[ep_square]
+
+        if clocks:
+            position.halfmove_clock = int(clocks[0])
+            position.fullmove_number = int(clocks[1])
+
+        position.key = position.compute_key()
+
+        return position
+
+    def to_fen(self) -> str:
+        """FEN string of the position, from_fen reads it back"""
+
+        letters = {piece: letter for letter, piece in FEN_PIECES.items()}
+        ranks = []
+
+        for row in range(7, -1, -1):
+            rank = ""
+            empty = 0
+
+            for piece in self.squares[row * 8 : row * 8 + 8]:
+                if piece is None:
+                    empty += 1
+                    continue
+
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+
+                rank += letters[piece]
+
+            ranks.append(rank + str(empty) if empty else rank)
+
+        castling = "".join(
+            char for char, right in FEN_CASTLING.items() if self.castling & right
+        )
+
+        return " ".join(
+            (
+                "/".join(ranks),
+                "w" if self.turn == WHITE else "b",
+                castling or "-",
+                "-" if self.ep_square is None else SQUARES[self.ep_square],
+                str(self.halfmove_clock),
+                str(self.fullmove_number),
+            )
+        )
+
+    def compute_key(self) -> int:
+        """Zobrist key of the position computed from scratch"""
+
+        key = CASTLING_KEYS[self.castling] ^ self._en_passant_key()
+
+        for square, piece in enumerate(self.squares):
+            if piece is not None:
+                key ^= PIECE_KEYS[piece][square]
+
+        if self.turn == BLACK:
+            key ^= SIDE_KEY
+
+        return key
+
+    def _en_passant_key(self) -> int:
+        """
+        Part of the key for the en passant cell. It only counts when a pawn
+        can actually capture there, otherwise the position repeats without it.
+        """
+
+        if self.ep_square is None:
+            return 0
+
+        us = self.turn
+
+        if PAWN_ATTACKS[us ^ 1][self.ep_square] & self.pieces[us * 6 + PAWN]:
+            return EN_PASSANT_KEYS[self.ep_square & 7]
+
+        return 0
+
+    def repetitions(self) -> int:
+        """How many times the current position occurred before in the played moves"""
+
+        count = 0
+
+        # Positions before the last capture or pawn move can't repeat
+        for undo in self.history[max(len(self.history) - self.halfmove_clock, 0) :]:
+            if undo[-1] == self.key:
+                count += 1
+
+        return count
+
+    def _home_castling(self) -> int:
+        """Castling rights implied by the kings and rooks standing on their starting cells"""
+
+        castling = 0
+        squares = self.squares
+
+        for color, row in ((WHITE, 0), (BLACK, 56)):
+            if squares[row + 4] != color * 6 + KING:
+                continue
+
+            if squares[row + 7] == color * 6 + ROOK:
+                castling |= WHITE_SHORT << (color * 2)
+            if squares[row] == color * 6 + ROOK:
+                castling |= WHITE_LONG << (color * 2)
+
+        return castling
+
+    def to_grid(self) -> dict:
+        """Converts the position back to the dict grid used by Board.grid and the JS client"""
+
+        return {
+            name: EMPTY if piece is None else PIECE_CODES[piece]
+            for name, piece in zip(SQUARES, self.squares)
+        }
+
+    def copy(self) -> "Position":
+        position = self.__class__.__new__(self.__class__)
+        position.pieces = self.pieces.copy()
+        position.occupancy = self.occupancy.copy()
+        position.occupied = self.occupied
+        position.squares = self.squares.copy()
+
+        position.turn = self.turn
+        position.castling = self.castling
+        position.ep_square = self.ep_square
+        position.halfmove_clock = self.halfmove_clock
+        position.fullmove_number = self.fullmove_number
+        position.key = self.key
+        position.score = self.score
+        position._check_cache = self._check_cache.copy()
+        position.history = self.history.copy()
+
+        return position
+
+    def put_piece(self, square: int, piece: int) -> None:
+        """Places the piece on the square, replacing whatever stood there"""
+
+        if self.squares[square] is not None:
+            self.remove_piece(square)
+
+        mask = 1 << square
+
+        self.pieces[piece] |= mask
+        self.occupancy[piece // 6] |= mask
+        self.occupied |= mask
+        self.squares[square] = piece
+        self.key ^= PIECE_KEYS[piece][square]
+        self.score += PIECE_SQUARE[piece][square]
+
+    def remove_piece(self, square: int) -> int | None:
+        """Removes and returns the piece standing on the square"""
+
+        piece = self.squares[square]
+
+        if piece is None:
+            return None
+
+        mask = ~(1 << square)
+
+        self.pieces[piece] &= mask
+        self.occupancy[piece // 6] &= mask
+        self.occupied &= mask
+        self.squares[square] = None
+        self.key ^= PIECE_KEYS[piece][square]
+        self.score -= PIECE_SQUARE[piece][square]
+
+        return piece
+
+    def king_square(self, color: int) -> int | None:
+        kings = self.pieces[piece_index(color, KING)]
+
+        return lsb(kings) if kings else None
+
+    def attackers_to(self, square: int, color: int, occupied: int = None) -> int:
+        """
+        Bitboard of the pieces of the given color attacking the square
+
+        Arguments:
+            square: int, square index
+            color: WHITE or BLACK, the attacking side
+            occupied: occupancy used to block sliding pieces, defaults to the current one
+
+        Returns:
+            int
+        """
+
+        if occupied is None:
+            occupied = self.occupied
+
+        base = color * 6
+        pieces = self.pieces
+
+        rooks_and_queens = pieces[base + ROOK] | pieces[base + QUEEN]
+        bishops_and_queens = pieces[base + BISHOP] | pieces[base + QUEEN]
+
+        # A pawn of the given color attacks the square from wherever
+        # a pawn of the other color standing on the square would attack
+        return (
+            (PAWN_ATTACKS[color ^ 1][square] & pieces[base + PAWN])
+            | (HORSE_ATTACKS[square] & pieces[base + HORSE])
+            | (KING_ATTACKS[square] & pieces[base + KING])
+            | (rook_attacks(square, occupied) & rooks_and_queens)
+            | (bishop_attacks(square, occupied) & bishops_and_queens)
+        )
+
+    def check_info(self, color: int) -> tuple:
+        """
+        Checkers, pinned pieces and evasion mask of the king of the given color.
+        Computed once per position and cached until the key changes.
+
+        Returns:
+            (checkers, pinned, evasion), bitboards. Without a check the evasion
+            mask is the full board, in double check it's empty since only the king
+            can move, otherwise it covers the checker and the cells in between.
+        """
+
+        cached = self._check_cache[color]
+
+        if cached is not None and cached[0] == self.key:
+            return cached[1]
+
+        king = self.king_square(color)
+
+        if king is None:
+            info = (0, 0, FULL_BOARD)
+        else:
+            them = color ^ 1
+            base = them * 6
+            pieces = self.pieces
+            checkers = self.attackers_to(king, them)
+
+            # Enemy sliders lined up with the king, a single own piece between pins it
+            queens = pieces[base + QUEEN]
+            snipers = ROOK_LINES[king] & (pieces[base + ROOK] | queens)
+            snipers |= BISHOP_LINES[king] & (pieces[base + BISHOP] | queens)
+            pinned = 0
+
+            for sniper in iter_squares(snipers):
+                blockers = BETWEEN[king][sniper] & self.occupied
+
+                if blockers and not blockers & (blockers - 1):
+                    pinned |= blockers & self.occupancy[color]
+
+            if not checkers:
+                evasion = FULL_BOARD
+            elif checkers & (checkers - 1):
+                evasion = 0
+            else:
+                evasion = checkers | BETWEEN[king][lsb(checkers)]
+
+            info = (checkers, pinned, evasion)
+
+        self._check_cache[color] = (self.key, info)
+
+        return info
+
+    def is_legal(self, from_square: int, to_square: int) -> bool:
+        """
+        Whether the move of the piece on from_square, which has to follow
+        the piece rules already, leaves its own king safe. Apart from
+        king moves and en passant it's a couple of mask tests on check_info.
+        """
+
+        piece = self.squares[from_square]
+
+        if piece is None:
+            return False
+
+        color = piece // 6
+        them = color ^ 1
+        checkers, pinned, evasion = self.check_info(color)
+
+        if piece % 6 == KING:
+            # Castling, the king can't castle out of check
+            if abs(to_square - from_square) == 2:
+                return not checkers and not self.is_attacked(to_square, them)
+
+            # The king mustn't hide behind itself from a slider
+            occupied = self.occupied ^ (1 << from_square)
+
+            return not self.attackers_to(to_square, them, occupied)
+
+        if piece % 6 == PAWN and to_square == self.ep_square:
+            # The captured pawn leaves the board too, so play it out in place
+            behind = to_square - 8 if color == WHITE else to_square + 8
+            captured = self.remove_piece(behind)
+            self.remove_piece(from_square)
+            self.put_piece(to_square, piece)
+
+            try:
+                return not self.in_check(color)
+            finally:
+                self.remove_piece(to_square)
+                self.put_piece(from_square, piece)
+                if captured is not None:
+                    self.put_piece(behind, captured)
+
+        if not evasion >> to_square & 1:
+            return False
+
+        if pinned >> from_square & 1:
+            king = self.king_square(color)
+
+            return bool(LINE[king][from_square] >> to_square & 1)
+
+        return True
+
+    def is_attacked(self, square: int, color: int) -> bool:
+        return self.attackers_to(square, color) != 0
+
+    def in_check(self, color: int) -> bool:
+        """Whether the king of the given color is attacked"""
+
+        king = self.king_square(color)
+
+        if king is None:
+            return False
+
+        return self.is_attacked(king, color ^ 1)
+
+    def make_move(self, move: int) -> None:
+        """
+        Plays a move from the move generator on the position in place.
+        unmake_move takes it back, restoring the position exactly.
+        """
+
+        from_square = move & 63
+        to_square = move >> 6 & 63
+        promotion = move >> 12 & 7
+        flag = move >> 15
+        key = self.key
+
+        # The pieces are hashed by put_piece and remove_piece, the rest is swapped here
+        self.key ^= CASTLING_KEYS[self.castling] ^ self._en_passant_key() ^ SIDE_KEY
+
+        piece = self.remove_piece(from_square)
+        color = piece // 6
+
+        if flag == EN_PASSANT:
+            # The captured pawn stands behind the target cell
+            behind = to_square - 8 if color == WHITE else to_square + 8
+            captured = self.remove_piece(behind)
+        else:
+            captured = self.remove_piece(to_square)
+
+        self.history.append(
+            (move, captured, self.castling, self.ep_square, self.halfmove_clock, key)
+        )
+
+        self.put_piece(to_square, color * 6 + promotion if promotion else piece)
+
+        if flag == CASTLE:
+            if to_square > from_square:
+                self.put_piece(to_square - 1, self.remove_piece(to_square + 1))
+            else:
+                self.put_piece(to_square + 1, self.remove_piece(to_square - 2))
+
+        self.castling &= CASTLING_MASKS[from_square] & CASTLING_MASKS[to_square]
+        self.ep_square = (from_square + to_square) // 2 if flag == DOUBLE_PUSH else None
+
+        if piece % 6 == PAWN or captured is not None:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+
+        if color == BLACK:
+            self.fullmove_number += 1
+
+        self.turn = color ^ 1
+        self.key ^= CASTLING_KEYS[self.castling] ^ self._en_passant_key()
+
+    def unmake_move(self) -> int:
+        """Takes back the last move played with make_move and returns it"""
+
+        move, captured, castling, ep_square, halfmove_clock, key = self.history.pop()
+
+        from_square = move & 63
+        to_square = move >> 6 & 63
+        promotion = move >> 12 & 7
+        flag = move >> 15
+
+        piece = self.remove_piece(to_square)
+        color = piece // 6
+
+        self.put_piece(from_square, color * 6 + PAWN if promotion else piece)
+
+        if flag == CASTLE:
+            if to_square > from_square:
+                self.put_piece(to_square + 1, self.remove_piece(to_square - 1))
+            else:
+                self.put_piece(to_square - 2, self.remove_piece(to_square + 1))
+
+        if captured is not None:
+            if flag == EN_PASSANT:
+                behind = to_square - 8 if color == WHITE else to_square + 8
+                self.put_piece(behind, captured)
+            else:
+                self.put_piece(to_square, captured)
+
+        self.castling = castling
+        self.ep_square = ep_square
+        self.halfmove_clock = halfmove_clock
+        # Putting the pieces back only undid their part of the key
+        self.key = key
+
+        if color == BLACK:
+            self.fullmove_number -= 1
+
+        self.turn = color
+
+        return move
+
+    def make_null_move(self) -> None:
+        """
+        Passes the turn without moving, for null move pruning in the search.
+        unmake_null_move takes it back
+        """
+
+        self.history.append(
+            (0, None, self.castling, self.ep_square, self.halfmove_clock, self.key)
+        )
+
+        self.key ^= self._en_passant_key() ^ SIDE_KEY
+        self.ep_square = None
+        # Nothing before a pass counts for repetitions
+        self.halfmove_clock = 0
+        self.turn ^= 1
+
+    def unmake_null_move(self) -> None:
+        _, _, _, ep_square, halfmove_clock, key = self.history.pop()
+
+        self.ep_square = ep_square
+        self.halfmove_clock = halfmove_clock
+        self.key = key
+        self.turn ^= 1
+
+    # Dict interface, so Position can stand in for the dict grid
+
+    def __getitem__(self, cell: str) -> str:
+        piece = self.squares[SQUARE_INDEX[cell]]
+
+        return EMPTY if piece is None else PIECE_CODES[piece]
+
+    def __setitem__(self, cell: str, piece: str) -> None:
+        square = SQUARE_INDEX[cell]
+
+        if piece == EMPTY:
+            self.remove_piece(square)
+        else:
+            self.put_piece(square, PIECE_INDEX[piece])
+
+    def __delitem__(self, cell: str) -> None:
+        self.remove_piece(SQUARE_INDEX[cell])
+
+    def __iter__(self):
+        return iter(SQUARES)
+
+    def __len__(self) -> int:
+        return 64
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.to_grid()!r})"
@@ -0,0 +1,179 @@
+from struct import Struct
+
+from .chess_bitboard import (
+    Position,
+    WHITE,
+    BLACK,
+    EMPTY,
+    SQUARES,
+    SQUARE_INDEX,
+    PIECE_CODES,
+    PIECE_INDEX,
+    COLOR_LETTERS,
+    iter_squares,
+)
+from .chess_state import GameState
+
+# Binary form of a position, 14 bytes of header followed by the pieces:
+#   occupancy   8 bytes, bit n set when square n (a1 = 0) holds a piece
+#   flags       1 byte, side to move in bit 0 and the castling rights in bits 1-4
+#   en passant  1 byte, the square or NO_SQUARE
+#   halfmove    1 byte, the halfmove clock capped at 255
+#   fullmove    2 bytes
+#   check       1 byte, the checking piece's square | checked king color << 6,
+#               or NO_SQUARE
+#   pieces      a 4 bit piece index per occupied square, in square order,
+#               two per byte with the lower square in the low nibble
+# The starting position takes 30 bytes, any position at most 46.
+HEADER = Struct("<QBBBHB")
+
+NO_SQUARE = 0xFF
+
+# Lookup tables for decoding a byte at a time: the set bits of every byte,
+# and its two piece indexes, None for a nibble that is no piece
+_BITS = [tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256)]
+_NIBBLES = [
+    tuple(
+        piece if piece < len(PIECE_CODES) else None
+        for piece in (byte & 15, byte >> 4)
+    )
+    for byte in range(256)
+]
+
+
+def encode(board, state: GameState = None) -> bytes:
+    """
+    Packs the position into bytes
+
+    Arguments:
+        board: dictionary instance or Position
+        state: GameState of the game, for a Position it defaults to
+            the side to move, castling, en passant and clocks of the position
+
+    Returns:
+        bytes, decode reads them back
+    """
+
+    if isinstance(board, Position):
+        occupancy = board.occupied
+        pieces = [board.squares[square] for square in iter_squares(occupancy)]
+
+        if state is None:
+            state = GameState(
+                side_to_move=board.turn,
+                castling=board.castling,
+                en_passant="" if board.ep_square is None else SQUARES[board.ep_square],
+                halfmove_clock=board.halfmove_clock,
+                fullmove_number=board.fullmove_number,
+            )
+    else:
+        occupancy = 0
+        pieces = []
+
+        for square, cell in enumerate(SQUARES):
+            piece = board[cell]
+
+            if piece != EMPTY:
+                occupancy |= 1 << square
+                pieces.append(PIECE_INDEX[piece])
+
+    if state is None:
+        state = GameState()
+
+    check = NO_SQUARE
+
+    if state.checked_king and state.check_position:
+        color = COLOR_LETTERS.index(state.checked_king[0])
+        check = SQUARE_INDEX[state.check_position] | color << 6
+
+    header = HEADER.pack(
+        occupancy,
+        state.side_to_move | state.castling << 1,
+        SQUARE_INDEX[state.en_passant] if state.en_passant else NO_SQUARE,
+        min(state.halfmove_clock, 255),
+        state.fullmove_number,
+        check,
+    )
+
+    # Pad to an even count so the pieces pair up into bytes
+    if len(pieces) & 1:
+        pieces.append(0)
+
+    return header + bytes(
+        low | high << 4 for low, high in zip(pieces[::2], pieces[1::2])
+    )
+
+
+def _unpack(data: bytes) -> tuple:
+    """The header fields and the list of (square, piece index) of the encoded position"""
+
+    if len(data) < HEADER.size:
+        raise ValueError(f"Encoded position is too short: {len(data)} bytes")
+
+    _, flags, en_passant, halfmove, fullmove, check = HEADER.unpack_from(data)
+
+    bits = _BITS
+    # The occupancy is little endian, byte n holds the squares of row n
+    squares = [
+        row * 8 + bit for row, byte in enumerate(data[:8]) for bit in bits[byte]
+    ]
+    packed = data[HEADER.size :]
+
+    if len(packed) != (len(squares) + 1) // 2:
+        raise ValueError(
+            f"Encoded position has {len(packed)} piece bytes for {len(squares)} pieces"
+        )
+
+    nibbles = _NIBBLES
+    pieces = [piece for byte in packed for piece in nibbles[byte]][: len(squares)]
+
+    if None in pieces:
+        raise ValueError("Encoded position has an unknown piece code")
+
+    state = GameState(
+        side_to_move=flags & 1,
+        castling=flags >> 1 & 0xF,
+        en_passant="" if en_passant == NO_SQUARE else SQUARES[en_passant],
+        halfmove_clock=halfmove,
+        fullmove_number=fullmove,
+    )
+
+    if check != NO_SQUARE:
+        state.checked_king = COLOR_LETTERS[check >> 6] + "K"
+        state.check_position = SQUARES[check & 63]
+
+    return zip(squares, pieces), state
+
+
+def decode(data: bytes) -> tuple:
+    """
+    Unpacks bytes made by encode
+
+    Returns:
+        (grid, state), the dict grid and the GameState
+    """
+
+    pieces, state = _unpack(data)
+    grid = dict.fromkeys(SQUARES, EMPTY)
+    grid.update((SQUARES[square], PIECE_CODES[piece]) for square, piece in pieces)
+
+    return grid, state
+
+
+def decode_position(data: bytes) -> Position:
+    """Unpacks bytes made by encode straight into a Position"""
+
+    pieces, state = _unpack(data)
+    position = Position()
+
+    for square, piece in pieces:
+        position.put_piece(square, piece)
+
+    position.turn = WHITE if state.side_to_move == WHITE else BLACK
+    position.castling = state.castling
+    position.ep_square = SQUARE_INDEX.get(state.en_passant)
+    position.halfmove_clock = state.halfmove_clock
+    position.fullmove_number = state.fullmove_number
+    position.key = position.compute_key()
+
+    return position
@@ -0,0 +1,123 @@
+# Static evaluation: material plus piece-square tables, in centipawns.
+# Position keeps the sum of PIECE_SQUARE over its pieces in Position.score,
+# updated by put_piece and remove_piece, so evaluating costs no board scan.
+
+# Piece.weight of pawn, horse, bishop, rook, queen and king, the pieces take
+# theirs from here
+PIECE_WEIGHTS = (1, 3, 3, 5, 9, 0)
+
+# The same weights in centipawns
+PIECE_VALUES = tuple(weight * 100 for weight in PIECE_WEIGHTS)
+
+# Bonus of a piece on every cell, from white's side with rank 8 on top
+# like the board is drawn. Black reads them mirrored. The king table is
+# the middlegame one, the king is kept behind its pawns.
+PAWN_TABLE = (
+      0,   0,   0,   0,   0,   0,   0,   0,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     10,  10,  20,  30,  30,  20,  10,  10,
+      5,   5,  10,  25,  25,  10,   5,   5,
+      0,   0,   0,  20,  20,   0,   0,   0,
+      5,  -5, -10,   0,   0, -10,  -5,   5,
+      5,  10,  10, -20, -20,  10,  10,   5,
+      0,   0,   0,   0,   0,   0,   0,   0,
+)
+
+HORSE_TABLE = (
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20,   0,   0,   0,   0, -20, -40,
+    -30,   0,  10,  15,  15,  10,   0, -30,
+    -30,   5,  15,  20,  20,  15,   5, -30,
+    -30,   0,  15,  20,  20,  15,   0, -30,
+    -30,   5,  10,  15,  15,  10,   5, -30,
+    -40, -20,   0,   5,   5,   0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+)
+
+BISHOP_TABLE = (
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,  10,  10,   5,   0, -10,
+    -10,   5,   5,  10,  10,   5,   5, -10,
+    -10,   0,  10,  10,  10,  10,   0, -10,
+    -10,  10,  10,  10,  10,  10,  10, -10,
+    -10,   5,   0,   0,   0,   0,   5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+)
+
+ROOK_TABLE = (
+      0,   0,   0,   0,   0,   0,   0,   0,
+      5,  10,  10,  10,  10,  10,  10,   5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+      0,   0,   0,   5,   5,   0,   0,   0,
+)
+
+QUEEN_TABLE = (
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,   5,   5,   5,   0, -10,
+     -5,   0,   5,   5,   5,   5,   0,  -5,
+      0,   0,   5,   5,   5,   5,   0,  -5,
+    -10,   5,   5,   5,   5,   5,   0, -10,
+    -10,   0,   5,   0,   0,   0,   0, -10,
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+)
+
+KING_TABLE = (
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+     20,  20,   0,   0,   0,   0,  20,  20,
+     20,  30,  10,   0,   0,  10,  30,  20,
+)
+
+TABLES = (PAWN_TABLE, HORSE_TABLE, BISHOP_TABLE, ROOK_TABLE, QUEEN_TABLE, KING_TABLE)
+
+
+def _piece_square(piece: int) -> list:
+    """Value plus table bonus of the piece on every square, negative for black"""
+
+    piece_type = piece % 6
+    table = TABLES[piece_type]
+    value = PIECE_VALUES[piece_type]
+
+    # Square a1 = 0 is the start of the table's last row for white, black
+    # sees the board upside down and reads the table rows in square order
+    if piece < 6:
+        return [
+            value + table[(7 - square // 8) * 8 + square % 8] for square in range(64)
+        ]
+
+    return [-value - table[square] for square in range(64)]
+
+
+# PIECE_SQUARE[piece][square], piece is color * 6 + piece type like in chess_bitboard
+PIECE_SQUARE = [_piece_square(piece) for piece in range(12)]
+
+
+def evaluate(position) -> int:
+    """
+    Static evaluation of the Position from the side to move's point of view,
+    read from the score kept up to date by make_move and unmake_move
+    """
+
+    return position.score if position.turn == 0 else -position.score
+
+
+def evaluate_from_scratch(position) -> int:
+    """evaluate summed over the 64 squares, what Position.score saves"""
+
+    score = 0
+
+    for square, piece in enumerate(position.squares):
+        if piece is not None:
+            score += PIECE_SQUARE[piece][square]
+
+    return score if position.turn == 0 else -score
@@ -0,0 +1,118 @@
+from .chess_bitboard import (
+    WHITE,
+    BLACK,
+    EMPTY,
+    SQUARES,
+    PIECE_CODES,
+    FEN_PIECES,
+    FEN_CASTLING,
+    START_FEN,
+)
+from .chess_state import GameState
+
+# A board before the game starts, with the rights of a fresh GameState
+BLANK_FEN = "8/8/8/8/8/8/8/8 w KQkq - 0 1"
+
+# Cell names in the order FEN lists them, a8 to h8 first and a1 to h1 last
+FEN_ORDER = [SQUARES[row * 8 + col] for row in range(7, -1, -1) for col in range(8)]
+
+# What every character of the placement field expands to
+_EXPAND = {letter: [PIECE_CODES[piece]] for letter, piece in FEN_PIECES.items()}
+_EXPAND.update({str(count): [EMPTY] * count for count in range(1, 9)})
+_EXPAND["/"] = []
+
+_LETTERS = {PIECE_CODES[piece]: letter for letter, piece in FEN_PIECES.items()}
+
+
+def fen_to_grid(fen: str) -> dict:
+    """Dict grid of the piece placement, the first field of the FEN"""
+
+    cells = []
+    expand = _EXPAND
+
+    for char in fen.split(" ", 1)[0]:
+        cells += expand[char]
+
+    if len(cells) != 64:
+        raise ValueError(f"Invalid FEN placement: {fen!r}")
+
+    return dict(zip(FEN_ORDER, cells))
+
+
+def grid_to_placement(grid: dict) -> str:
+    """Piece placement field of the FEN for the dict grid"""
+
+    letters = _LETTERS
+    ranks = []
+
+    for start in range(0, 64, 8):
+        rank = ""
+        empty = 0
+
+        for cell in FEN_ORDER[start : start + 8]:
+            letter = letters.get(grid[cell])
+
+            if letter is None:
+                empty += 1
+                continue
+
+            if empty:
+                rank += str(empty)
+                empty = 0
+
+            rank += letter
+
+        ranks.append(rank + str(empty) if empty else rank)
+
+    return "/".join(ranks)
+
+
+def parse_fen(fen: str) -> tuple:
+    """
+    Parses the whole FEN
+
+    Returns:
+        (grid, state), the dict grid and a GameState with the side to move,
+        castling rights, en passant cell and move clocks
+    """
+
+    fields = fen.split()
+
+    if len(fields) != 6:
+        raise ValueError(f"Invalid FEN: {fen!r}")
+
+    placement, turn, castling, en_passant, halfmove_clock, fullmove_number = fields
+
+    rights = 0
+
+    for char in castling:
+        rights |= FEN_CASTLING.get(char, 0)
+
+    state = GameState(
+        side_to_move=WHITE if turn == "w" else BLACK,
+        castling=rights,
+        en_passant="" if en_passant == "-" else en_passant,
+        halfmove_clock=int(halfmove_clock),
+        fullmove_number=int(fullmove_number),
+    )
+
+    return fen_to_grid(placement), state
+
+
+def to_fen(grid: dict, state: GameState) -> str:
+    """FEN of the dict grid together with the game state"""
+
+    castling = "".join(
+        char for char, right in FEN_CASTLING.items() if state.castling & right
+    )
+
+    return " ".join(
+        (
+            grid_to_placement(grid),
+            "w" if state.side_to_move == WHITE else "b",
+            castling or "-",
+            state.en_passant or "-",
+            str(state.halfmove_clock),
+            str(state.fullmove_number),
+        )
+    )
@@ -1,10 +1,27 @@
+from .chess_bitboard import (
+    Position,
+    WHITE,
+    BLACK,
+    PAWN,
+    KING,
+    COLOR_LETTERS,
+    PIECE_INDEX,
+    PIECE_LETTERS,
+    SQUARES,
+    SQUARE_INDEX,
+    NORMAL,
+    DOUBLE_PUSH,
+    EN_PASSANT,
+    CASTLE,
+    encode_move,
+    lsb,
+)
+from .chess_movegen import has_legal_move
 from .chess_pieces import Rook, Pawn, Horse, Bishop, King, Queen
-from .chess_utils import get_path_between_positions
+from .chess_state import GameState
 
 
 class ChessLogic:
-    last_side_to_move = "B"
-    path = []
     column_labels = ["a", "b", "c", "d", "e", "f", "g", "h"]
 
     piece_classes = {
@@ -19,11 +36,72 @@ class ChessLogic:
     output = {
         "move_valid": False,
         "checkmate": False,
+        "stalemate": False,
         "winner": "somebody",
         "check": False,
         "en_passant": False,
     }
 
+    @staticmethod
+    def _make_probe(board: dict, current_pos: str, target_pos: str, piece: str) -> None:
+        """Moves the piece on the board in place, _unmake_probe takes it back"""
+
+        board[current_pos] = "empty"
+        board[target_pos] = piece
+
+    @staticmethod
+    def _unmake_probe(
+        board: dict, current_pos: str, target_pos: str, original: str, captured: str
+    ) -> None:
+        board[target_pos] = captured
+        board[current_pos] = original
+
+    @staticmethod
+    def _position(board: dict, state: GameState) -> Position:
+        """
+        The board as a Position. A dict grid has no en passant cell
+        or castling rights, they are taken from the state
+        """
+
+        if isinstance(board, Position):
+            return board
+
+        ep_square = SQUARE_INDEX[state.en_passant] if state.en_passant else None
+
+        return Position.from_grid(board, state.side_to_move, state.castling, ep_square)
+
+    @staticmethod
+    def _probe_move(
+        position: Position, current_pos: str, target_pos: str, piece: str
+    ) -> int:
+        """
+        The validated move as the int make_move plays, with the flag of
+        a double push, en passant capture or castle and the promotion.
+        A promotion comes as the piece the pawn becomes, a castle may come
+        as the king dropped on its rook's cell
+        """
+
+        from_square = SQUARE_INDEX[current_pos]
+        to_square = SQUARE_INDEX[target_pos]
+        moved = position.squares[from_square] % 6
+        promotion = 0
+        flag = NORMAL
+
+        if moved == PAWN:
+            if abs(to_square - from_square) == 16:
+                flag = DOUBLE_PUSH
+            elif to_square == position.ep_square:
+                flag = EN_PASSANT
+            elif piece[1] != "P":
+                promotion = PIECE_LETTERS.index(piece[1])
+
+        # The rules only let the king go this far from its starting cell to castle
+        elif moved == KING and to_square - from_square in (2, 3, -2, -4):
+            flag = CASTLE
+            to_square = from_square + 2 if to_square > from_square else from_square - 2
+
+        return encode_move(from_square, to_square, promotion, flag)
+
     def handle_check(
         self,
         current_pos: str,
@@ -32,7 +110,10 @@ class ChessLogic:
     ) -> None | dict:
         """
         Checks whether the white or black king is currently under check.
-        If so block all moves except the moves of the checked king
+        If so block all moves except the ones getting the checked king out of it.
+        Checkers, pins and the evasion mask come from Position.check_info,
+        which is computed once per position, so every move is a few mask tests.
+        The check is recorded in the game state of the chess_piece
         """
 
         # NOTE Returns None in these cases:
@@ -44,109 +125,77 @@ class ChessLogic:
 
         standart_output["processed_cell"] = target_pos
 
-        path = []
-        piece_color = chess_piece.side
-        piece_name = piece_color[0].upper() + chess_piece.__class__.__name__[0]
         board = chess_piece.grid
+        state = chess_piece.state
+        color = WHITE if chess_piece.side == "white" else BLACK
 
-        King.is_king_in_check(board, piece_color, "WK", True)
-        if not King.last_checked_king:
-            King.is_king_in_check(board, piece_color, "BK", True)
+        position = board if isinstance(board, Position) else Position.from_grid(board)
 
-        if King.enemy_check_position and King.last_checked_king:
-            standart_output["check"] = True
-            attacked_piece = board[King.enemy_check_position]
+        for king_color in (WHITE, BLACK):
+            checkers = position.check_info(king_color)[0]
 
-            king_pos = ""
-            for cell, piece in board.items():
-                if piece == King.last_checked_king:
-                    king_pos = cell
+            if checkers:
+                break
+        else:
+            state.clear_check()
+            return None
 
-            # Calculate the path between the attacked piece and the king
-            path = get_path_between_positions(King.enemy_check_position, king_pos)
+        standart_output["check"] = True
+        state.checked_king = COLOR_LETTERS[king_color] + "K"
+        state.check_position = SQUARES[lsb(checkers)]
 
-            # Only pieces of the same color can block a check
-            if piece_color[0].upper() == attacked_piece[0]:
-                return standart_output
+        # Only pieces of the checked side can get out of the check
+        if king_color != color:
+            return standart_output
 
-        is_king_checked = (
-            King.last_checked_king and piece_name != King.last_checked_king
-        )
         is_invalid_move = not chess_piece.validate_move(current_pos, target_pos)
-        is_target_outside_path = target_pos not in path
 
-        if is_king_checked and (is_invalid_move or is_target_outside_path):
+        if is_invalid_move or not position.is_legal(
+            SQUARE_INDEX[current_pos], SQUARE_INDEX[target_pos]
+        ):
             return standart_output
 
-        King.last_checked_king = ""
+        state.clear_check()
 
     def is_checkmate(self, move: str, board: dict, king_identifier: str) -> bool:
-        """Check if the current position results in checkmate."""
+        """
+        Check if the current position results in checkmate,
+        the king is in check and its side has no legal move left.
+        In double check has_legal_move only tries the king moves.
 
-        king_position = None
-        king_color = "white" if king_identifier[0] == "W" else "black"
+        Arguments:
+            move: str, cell of the piece that moved last, kept for the callers
+            board: dictionary instance or Position
+            king_identifier: string, like 'WK' or 'BK'
 
-        for position, piece in board.items():
-            if piece == king_identifier:
-                king_position = position
-                break
+        Returns:
+            bool
+        """
 
-        if not king_position:
-            return False
+        if not isinstance(board, Position):
+            board = Position.from_grid(board)
 
-        current_col = self.column_labels.index(king_position[0])
-        current_row = int(king_position[1])
-
-        move_directions = [
-            (0, 1),
-            (0, -1),
-            (1, 0),
-            (-1, 0),
-            (1, 1),
-            (-1, -1),
-            (-1, 1),
-            (1, -1),
-        ]
-
-        if not King.is_king_in_check(board, king_color, king_identifier):
+        if not board.pieces[PIECE_INDEX[king_identifier]]:
             return False
 
-        self.path = get_path_between_positions(move, king_position)
-
-        for cell in self.path:
-            for position, piece in board.items():
-                if piece == "empty":
-                    continue
-
-                if piece[0] == king_color[0].upper() and piece[1] != "K":
-                    piece_class = self.piece_classes[piece[1]]
-                    chess_piece = piece_class(king_color, board)
+        color = WHITE if king_identifier[0] == "W" else BLACK
 
-                    if chess_piece.validate_move(position, cell):
-                        return False
-
-        for col_delta, row_delta in move_directions:
-            new_col = current_col + col_delta
-            new_row = current_row + row_delta
-
-            if 0 <= new_col <= 7 and 1 <= new_row <= 8:
-                new_position = self.column_labels[new_col] + str(new_row)
-
-                # Validates neighbor cells, meaning can the king go there in first place and if the cell isn't under check
-                temp_board = board.copy()
-                temp_board[king_position] = "empty"
-                temp_board[new_position] = king_identifier
+        # The checkers are cached with the position, has_legal_move reuses them
+        if not board.check_info(color)[0]:
+            return False
 
-                king = King(king_color, board)
+        return not has_legal_move(board, color)
 
-                # If cells around are all blocked or under check it's meaning that the king is checkmated
-                if king.validate_move(king_position, new_position):
-                    if not King.is_king_in_check(
-                        temp_board, king_color, king_identifier
-                    ):
-                        return False
+    def is_en_passant(
+        self, current_pos: str, target_pos: str, piece: str, state: GameState
+    ) -> bool:
+        """A valid diagonal pawn move onto the en passant cell captures en passant"""
 
-        return True
+        return (
+            piece[1] == "P"
+            and target_pos == state.en_passant
+            and current_pos[0] != target_pos[0]
+        )
 
     def handle_promotion_choice(self, board: dict) -> dict | None:
         black_pawn_on_first_rank = next(
@@ -169,9 +218,19 @@ class ChessLogic:
         return white_pawn_on_last_rank or black_pawn_on_first_rank
 
     def handle_move(
-        self, current_pos: str, target_pos: str, piece: str, board: dict
+        self,
+        current_pos: str,
+        target_pos: str,
+        piece: str,
+        board: dict,
+        state: GameState = None,
+        promoted_to: str = None,
     ) -> dict:
-        """Validate a chess move and check for checkmate conditions."""
+        """
+        Validate a chess move and check for checkmate conditions.
+        state is the GameState of the game the move is played in,
+        promoted_to the piece a pawn reaching the last rank becomes
+        """
 
         standart_output = self.output.copy()
 
@@ -194,39 +253,66 @@ class ChessLogic:
         if not piece_class:
             return standart_output
 
-        chess_piece = piece_class(piece_color, board)
+        if state is None:
+            state = GameState()
 
-        # Create a copy of the board with the moved piece
-        updated_board = board.copy()
-        updated_board[current_pos] = "empty"
-        updated_board[target_pos] = piece
+        # The pawn moves by its own rules, the probes play the piece it becomes
+        landed = piece
 
-        in_check_status = King.is_king_in_check(updated_board, piece_color, king)
-        enemy_in_check_status = King.is_king_in_check(
-            updated_board, piece_color, enemy_king
-        )
+        if promoted_to and piece[1] == "P" and target_pos[1] in "18":
+            if promoted_to[0] != piece[0] or promoted_to[1] not in "QRBH":
+                return standart_output
+
+            landed = promoted_to
+
+        chess_piece = piece_class(piece_color, board, state)
+
+        # Play the move on the board in place instead of copying it,
+        # every probe below puts the board back the way it was
+        original = board[current_pos]
+        captured = board[target_pos]
+
+        self._make_probe(board, current_pos, target_pos, landed)
+
+        try:
+            in_check_status = King.is_king_in_check(board, piece_color, king)
+        finally:
+            self._unmake_probe(board, current_pos, target_pos, original, captured)
 
         promotion = self.handle_promotion_choice(board)
 
         if promotion:
             pawn = promotion
 
-            promo_board = board.copy()
-            promo_board[pawn] = piece
-
-            checkmate_with_promotion = self.is_checkmate(
-                target_pos, promo_board, enemy_king
-            )
-
-            standart_output["check"] = enemy_in_check_status
+            original_pawn = board[pawn]
+            board[pawn] = piece
+
+            try:
+                check_with_promotion = King.is_king_in_check(
+                    board, piece_color, enemy_king
+                )
+                checkmate_with_promotion = self.is_checkmate(
+                    target_pos, board, enemy_king
+                )
+                stalemate_with_promotion = King.is_stalemate(board, enemy_king)
+            finally:
+                board[pawn] = original_pawn
+
+            standart_output["check"] = check_with_promotion
             standart_output["checkmate"] = checkmate_with_promotion
+            standart_output["stalemate"] = stalemate_with_promotion
             standart_output["winner"] = piece_color
+            # The piece chosen for the pawn on the last rank, sent with the pawn's cell
+            standart_output["move_valid"] = (
+                pawn == target_pos
+                and original_pawn[0] == piece[0]
+                and piece[1] in "QRBH"
+            )
 
             return standart_output
 
-        # * Enables for sides to move in order (white then black)
-        # if piece[0] == self.last_side_to_move:
-        #     return standart_output
+        # Whose turn it is and which piece stands on the cell is checked by the
+        # consumer, the rules here also judge moves of either side for the tests
 
         if chess_piece.validate_move(current_pos, target_pos, in_check_status):
 
@@ -237,17 +323,35 @@ class ChessLogic:
             if in_check_before_moving: 
                 return in_check_before_moving 
 
-            checkmate_status = self.is_checkmate(target_pos, updated_board, "WK")
-            if not checkmate_status:
-                checkmate_status = self.is_checkmate(target_pos, updated_board, "BK")
+            # Played with make_move, so the en passant cell a double push
+            # leaves behind counts as an escape for the other side
+            position = self._position(board, state)
+
+            # The rules validated the piece sent, the probe plays it from its cell
+            if original == "empty":
+                position[current_pos] = piece
+
+            position.make_move(
+                self._probe_move(position, current_pos, target_pos, landed)
+            )
+
+            try:
+                # Only the side that didn't move can be checked or mated by the move
+                check_status = position.in_check(WHITE if enemy_king[0] == "W" else BLACK)
+                checkmate_status = self.is_checkmate(target_pos, position, enemy_king)
+                stalemate_status = King.is_stalemate(position, enemy_king)
+            finally:
+                position.unmake_move()
+                position[current_pos] = original
 
             return {
                 "move_valid": True,
                 "checkmate": checkmate_status,
+                "stalemate": stalemate_status,
                 "winner": piece_color,
-                "check": enemy_in_check_status,
+                "check": check_status,
                 "processed_cell": target_pos,
-                "en_passant": Pawn.is_en_passant,
+                "en_passant": self.is_en_passant(current_pos, target_pos, piece, state),
             }
 
         return standart_output
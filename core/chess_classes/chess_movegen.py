@@ -0,0 +1,439 @@
+from time import perf_counter
+
+from .chess_bitboard import (
+    Position,
+    WHITE,
+    PAWN,
+    HORSE,
+    BISHOP,
+    ROOK,
+    QUEEN,
+    KING,
+    FILE_A,
+    FILE_H,
+    RANK_1,
+    RANK_8,
+    FULL_BOARD,
+    WHITE_SHORT,
+    WHITE_LONG,
+    SQUARES,
+    NORMAL,
+    DOUBLE_PUSH,
+    EN_PASSANT,
+    CASTLE,
+    encode_move,
+    iter_squares,
+)
+from .chess_tables import (
+    HORSE_ATTACKS,
+    KING_ATTACKS,
+    PAWN_ATTACKS,
+    LINE,
+    rook_attacks,
+    bishop_attacks,
+)
+
+RANK_3 = RANK_1 << 16
+RANK_6 = RANK_1 << 40
+
+PROMOTIONS = (QUEEN, ROOK, BISHOP, HORSE)
+
+
+def move_to_uci(move: int) -> str:
+    """Long algebraic notation of the move, like 'e2e4' or 'a7a8q'"""
+
+    text = SQUARES[move & 63] + SQUARES[move >> 6 & 63]
+    promotion = move >> 12 & 7
+
+    if promotion:
+        # UCI uses n for the knight
+        text += "nbrq"[promotion - HORSE]
+
+    return text
+
+
+def _add_pawn_moves(moves: list, targets: int, offset: int, flag: int = NORMAL) -> None:
+    """Adds the pawn moves landing on targets, offset leads back to the starting square"""
+
+    for to_square in iter_squares(targets):
+        from_square = to_square - offset
+
+        if (1 << to_square) & (RANK_1 | RANK_8):
+            for promotion in PROMOTIONS:
+                moves.append(from_square | to_square << 6 | promotion << 12)
+        else:
+            moves.append(from_square | to_square << 6 | flag << 15)
+
+
+def _add_piece_moves(moves: list, from_square: int, targets: int) -> None:
+    for to_square in iter_squares(targets):
+        moves.append(from_square | to_square << 6)
+
+
+def _pawn_targets(position: Position, us: int) -> tuple:
+    """
+    Target bitboards of the pawn pushes and captures of the side, except en passant.
+    Every entry is (targets, offset, flag), offset leads back to the starting square.
+    """
+
+    pawns = position.pieces[us * 6 + PAWN]
+    enemy = position.occupancy[us ^ 1]
+    empty = ~position.occupied & FULL_BOARD
+
+    if us == WHITE:
+        single = (pawns << 8) & empty
+        double = ((single & RANK_3) << 8) & empty
+        left = (pawns << 7) & ~FILE_H & enemy
+        right = (pawns << 9) & ~FILE_A & enemy
+
+        return (
+            (single, 8, NORMAL),
+            (double, 16, DOUBLE_PUSH),
+            (left, 7, NORMAL),
+            (right, 9, NORMAL),
+        )
+
+    single = (pawns >> 8) & empty
+    double = ((single & RANK_6) >> 8) & empty
+    left = (pawns >> 9) & ~FILE_H & enemy
+    right = (pawns >> 7) & ~FILE_A & enemy
+
+    return (
+        (single, -8, NORMAL),
+        (double, -16, DOUBLE_PUSH),
+        (left, -9, NORMAL),
+        (right, -7, NORMAL),
+    )
+
+
+def generate_pseudo_legal_moves(position: Position) -> list:
+    """
+    Every move of the side to move that follows the piece rules,
+    without checking whether it leaves the own king in check.
+    Castling is only generated when the king doesn't cross attacked squares.
+    """
+
+    moves = []
+
+    us = position.turn
+    them = us ^ 1
+    base = us * 6
+    pieces = position.pieces
+    own = position.occupancy[us]
+    occupied = position.occupied
+
+    for targets, offset, flag in _pawn_targets(position, us):
+        _add_pawn_moves(moves, targets, offset, flag)
+
+    if position.ep_square is not None:
+        ep_square = position.ep_square
+        pawns = pieces[base + PAWN]
+
+        # Our pawns able to capture stand where an enemy pawn on the cell would attack
+        for from_square in iter_squares(PAWN_ATTACKS[them][ep_square] & pawns):
+            moves.append(encode_move(from_square, ep_square, flag=EN_PASSANT))
+
+    not_own = ~own
+
+    for from_square in iter_squares(pieces[base + HORSE]):
+        _add_piece_moves(moves, from_square, HORSE_ATTACKS[from_square] & not_own)
+
+    for from_square in iter_squares(pieces[base + BISHOP]):
+        targets = bishop_attacks(from_square, occupied)
+        _add_piece_moves(moves, from_square, targets & not_own)
+
+    for from_square in iter_squares(pieces[base + ROOK]):
+        targets = rook_attacks(from_square, occupied)
+        _add_piece_moves(moves, from_square, targets & not_own)
+
+    for from_square in iter_squares(pieces[base + QUEEN]):
+        targets = rook_attacks(from_square, occupied)
+        targets |= bishop_attacks(from_square, occupied)
+        _add_piece_moves(moves, from_square, targets & not_own)
+
+    for from_square in iter_squares(pieces[base + KING]):
+        _add_piece_moves(moves, from_square, KING_ATTACKS[from_square] & not_own)
+
+    _add_castling_moves(position, moves)
+
+    return moves
+
+
+def generate_captures(position: Position) -> list:
+    """
+    The captures and promotions of the side to move, pseudo-legal like
+    generate_pseudo_legal_moves. Quiescence search plays only these.
+    """
+
+    moves = []
+
+    us = position.turn
+    them = us ^ 1
+    base = us * 6
+    pieces = position.pieces
+    enemy = position.occupancy[them]
+    occupied = position.occupied
+    last_rank = RANK_8 if us == WHITE else RANK_1
+
+    for targets, offset, flag in _pawn_targets(position, us):
+        if flag == DOUBLE_PUSH:
+            continue
+
+        # A push only counts when it promotes
+        if offset in (8, -8):
+            targets &= last_rank
+
+        _add_pawn_moves(moves, targets, offset, flag)
+
+    if position.ep_square is not None:
+        ep_square = position.ep_square
+
+        for from_square in iter_squares(PAWN_ATTACKS[them][ep_square] & pieces[base]):
+            moves.append(encode_move(from_square, ep_square, flag=EN_PASSANT))
+
+    for from_square in iter_squares(pieces[base + HORSE]):
+        _add_piece_moves(moves, from_square, HORSE_ATTACKS[from_square] & enemy)
+
+    for from_square in iter_squares(pieces[base + BISHOP]):
+        targets = bishop_attacks(from_square, occupied)
+        _add_piece_moves(moves, from_square, targets & enemy)
+
+    for from_square in iter_squares(pieces[base + ROOK]):
+        targets = rook_attacks(from_square, occupied)
+        _add_piece_moves(moves, from_square, targets & enemy)
+
+    for from_square in iter_squares(pieces[base + QUEEN]):
+        targets = rook_attacks(from_square, occupied)
+        targets |= bishop_attacks(from_square, occupied)
+        _add_piece_moves(moves, from_square, targets & enemy)
+
+    for from_square in iter_squares(pieces[base + KING]):
+        _add_piece_moves(moves, from_square, KING_ATTACKS[from_square] & enemy)
+
+    return moves
+
+
+def _add_castling_moves(position: Position, moves: list) -> None:
+    us = position.turn
+    them = us ^ 1
+    rights = position.castling >> (us * 2)
+
+    if not rights & (WHITE_SHORT | WHITE_LONG):
+        return None
+
+    king = 4 if us == WHITE else 60
+    occupied = position.occupied
+
+    if position.squares[king] != us * 6 + KING or position.is_attacked(king, them):
+        return None
+
+    rook = us * 6 + ROOK
+
+    # Short castle, f and g cells have to be empty and not under attack
+    if (
+        rights & WHITE_SHORT
+        and position.squares[king + 3] == rook
+        and not occupied & (0b11 << (king + 1))
+        and not position.is_attacked(king + 1, them)
+        and not position.is_attacked(king + 2, them)
+    ):
+        moves.append(encode_move(king, king + 2, flag=CASTLE))
+
+    # Long castle, b, c and d cells have to be empty, c and d not under attack
+    if (
+        rights & WHITE_LONG
+        and position.squares[king - 4] == rook
+        and not occupied & (0b111 << (king - 3))
+        and not position.is_attacked(king - 1, them)
+        and not position.is_attacked(king - 2, them)
+    ):
+        moves.append(encode_move(king, king - 2, flag=CASTLE))
+
+
+def generate_legal_moves(position: Position) -> list:
+    """
+    Every legal move of the side to move, including castling,
+    en passant and promotions (one move per promotion piece)
+    """
+
+    us = position.turn
+    legal_moves = []
+
+    for move in generate_pseudo_legal_moves(position):
+        position.make_move(move)
+
+        if not position.in_check(us):
+            legal_moves.append(move)
+
+        position.unmake_move()
+
+    return legal_moves
+
+
+def legal_targets(position: Position, from_square: int) -> list:
+    """
+    Squares the piece on from_square can legally move to, sorted.
+    A piece of the side not to move gets the targets it would have on its turn,
+    without en passant. A castling king also targets the rook it castles with
+
+    Returns:
+        list of squares, empty when the square is empty
+    """
+
+    piece = position.squares[from_square]
+
+    if piece is None:
+        return []
+
+    color = piece // 6
+
+    if color != position.turn:
+        position = position.copy()
+        position.turn = color
+        position.ep_square = None
+
+    targets = set()
+
+    for move in generate_pseudo_legal_moves(position):
+        if move & 63 != from_square:
+            continue
+
+        position.make_move(move)
+        legal = not position.in_check(color)
+        position.unmake_move()
+
+        if not legal:
+            continue
+
+        to_square = move >> 6 & 63
+        targets.add(to_square)
+
+        if move >> 15 == CASTLE:
+            targets.add(from_square + 3 if to_square > from_square else from_square - 4)
+
+    return sorted(targets)
+
+
+def has_legal_move(position: Position, color: int = None) -> bool:
+    """
+    Whether the side has at least one legal move, stops at the first one found.
+    King steps are tried first, then pawns and the other pieces, which only need
+    the evasion and pin masks of Position.check_info. Castling is never the only
+    legal move, the king can always step to the cell it passes, so it's skipped.
+
+    Arguments:
+        position: Position
+        color: WHITE or BLACK, the side to move by default
+    """
+
+    us = position.turn if color is None else color
+    base = us * 6
+    pieces = position.pieces
+    not_own = ~position.occupancy[us]
+    occupied = position.occupied
+
+    checkers, pinned, evasion = position.check_info(us)
+    king = position.king_square(us)
+
+    if king is not None:
+        for to_square in iter_squares(KING_ATTACKS[king] & not_own):
+            if position.is_legal(king, to_square):
+                return True
+
+    # In double check only the king can move
+    if not evasion:
+        return False
+
+    for targets, offset, _ in _pawn_targets(position, us):
+        for to_square in iter_squares(targets & evasion):
+            if _pin_allows(pinned, king, to_square - offset, 1 << to_square):
+                return True
+
+    if position.ep_square is not None:
+        ep_square = position.ep_square
+        pawns = pieces[base + PAWN]
+
+        for from_square in iter_squares(PAWN_ATTACKS[us ^ 1][ep_square] & pawns):
+            if position.is_legal(from_square, ep_square):
+                return True
+
+    targets_mask = not_own & evasion
+    queens = pieces[base + QUEEN]
+
+    for from_square in iter_squares(pieces[base + HORSE]):
+        targets = HORSE_ATTACKS[from_square] & targets_mask
+
+        if _pin_allows(pinned, king, from_square, targets):
+            return True
+
+    for from_square in iter_squares(pieces[base + BISHOP] | queens):
+        targets = bishop_attacks(from_square, occupied) & targets_mask
+
+        if _pin_allows(pinned, king, from_square, targets):
+            return True
+
+    for from_square in iter_squares(pieces[base + ROOK] | queens):
+        targets = rook_attacks(from_square, occupied) & targets_mask
+
+        if _pin_allows(pinned, king, from_square, targets):
+            return True
+
+    return False
+
+
+def _pin_allows(pinned: int, king: int, from_square: int, targets: int) -> bool:
+    """Whether any of the targets is reachable, a pinned piece stays on its pin line"""
+
+    if pinned >> from_square & 1:
+        targets &= LINE[king][from_square]
+
+    return targets != 0
+
+
+def perft(position: Position, depth: int, cache: dict = None) -> int:
+    """
+    Counts the leaf nodes of the legal move tree, depth plies deep.
+    With a cache dict, subtrees of positions reached again through
+    another move order are counted once, keyed by the Zobrist key and depth.
+    """
+
+    if depth == 0:
+        return 1
+
+    if cache is not None:
+        nodes = cache.get((position.key, depth))
+
+        if nodes is not None:
+            return nodes
+
+    moves = generate_legal_moves(position)
+
+    if depth == 1:
+        return len(moves)
+
+    nodes = 0
+
+    for move in moves:
+        position.make_move(move)
+        nodes += perft(position, depth - 1, cache)
+        position.unmake_move()
+
+    if cache is not None:
+        cache[(position.key, depth)] = nodes
+
+    return nodes
+
+
+def run_perft(position: Position, depth: int, cache: dict = None) -> dict:
+    """Runs perft and reports the node count together with the throughput"""
+
+    start = perf_counter()
+    nodes = perft(position, depth, cache)
+    seconds = perf_counter() - start
+
+    return {
+        "depth": depth,
+        "nodes": nodes,
+        "seconds": seconds,
+        "nps": int(nodes / seconds) if seconds else 0,
+    }
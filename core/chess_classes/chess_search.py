@@ -0,0 +1,640 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_all_start_methods, get_context
+from multiprocessing.shared_memory import SharedMemory
+from time import perf_counter
+
+from .chess_bitboard import Position, HORSE, QUEEN, EN_PASSANT
+from .chess_movegen import (
+    generate_captures,
+    generate_pseudo_legal_moves,
+    generate_legal_moves,
+    move_to_uci,
+)
+from .chess_eval import PIECE_VALUES, evaluate
+from .chess_transposition import (
+    TranspositionTable,
+    SharedTranspositionTable,
+    EXACT,
+    LOWER_BOUND,
+    UPPER_BOUND,
+)
+
+# How the engine's worker processes start, where the platform has a fork server
+POOL_START_METHOD = "forkserver" if "forkserver" in get_all_start_methods() else "spawn"
+
+# Scores above MATE - MAX_PLY are mates, MATE - n being a mate in n plies
+MATE = 100000
+MAX_PLY = 128
+INFINITY = MATE + 1
+
+# How many nodes go by between two looks at the clock
+CHECK_EVERY = 1024
+
+# Null move pruning searches the pass this many plies shallower, one more
+# from depth 7 on, and only from NULL_MIN_DEPTH plies to go
+NULL_REDUCTION = 2
+NULL_MIN_DEPTH = 3
+
+# Late move reductions start after the first LMR_MOVES legal moves of a node,
+# with LMR_MIN_DEPTH plies to go at least
+LMR_MOVES = 3
+LMR_MIN_DEPTH = 3
+
+# Ordering scores, captures above killers above every history score
+CAPTURE_SCORE = 1 << 30
+KILLER_SCORE = 1 << 20
+
+# Entries of the table search_fen keeps between the calls of a worker process
+TABLE_SIZE = 1 << 16
+
+_table = None
+
+
+def _is_quiet(position: Position, move: int) -> bool:
+    """Neither a capture nor a promotion"""
+
+    return (
+        position.squares[move >> 6 & 63] is None
+        and not move >> 12 & 7
+        and move >> 15 != EN_PASSANT
+    )
+
+
+def _has_pieces(position: Position, color: int) -> bool:
+    """Whether the side has more than pawns and the king"""
+
+    base = color * 6
+
+    return any(position.pieces[base + HORSE : base + QUEEN + 1])
+
+
+def mvv_lva(position: Position, move: int) -> int:
+    """
+    Most valuable victim, least valuable attacker: taking the queen with a
+    pawn comes before taking it with a rook, and both before taking a rook.
+    A promotion counts as taking what the pawn turns into.
+    """
+
+    victim = position.squares[move >> 6 & 63]
+    promotion = move >> 12 & 7
+
+    if victim is not None:
+        gain = PIECE_VALUES[victim % 6]
+    elif move >> 15 == EN_PASSANT:
+        gain = PIECE_VALUES[0]
+    else:
+        gain = 0
+
+    if promotion:
+        gain += PIECE_VALUES[promotion] - PIECE_VALUES[0]
+
+    # Ten times the gain keeps the cheapest victim above the dearest attacker
+    return gain * 10 - PIECE_VALUES[position.squares[move & 63] % 6]
+
+
+class SearchAborted(Exception):
+    """The time or node budget ran out in the middle of an iteration"""
+
+
+def _to_table(score: int, ply: int) -> int:
+    """Mate scores are stored relative to the node, not to the root"""
+
+    if score > MATE - MAX_PLY:
+        return score + ply
+    if score < -MATE + MAX_PLY:
+        return score - ply
+
+    return score
+
+
+def _from_table(score: int, ply: int) -> int:
+    if score > MATE - MAX_PLY:
+        return score - ply
+    if score < -MATE + MAX_PLY:
+        return score + ply
+
+    return score
+
+
+class Search:
+    """
+    Iterative deepening negamax with alpha-beta and a transposition table.
+    Every iteration searches one ply deeper until the depth, time or node
+    budget runs out, an iteration cut short is thrown away and the best move
+    of the last finished one stands. At the horizon a quiescence search plays
+    out the captures and promotions, so a leaf isn't scored in the middle of
+    an exchange.
+
+    Null move pruning and late move reductions cut the tree, killer moves
+    and the history heuristic order the quiet moves. Every technique can be
+    switched off for comparing them, see chess_bench.bench_search.
+    """
+
+    def __init__(
+        self,
+        position: Position,
+        table: TranspositionTable = None,
+        time_limit: float = None,
+        nodes: int = None,
+        quiescence: bool = True,
+        ordering: bool = True,
+        null_move: bool = True,
+        reductions: bool = True,
+        killers: bool = True,
+        history: bool = True,
+        stop=None,
+    ):
+        """
+        Arguments:
+            position: Position to search, played on in place and restored after
+            table: TranspositionTable, a fresh one when None
+            time_limit: float, seconds the search may take
+            nodes: int, nodes the search may visit
+            quiescence: bool, whether the leaves are searched along captures,
+                otherwise they are evaluated as they stand
+            ordering: bool, whether captures are tried in MVV-LVA order,
+                otherwise in the order they are generated
+            null_move: bool, whether null move pruning is used
+            reductions: bool, whether late quiet moves are searched shallower first
+            killers: bool, whether the quiet moves that caused a cutoff at the
+                same ply are tried first
+            history: bool, whether the other quiet moves are ordered by how
+                often they caused a cutoff
+            stop: callable, looked at with the clock, the search ends
+                when it returns True
+        """
+
+        self.position = position
+        self.table = table if table is not None else TranspositionTable(TABLE_SIZE)
+        self.time_limit = time_limit
+        self.node_limit = nodes
+        self.quiescence_enabled = quiescence
+        self.ordering = ordering
+        self.null_move = null_move
+        self.reductions = reductions
+        self.use_killers = killers
+        self.use_history = history
+        self.stop = stop
+        self.killers = []
+        self.history = []
+        self.nodes = 0
+        self.deadline = None
+
+    def run(self, depth: int = MAX_PLY, start_depth: int = 1) -> dict:
+        """
+        Searches to the depth or until the budget runs out, the first
+        iteration searches start_depth plies deep
+
+        Returns:
+            dict with the best move and its uci, the score for the side to move,
+            the depth of the last finished iteration, nodes and seconds
+        """
+
+        start = perf_counter()
+        self.nodes = 0
+        self.deadline = None if self.time_limit is None else start + self.time_limit
+        self.table.new_search()
+        self.root_history = len(self.position.history)
+        # Two killer moves per ply and a score per piece and target square
+        self.killers = [[0, 0] for _ in range(MAX_PLY + 1)]
+        self.history = [0] * (12 * 64)
+
+        moves = generate_legal_moves(self.position)
+        best_move = moves[0] if moves else 0
+        score = 0
+        finished = 0
+
+        for current in range(start_depth, min(depth, MAX_PLY) + 1):
+            if not moves:
+                break
+
+            try:
+                score, best_move = self.root(current, moves, best_move)
+            except SearchAborted:
+                self.unwind()
+                break
+
+            finished = current
+
+            # A forced mate is found, deeper iterations can't change it
+            if abs(score) > MATE - MAX_PLY:
+                break
+
+        seconds = perf_counter() - start
+
+        return {
+            "move": best_move,
+            "uci": move_to_uci(best_move) if best_move else None,
+            "score": score,
+            "depth": finished,
+            "nodes": self.nodes,
+            "seconds": seconds,
+        }
+
+    def root(self, depth: int, moves: list, best_move: int) -> tuple:
+        """One iteration over the root moves, the best of the last one first"""
+
+        position = self.position
+
+        moves.sort(key=lambda move: move != best_move)
+
+        alpha = -INFINITY
+        best_move = moves[0]
+
+        for move in moves:
+            position.make_move(move)
+            score = -self.negamax(depth - 1, -INFINITY, -alpha, 1)
+            position.unmake_move()
+
+            if score > alpha:
+                alpha, best_move = score, move
+
+        self.table.store(position.key, depth, alpha, EXACT, best_move)
+
+        return alpha, best_move
+
+    def unwind(self) -> None:
+        """Takes back what an interrupted iteration left played"""
+
+        position = self.position
+
+        while len(position.history) > self.root_history:
+            # A null move is recorded as move 0
+            if position.history[-1][0]:
+                position.unmake_move()
+            else:
+                position.unmake_null_move()
+
+    def visit(self) -> None:
+        """Counts a node, raising SearchAborted when the budget is spent"""
+
+        self.nodes += 1
+
+        if self.nodes == self.node_limit:
+            raise SearchAborted
+        if self.nodes % CHECK_EVERY == 0:
+            if self.deadline is not None and perf_counter() >= self.deadline:
+                raise SearchAborted
+            if self.stop is not None and self.stop():
+                raise SearchAborted
+
+    def negamax(
+        self, depth: int, alpha: int, beta: int, ply: int, allow_null: bool = True
+    ) -> int:
+        position = self.position
+
+        if depth <= 0 or ply >= MAX_PLY:
+            if self.quiescence_enabled:
+                return self.quiescence(alpha, beta, ply)
+
+            self.visit()
+            return evaluate(position)
+
+        self.visit()
+
+        # A repetition or the 50 move rule is a draw as far as the search cares
+        if position.halfmove_clock >= 100 or position.repetitions():
+            return 0
+
+        entry = self.table.probe(position.key)
+        table_move = 0
+
+        if entry is not None:
+            table_move, table_score, table_depth, bound = entry
+            table_score = _from_table(table_score, ply)
+
+            if table_depth >= depth and (
+                bound == EXACT
+                or bound == LOWER_BOUND and table_score >= beta
+                or bound == UPPER_BOUND and table_score <= alpha
+            ):
+                return table_score
+
+        us = position.turn
+        in_check = position.in_check(us)
+
+        # Null move: when passing still fails high, a real move would too.
+        # Not twice in a row, not in check, and not with only pawns left,
+        # where passing may be the only good move there is (zugzwang)
+        if (
+            self.null_move
+            and allow_null
+            and not in_check
+            and depth >= NULL_MIN_DEPTH
+            and beta < MATE - MAX_PLY
+            and _has_pieces(position, us)
+            and evaluate(position) >= beta
+        ):
+            reduction = NULL_REDUCTION + (depth > 6)
+
+            position.make_null_move()
+            score = -self.negamax(
+                depth - 1 - reduction, -beta, 1 - beta, ply + 1, False
+            )
+            position.unmake_null_move()
+
+            if score >= beta:
+                return beta
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = 0
+        played = 0
+
+        moves = self.order_moves(generate_pseudo_legal_moves(position), table_move, ply)
+
+        for move in moves:
+            quiet = _is_quiet(position, move)
+            position.make_move(move)
+
+            if position.in_check(us):
+                position.unmake_move()
+                continue
+
+            played += 1
+
+            # Late move reductions: quiet moves ordered late rarely turn out best,
+            # they get a shallower null window search first and the full one
+            # only when they beat alpha after all
+            if (
+                self.reductions
+                and played > LMR_MOVES
+                and depth >= LMR_MIN_DEPTH
+                and quiet
+                and not in_check
+                and not position.in_check(us ^ 1)
+            ):
+                reduction = 1 if played <= 2 * LMR_MOVES else 2
+                score = -self.negamax(
+                    depth - 1 - reduction, -alpha - 1, -alpha, ply + 1
+                )
+
+                if score > alpha:
+                    score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            else:
+                score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+
+            position.unmake_move()
+
+            if score > best_score:
+                best_score, best_move = score, move
+
+                if score > alpha:
+                    alpha = score
+
+                    if alpha >= beta:
+                        if quiet:
+                            self.remember_cutoff(move, depth, ply)
+                        break
+
+        # No legal move, checkmate or stalemate
+        if not best_move:
+            return -MATE + ply if in_check else 0
+
+        if best_score >= beta:
+            bound = LOWER_BOUND
+        elif best_score > original_alpha:
+            bound = EXACT
+        else:
+            bound = UPPER_BOUND
+
+        self.table.store(
+            position.key, depth, _to_table(best_score, ply), bound, best_move
+        )
+
+        return best_score
+
+    def remember_cutoff(self, move: int, depth: int, ply: int) -> None:
+        """Records a quiet move that failed high for the ordering of the next nodes"""
+
+        if self.use_killers:
+            killers = self.killers[ply]
+
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+
+        if self.use_history:
+            piece = self.position.squares[move & 63]
+            index = piece * 64 + (move >> 6 & 63)
+            self.history[index] += depth * depth
+
+            # Halved so the scores stay below the killers and follow the search
+            if self.history[index] >= KILLER_SCORE:
+                self.history = [score // 2 for score in self.history]
+
+    def quiescence(self, alpha: int, beta: int, ply: int) -> int:
+        """
+        Searches only captures and promotions until the position is quiet.
+        The side to move may always stand pat on the evaluation instead,
+        as it usually has a quiet move at least as good.
+        """
+
+        self.visit()
+        position = self.position
+
+        score = evaluate(position)
+
+        if score >= beta or ply >= MAX_PLY:
+            return score
+        if score > alpha:
+            alpha = score
+
+        us = position.turn
+        moves = generate_captures(position)
+
+        if self.ordering:
+            moves.sort(key=lambda move: mvv_lva(position, move), reverse=True)
+
+        for move in moves:
+            position.make_move(move)
+
+            if position.in_check(us):
+                position.unmake_move()
+                continue
+
+            score = -self.quiescence(-beta, -alpha, ply + 1)
+            position.unmake_move()
+
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+
+        return alpha
+
+    def order_moves(self, moves: list, table_move: int, ply: int = 0) -> list:
+        """
+        The table move first, captures and promotions by MVV-LVA, the killer
+        moves of the ply, then the rest by their history score
+        """
+
+        position = self.position
+        squares = position.squares
+        ordering = self.ordering
+        killers = self.killers[ply] if self.use_killers else ()
+        history = self.history if self.use_history else None
+
+        def key(move: int) -> int:
+            if move == table_move:
+                return INFINITY
+            if ordering and not _is_quiet(position, move):
+                return CAPTURE_SCORE + mvv_lva(position, move)
+            if move in killers:
+                return KILLER_SCORE + (move == killers[0])
+            if history is not None:
+                return history[squares[move & 63] * 64 + (move >> 6 & 63)]
+
+            return 0
+
+        return sorted(moves, key=key, reverse=True)
+
+
+def search(
+    position: Position,
+    depth: int = MAX_PLY,
+    time_limit: float = None,
+    nodes: int = None,
+    table: TranspositionTable = None,
+    **options,
+) -> dict:
+    """Best move of the side to move, see Search.run. options switch techniques off"""
+
+    return Search(position, table, time_limit, nodes, **options).run(depth)
+
+
+def search_fen(
+    fen: str, depth: int = MAX_PLY, time_limit: float = None, nodes: int = None
+) -> dict:
+    """
+    search on the position of the FEN, the entry point of the engine's worker
+    processes. The FEN is all that crosses the process boundary, and every worker
+    keeps its transposition table for the next moves of the game.
+    """
+
+    global _table
+
+    if _table is None:
+        _table = TranspositionTable(TABLE_SIZE)
+
+    return search(Position.from_fen(fen), depth, time_limit, nodes, _table)
+
+
+def parallel_search(
+    position: Position,
+    workers: int = 2,
+    depth: int = MAX_PLY,
+    time_limit: float = None,
+    nodes: int = None,
+    pool: ProcessPoolExecutor = None,
+    table_size: int = TABLE_SIZE,
+    **options,
+) -> dict:
+    """
+    Lazy SMP: the workers search the same root in processes of their own,
+    sharing one SharedTranspositionTable and nothing else. Every second worker
+    starts one ply deeper, so they soon search different parts of the tree
+    and fill the table for each other. The first worker to finish its last
+    iteration stops the rest.
+
+    Arguments:
+        position: Position to search
+        workers: int, the number of processes searching at once
+        depth, time_limit, options: like search, nodes is the budget of every worker
+        pool: ProcessPoolExecutor from start_pool with at least workers processes,
+            a pool of its own is started and shut down when None
+
+    Returns:
+        dict like search, of the worker that got deepest, the first one on a tie,
+        with the nodes of all of them
+    """
+
+    start = perf_counter()
+    fen = position.to_fen()
+    table = SharedTranspositionTable(table_size)
+    # One byte every worker looks at with the clock, set by the first one done
+    stop = SharedMemory(create=True, size=1)
+    own_pool = pool is None
+
+    if own_pool:
+        pool = start_pool(workers)
+
+    try:
+        futures = [
+            pool.submit(
+                _lazy_smp_worker,
+                fen,
+                table.attach_args(),
+                stop.name,
+                depth,
+                1 + index % 2,
+                time_limit,
+                nodes,
+                options,
+            )
+            for index in range(workers)
+        ]
+        results = [future.result() for future in futures]
+    finally:
+        if own_pool:
+            pool.shutdown()
+
+        table.close()
+        stop.close()
+        stop.unlink()
+
+    best = max(results, key=lambda result: result["depth"])
+
+    return {
+        **best,
+        "nodes": sum(result["nodes"] for result in results),
+        "seconds": perf_counter() - start,
+        "workers": workers,
+    }
+
+
+def start_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    A process pool for search_fen and parallel_search. The workers are forked
+    from a fork server, not from the caller: forking a threaded ASGI server
+    copies locks other threads hold into the child, where nothing releases them.
+    The fork server shares the tracker of shared memory with its workers, so
+    the shared table isn't taken for leaked when a worker exits.
+    """
+
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=get_context(POOL_START_METHOD)
+    )
+
+
+def _lazy_smp_worker(
+    fen: str,
+    table_args: tuple,
+    stop_name: str,
+    depth: int,
+    start_depth: int,
+    time_limit: float,
+    nodes: int,
+    options: dict,
+) -> dict:
+    """One searcher of parallel_search, in a worker process"""
+
+    table = SharedTranspositionTable(*table_args)
+    stop = SharedMemory(name=stop_name)
+
+    try:
+        result = Search(
+            Position.from_fen(fen),
+            table,
+            time_limit,
+            nodes,
+            stop=lambda: stop.buf[0],
+            **options,
+        ).run(depth, start_depth)
+
+        stop.buf[0] = 1
+    finally:
+        table.close()
+        stop.close()
+
+    return result
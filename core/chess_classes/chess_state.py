@@ -0,0 +1,141 @@
+from .chess_bitboard import (
+    WHITE,
+    BLACK,
+    ALL_CASTLING,
+    WHITE_SHORT,
+    WHITE_LONG,
+    CASTLING_MASKS,
+    SQUARE_INDEX,
+    SQUARES,
+)
+
+
+class GameState:
+    """
+    Everything about one game that isn't on the board: side to move,
+    castling rights, en passant target, move clocks and which king is in check.
+    Every game owns its own instance, which is passed explicitly
+    to the pieces and ChessLogic instead of living in class attributes.
+    """
+
+    __slots__ = (
+        "side_to_move",
+        "castling",
+        "en_passant",
+        "checked_king",
+        "check_position",
+        "halfmove_clock",
+        "fullmove_number",
+    )
+
+    def __init__(
+        self,
+        side_to_move: int = WHITE,
+        castling: int = ALL_CASTLING,
+        en_passant: str = "",
+        checked_king: str = "",
+        check_position: str = "",
+        halfmove_clock: int = 0,
+        fullmove_number: int = 1,
+    ):
+        self.side_to_move = side_to_move
+        self.castling = castling
+        # Cell a pawn can capture en passant on, like 'f6', empty when there's none
+        self.en_passant = en_passant
+        # Checked king ('WK' or 'BK') and the cell of the piece checking it
+        self.checked_king = checked_king
+        self.check_position = check_position
+        # Plies since the last capture or pawn move, and the move number like in FEN
+        self.halfmove_clock = halfmove_clock
+        self.fullmove_number = fullmove_number
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.to_dict()!r})"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, GameState):
+            return NotImplemented
+
+        return self.to_dict() == other.to_dict()
+
+    def copy(self) -> "GameState":
+        return GameState(**self.to_dict())
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "GameState":
+        """Builds the state stored in Board.state, missing keys keep their defaults"""
+
+        return cls(**{name: data[name] for name in cls.__slots__ if name in data})
+
+    def can_castle(self, side: str, short: bool) -> bool:
+        """
+        Whether the king of the side still has the castling right
+
+        Arguments:
+            side: 'white' or 'black'
+            short: True for the short castle, False for the long one
+
+        Returns:
+            bool
+        """
+
+        right = WHITE_SHORT if short else WHITE_LONG
+
+        if side == "black":
+            right <<= 2
+
+        return bool(self.castling & right)
+
+    def revoke_castling(self, side: str, short: bool = None) -> None:
+        """Takes the castling right away, both rights when short is None"""
+
+        rights = WHITE_SHORT | WHITE_LONG
+
+        if short is not None:
+            rights = WHITE_SHORT if short else WHITE_LONG
+
+        if side == "black":
+            rights <<= 2
+
+        self.castling &= ~rights
+
+    def record_move(
+        self, piece: str, old_cell: str, new_cell: str, captured: bool = False
+    ) -> None:
+        """
+        Updates the state after a committed move
+
+        Arguments:
+            piece: str, like 'WP'
+            old_cell: str, like 'e2'
+            new_cell: str, like 'e4'
+            captured: bool, whether the move took a piece
+        """
+
+        old_square, new_square = SQUARE_INDEX[old_cell], SQUARE_INDEX[new_cell]
+
+        # A king or rook leaving its starting cell, or a rook captured on it, loses the right
+        self.castling &= CASTLING_MASKS[old_square] & CASTLING_MASKS[new_square]
+
+        # After a pawn's double jump the skipped cell can be captured en passant
+        if piece[1] == "P" and abs(new_square - old_square) == 16:
+            self.en_passant = SQUARES[(old_square + new_square) // 2]
+        else:
+            self.en_passant = ""
+
+        if piece[1] == "P" or captured:
+            self.halfmove_clock = 0
+        else:
+            self.halfmove_clock += 1
+
+        if piece[0] == "B":
+            self.fullmove_number += 1
+
+        self.side_to_move = BLACK if piece[0] == "W" else WHITE
+
+    def clear_check(self) -> None:
+        self.checked_king = ""
+        self.check_position = ""
@@ -0,0 +1,165 @@
+# Attack, ray and between-square tables, built once at import.
+# Squares are numbered a1 = 0, b1 = 1, ..., h8 = 63, like in chess_bitboard.
+
+NORTH, NORTH_EAST, EAST, SOUTH_EAST, SOUTH, SOUTH_WEST, WEST, NORTH_WEST = range(8)
+
+DIRECTION_DELTAS = [(0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1), (-1, 0), (-1, 1)]
+
+HORSE_DELTAS = [(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)]
+
+
+def _square(col: int, row: int) -> int | None:
+    if 0 <= col <= 7 and 0 <= row <= 7:
+        return row * 8 + col
+
+    return None
+
+
+def _step_table(deltas: list) -> list:
+    table = []
+
+    for square in range(64):
+        col, row = square & 7, square >> 3
+        attacks = 0
+
+        for col_delta, row_delta in deltas:
+            target = _square(col + col_delta, row + row_delta)
+
+            if target is not None:
+                attacks |= 1 << target
+
+        table.append(attacks)
+
+    return table
+
+
+def _ray_table(col_delta: int, row_delta: int) -> list:
+    table = []
+
+    for square in range(64):
+        col, row = square & 7, square >> 3
+        ray = 0
+
+        target = _square(col + col_delta, row + row_delta)
+        while target is not None:
+            ray |= 1 << target
+            col, row = col + col_delta, row + row_delta
+            target = _square(col + col_delta, row + row_delta)
+
+        table.append(ray)
+
+    return table
+
+
+HORSE_ATTACKS = _step_table(HORSE_DELTAS)
+KING_ATTACKS = _step_table(DIRECTION_DELTAS)
+
+# PAWN_ATTACKS[color][square], color 0 is white and 1 is black
+PAWN_ATTACKS = [_step_table([(-1, 1), (1, 1)]), _step_table([(-1, -1), (1, -1)])]
+
+# RAYS[direction][square], every square the direction reaches on an empty board
+RAYS = [_ray_table(*delta) for delta in DIRECTION_DELTAS]
+
+ROOK_LINES = [
+    RAYS[NORTH][sq] | RAYS[EAST][sq] | RAYS[SOUTH][sq] | RAYS[WEST][sq]
+    for sq in range(64)
+]
+BISHOP_LINES = [
+    RAYS[NORTH_EAST][sq]
+    | RAYS[SOUTH_EAST][sq]
+    | RAYS[SOUTH_WEST][sq]
+    | RAYS[NORTH_WEST][sq]
+    for sq in range(64)
+]
+QUEEN_LINES = [ROOK_LINES[sq] | BISHOP_LINES[sq] for sq in range(64)]
+
+
+def _between_table() -> list:
+    table = [[0] * 64 for _ in range(64)]
+
+    for start in range(64):
+        for col_delta, row_delta in DIRECTION_DELTAS:
+            col, row = start & 7, start >> 3
+            path = 0
+
+            # Walk outwards, every square reached sees the squares walked before it
+            end = _square(col + col_delta, row + row_delta)
+            while end is not None:
+                table[start][end] = path
+                path |= 1 << end
+                col, row = col + col_delta, row + row_delta
+                end = _square(col + col_delta, row + row_delta)
+
+    return table
+
+
+# BETWEEN[a][b], squares strictly between a and b when they share a line, otherwise 0
+BETWEEN = _between_table()
+
+
+def _line_table() -> list:
+    table = [[0] * 64 for _ in range(64)]
+
+    for start in range(64):
+        for direction in range(8):
+            # The opposite direction is four steps further round the compass
+            opposite = (direction + 4) % 8
+            line = RAYS[direction][start] | RAYS[opposite][start] | 1 << start
+
+            for end in range(64):
+                if RAYS[direction][start] >> end & 1:
+                    table[start][end] = line
+
+    return table
+
+
+# LINE[a][b], the whole line through a and b from edge to edge, otherwise 0
+LINE = _line_table()
+
+
+def rook_attacks(square: int, occupied: int) -> int:
+    """Squares a rook on the square attacks, the first piece on every ray blocks it"""
+
+    attacks = 0
+
+    for direction in (NORTH, EAST):
+        ray = RAYS[direction][square]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= RAYS[direction][(blockers & -blockers).bit_length() - 1]
+        attacks |= ray
+
+    for direction in (SOUTH, WEST):
+        ray = RAYS[direction][square]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= RAYS[direction][blockers.bit_length() - 1]
+        attacks |= ray
+
+    return attacks
+
+
+def bishop_attacks(square: int, occupied: int) -> int:
+    """Squares a bishop on the square attacks, the first piece on every ray blocks it"""
+
+    attacks = 0
+
+    for direction in (NORTH_EAST, NORTH_WEST):
+        ray = RAYS[direction][square]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= RAYS[direction][(blockers & -blockers).bit_length() - 1]
+        attacks |= ray
+
+    for direction in (SOUTH_EAST, SOUTH_WEST):
+        ray = RAYS[direction][square]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= RAYS[direction][blockers.bit_length() - 1]
+        attacks |= ray
+
+    return attacks
+
+
+def queen_attacks(square: int, occupied: int) -> int:
+    return rook_attacks(square, occupied) | bishop_attacks(square, occupied)
@@ -0,0 +1,178 @@
+from array import array
+from multiprocessing.shared_memory import SharedMemory
+
+# What the stored score means for the window it was searched with
+EXACT, LOWER_BOUND, UPPER_BOUND = 1, 2, 3
+
+# Layout of the data word, the move takes the low 17 bits like in chess_bitboard
+_MOVE_BITS = 17
+_SCORE_SHIFT = 17
+_SCORE_BITS = 20
+_SCORE_OFFSET = 1 << (_SCORE_BITS - 1)
+_DEPTH_SHIFT = _SCORE_SHIFT + _SCORE_BITS
+_BOUND_SHIFT = _DEPTH_SHIFT + 8
+_AGE_SHIFT = _BOUND_SHIFT + 2
+
+_MOVE_MASK = (1 << _MOVE_BITS) - 1
+_SCORE_MASK = (1 << _SCORE_BITS) - 1
+_AGE_MASK = 63
+
+
+class TranspositionTable:
+    """
+    Fixed-size table of search results indexed by the Zobrist key.
+    Entries live in one flat array of 64-bit words, two per entry:
+    the key xor the data, then the data. A probe only trusts an entry whose
+    first word xor the second gives back the probed key, so a torn or
+    foreign entry reads as a miss.
+    """
+
+    def __init__(self, size: int = 1 << 16):
+        """
+        Arguments:
+            size: int, number of entries, rounded down to a power of two
+        """
+
+        self.size = 1 << (max(size, 1).bit_length() - 1)
+        self.mask = self.size - 1
+        self.words = array("Q", bytes(16 * self.size))
+        self.age = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def clear(self) -> None:
+        self.words = array("Q", bytes(16 * self.size))
+        self.age = 0
+
+    def new_search(self) -> None:
+        """Ages the entries, those from older searches get replaced first"""
+
+        self.age = (self.age + 1) & _AGE_MASK
+
+    def store(self, key: int, depth: int, score: int, bound: int, move: int = 0) -> None:
+        """
+        Saves a search result, keeping a deeper entry of the current search
+        stored for another position in the same slot
+
+        Arguments:
+            key: int, Zobrist key of the position
+            depth: int, remaining depth the position was searched to (0 - 255)
+            score: int, fits in 20 bits with the sign
+            bound: EXACT, LOWER_BOUND or UPPER_BOUND
+            move: int, best move found, 0 if none
+        """
+
+        index = (key & self.mask) * 2
+        words = self.words
+        stored = words[index + 1]
+
+        if (
+            stored
+            and words[index] ^ stored != key
+            and (stored >> _AGE_SHIFT) & _AGE_MASK == self.age
+            and (stored >> _DEPTH_SHIFT) & 255 > depth
+        ):
+            return None
+
+        data = (
+            (move & _MOVE_MASK)
+            | (score + _SCORE_OFFSET) << _SCORE_SHIFT
+            | depth << _DEPTH_SHIFT
+            | bound << _BOUND_SHIFT
+            | self.age << _AGE_SHIFT
+        )
+
+        words[index] = key ^ data
+        words[index + 1] = data
+
+    def probe(self, key: int) -> tuple | None:
+        """
+        Looks the position up
+
+        Returns:
+            (move, score, depth, bound) or None when the position isn't stored
+        """
+
+        index = (key & self.mask) * 2
+        data = self.words[index + 1]
+
+        if not data or self.words[index] ^ data != key:
+            return None
+
+        return (
+            data & _MOVE_MASK,
+            ((data >> _SCORE_SHIFT) & _SCORE_MASK) - _SCORE_OFFSET,
+            (data >> _DEPTH_SHIFT) & 255,
+            (data >> _BOUND_SHIFT) & 3,
+        )
+
+    def hashfull(self) -> int:
+        """Permille of the first thousand entries used in the current search, like UCI"""
+
+        sample = min(self.size, 1000)
+        used = sum(
+            1
+            for index in range(sample)
+            if self.words[index * 2 + 1]
+            and (self.words[index * 2 + 1] >> _AGE_SHIFT) & _AGE_MASK == self.age
+        )
+
+        return used * 1000 // sample
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """
+    TranspositionTable in multiprocessing.shared_memory, so the processes of
+    a parallel search read and write one table. There is no lock: processes
+    may overwrite each other's entries or tear them halfway, and the key xor
+    data check makes a torn entry a miss like any other.
+
+    The process that creates the table unlinks it, every other one attaches
+    to it by name and only closes it.
+    """
+
+    def __init__(self, size: int = 1 << 16, name: str = None, age: int = 0):
+        """
+        Arguments:
+            size: int, number of entries, rounded down to a power of two
+            name: string, the shared memory of an existing table to attach to
+            age: int, the age of the attached table, the processes of one
+                search have to agree on it
+        """
+
+        self.size = 1 << (max(size, 1).bit_length() - 1)
+        self.mask = self.size - 1
+        self.owner = name is None
+
+        if self.owner:
+            self.memory = SharedMemory(create=True, size=16 * self.size)
+            # The memory comes zeroed, every entry empty
+        else:
+            self.memory = SharedMemory(name=name)
+
+        self.words = self.memory.buf.cast("Q")
+        self.age = age
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    def attach_args(self) -> tuple:
+        """What another process passes to SharedTranspositionTable to attach"""
+
+        return self.size, self.name, self.age
+
+    def clear(self) -> None:
+        self.memory.buf[: 16 * self.size] = bytes(16 * self.size)
+        self.age = 0
+
+    def close(self) -> None:
+        """Detaches this process, the owner frees the memory as well"""
+
+        # The view has to go before the memory it looks at
+        self.words.release()
+        self.memory.close()
+
+        if self.owner:
+            self.memory.unlink()
@@ -0,0 +1,403 @@
+from .chess_bitboard import (
+    Position,
+    PIECE_INDEX,
+    SQUARES,
+    SQUARE_INDEX,
+    WHITE,
+    BLACK,
+    lsb,
+    iter_squares,
+)
+from .chess_state import GameState
+from .chess_tables import (
+    BETWEEN,
+    ROOK_LINES,
+    BISHOP_LINES,
+    QUEEN_LINES,
+    HORSE_ATTACKS,
+    KING_ATTACKS,
+    PAWN_ATTACKS,
+)
+
+# Stateless move rules, one function per piece. They take the grid (a dict grid
+# or a Position) and the side as arguments, so validating a move or scanning
+# the board for checks doesn't create a piece object per square.
+
+
+def _is_path_clear(grid, current_square: int, target_square: int) -> bool:
+    """Checks that every cell strictly between the two squares is empty"""
+
+    between = BETWEEN[current_square][target_square]
+
+    if isinstance(grid, Position):
+        return not between & grid.occupied
+
+    return all(grid[SQUARES[square]] == "empty" for square in iter_squares(between))
+
+
+def _can_land_on(grid, side: str, target_position: str) -> bool:
+    """The target cell is either empty or holds an enemy piece"""
+
+    return grid[target_position][0] != side[0].upper()
+
+
+def _validate_line_move(
+    grid, side: str, current_position: str, target_position: str, lines: list
+) -> bool:
+    """Validates a sliding move along the lines table of the piece"""
+
+    current_square = SQUARE_INDEX.get(current_position)
+    target_square = SQUARE_INDEX.get(target_position)
+
+    if current_square is None or target_square is None:
+        return False
+
+    if not lines[current_square] >> target_square & 1:
+        return False
+
+    if not _is_path_clear(grid, current_square, target_square):
+        return False
+
+    return _can_land_on(grid, side, target_position)
+
+
+def validate_rook(
+    grid, side: str, current_position: str, target_position: str, state=None
+) -> bool:
+    # Rooks cannot move diagonally, so only the straight lines are looked up
+    return _validate_line_move(grid, side, current_position, target_position, ROOK_LINES)
+
+
+def validate_bishop(
+    grid, side: str, current_position: str, target_position: str, state=None
+) -> bool:
+    return _validate_line_move(
+        grid, side, current_position, target_position, BISHOP_LINES
+    )
+
+
+def validate_queen(
+    grid, side: str, current_position: str, target_position: str, state=None
+) -> bool:
+    # Essentially queen moves are rook's and bishop's moves combined
+    return _validate_line_move(
+        grid, side, current_position, target_position, QUEEN_LINES
+    )
+
+
+def validate_horse(
+    grid, side: str, current_position: str, target_position: str, state=None
+) -> bool:
+    current_square = SQUARE_INDEX.get(current_position)
+    target_square = SQUARE_INDEX.get(target_position)
+
+    if current_square is None or target_square is None:
+        return False
+
+    if not HORSE_ATTACKS[current_square] >> target_square & 1:
+        return False
+
+    return _can_land_on(grid, side, target_position)
+
+
+def pawn_en_passant(
+    grid, side: str, current_position: str, target_position: str, state: GameState
+) -> bool:
+    """
+    Checks whether the pawn can capture en passant,
+    the target has to be the cell the enemy pawn skipped with its double jump
+    """
+
+    if not state.en_passant or target_position != state.en_passant:
+        return False
+
+    current_square = SQUARE_INDEX[current_position]
+    color = WHITE if side == "white" else BLACK
+
+    # White captures from the fifth row, black from the fourth
+    if current_square >> 3 != (4 if color == WHITE else 3):
+        return False
+
+    # The target has to be the diagonal cell in front of the pawn
+    target_square = SQUARE_INDEX[target_position]
+
+    return bool(PAWN_ATTACKS[color][current_square] >> target_square & 1)
+
+
+def pawn_attack(grid, side: str, current_position: str, target_position: str) -> bool:
+    """Checks whether the pawn can capture an enemy piece on the target cell"""
+
+    current_square = SQUARE_INDEX.get(current_position)
+    target_square = SQUARE_INDEX.get(target_position)
+
+    if current_square is None or target_square is None:
+        return False
+
+    color = WHITE if side == "white" else BLACK
+
+    if not PAWN_ATTACKS[color][current_square] >> target_square & 1:
+        return False
+
+    target = grid[target_position]
+
+    return target != "empty" and target[0] != side[0].upper()
+
+
+def pawn_forward(grid, side: str, current_position: str, target_position: str) -> bool:
+    """
+    Decides whether the pawn can move to the front cell
+    Also checks if the pawn can make two cells move
+    """
+
+    current_square = SQUARE_INDEX.get(current_position)
+    target_square = SQUARE_INDEX.get(target_position)
+
+    if current_square is None or target_square is None:
+        return False
+
+    row = current_square >> 3
+    direction = 8 if side == "white" else -8
+
+    # A pawn on the last row has nowhere to go
+    if row == (7 if side == "white" else 0):
+        return False
+
+    front = current_square + direction
+
+    # If the cell in front of the pawn isn't empty then return False
+    if grid[SQUARES[front]] != "empty":
+        return False
+
+    # From the starting row the pawn can jump two cells
+    if row == (1 if side == "white" else 6) and target_square == front + direction:
+        return grid[target_position] == "empty"
+
+    return target_square == front
+
+
+def validate_pawn(
+    grid, side: str, current_position: str, target_position: str, state=None
+) -> bool:
+    if pawn_forward(grid, side, current_position, target_position):
+        return True
+    elif pawn_attack(grid, side, current_position, target_position):
+        return True
+
+    if state is None:
+        return False
+
+    return pawn_en_passant(grid, side, current_position, target_position, state)
+
+
+def king_step(
+    grid, side: str, current_position: str, target_position: str, state=None
+) -> bool:
+    """
+    Validates if the king can move to the target position.
+    The king can move one square in any direction, but cannot move into check.
+    """
+
+    current_square = SQUARE_INDEX.get(current_position)
+    target_square = SQUARE_INDEX.get(target_position)
+
+    if current_square is None or target_square is None:
+        return False
+
+    # Check if the move is within one square in any direction
+    if not KING_ATTACKS[current_square] >> target_square & 1:
+        return False
+
+    # Check if target position is occupied by a friendly piece
+    return _can_land_on(grid, side, target_position)
+
+
+def is_cell_attacked(grid, side: str, current_position: str, cell_position: str) -> bool:
+    """Whether the king of the side would be in check after stepping to the cell"""
+
+    piece_name = side[0].upper() + "K"
+
+    # Move the king on the grid in place and put everything back afterwards
+    original = grid[current_position]
+    captured = grid[cell_position]
+
+    grid[current_position] = "empty"
+    grid[cell_position] = piece_name
+
+    try:
+        return is_king_in_check(grid, side, piece_name)
+    finally:
+        grid[cell_position] = captured
+        grid[current_position] = original
+
+
+def king_castle(
+    grid, side: str, current_position: str, target_position: str, state: GameState
+) -> bool:
+    # The king has moved already, or both rooks have
+    if not (state.can_castle(side, short=True) or state.can_castle(side, short=False)):
+        return False
+
+    row = "1" if side == "white" else "8"
+    color = side[0].upper()
+
+    if current_position != "e" + row:
+        return False
+
+    # Can't castle when in check
+    if is_cell_attacked(grid, side, target_position, current_position):
+        return False
+
+    # Short castle
+    if target_position[0] > current_position[0]:
+        if grid["h" + row] != color + "R" or not state.can_castle(side, short=True):
+            return False
+
+        # The f and g cells have to be empty and not under attack
+        for cell in ("f" + row, "g" + row):
+            if is_cell_attacked(grid, side, current_position, cell):
+                return False
+
+        if grid["f" + row] != "empty" or grid["g" + row] != "empty":
+            return False
+
+        return target_position in ("h" + row, "g" + row)
+
+    # Long castle
+    if target_position[0] < current_position[0]:
+        if grid["a" + row] != color + "R" or not state.can_castle(side, short=False):
+            return False
+
+        # The d and c cells have to be empty and not under attack, b only empty
+        for cell in ("d" + row, "c" + row):
+            if is_cell_attacked(grid, side, current_position, cell):
+                return False
+
+        if any(grid[column + row] != "empty" for column in "bcd"):
+            return False
+
+        return target_position in ("a" + row, "c" + row)
+
+    return False
+
+
+def validate_king(
+    grid, side: str, current_position: str, target_position: str, state=None
+) -> bool:
+    if king_step(grid, side, current_position, target_position):
+        return True
+
+    if state is None:
+        return False
+
+    return king_castle(grid, side, current_position, target_position, state)
+
+
+# Full move rules by piece letter, all called as (grid, side, current, target, state)
+VALIDATORS = {
+    "R": validate_rook,
+    "P": validate_pawn,
+    "K": validate_king,
+    "Q": validate_queen,
+    "H": validate_horse,
+    "B": validate_bishop,
+}
+
+# What a piece attacks, pawns only attack diagonally and kings don't castle into a check
+ATTACKS = {
+    "R": validate_rook,
+    "P": pawn_attack,
+    "K": king_step,
+    "Q": validate_queen,
+    "H": validate_horse,
+    "B": validate_bishop,
+}
+
+
+def is_king_in_check(
+    board,
+    king_color: str,
+    king_identifier: str = None,
+    check_use: bool = None,
+    state: GameState = None,
+) -> bool:
+    """
+    Check if a given king is in check.
+
+    Arguments:
+        board: dictionary instance or Position, consiting of cells and their state
+        king_color: king's color, string ('white' or 'black')
+        king_identifier: string, like 'WK' or 'BK'
+        check_use: boolean value, tells the method should it record the checked king and the checking piece in the state
+        state: GameState of the game, holds the king that was last put in check
+
+    Returns:
+        bool
+    """
+
+    if state is not None and state.checked_king:
+        king_identifier = state.checked_king
+
+    if isinstance(board, Position):
+        return _is_king_in_check_bitboard(board, king_identifier, check_use, state)
+
+    king_position = ""
+
+    for position, piece in board.items():
+        if piece == king_identifier:
+            king_position = position
+            break
+
+    if not king_position:
+        return False
+
+    if king_identifier[0] == "W":
+        enemy_color = "black"
+    elif king_identifier[0] == "B":
+        enemy_color = "white"
+    else:  # pragma: no cover
+        enemy_color = "black" if king_color == "white" else "white"
+
+    enemy_letter = enemy_color[0].upper()
+
+    for position, piece in board.items():
+        if piece[0] != enemy_letter:
+            continue
+
+        attacks = ATTACKS.get(piece[1])
+
+        if attacks and attacks(board, enemy_color, position, king_position):
+            # So that when just waving around the piece it wouldn't record the check
+            if check_use == True and state is not None:
+                state.checked_king = king_identifier
+                state.check_position = position
+            return True
+
+    return False
+
+
+def _is_king_in_check_bitboard(
+    board: Position,
+    king_identifier: str,
+    check_use: bool = None,
+    state: GameState = None,
+) -> bool:
+    """is_king_in_check for a Position, reads the attackers straight from the bitboards"""
+
+    king_piece = PIECE_INDEX.get(king_identifier)
+
+    if king_piece is None or not board.pieces[king_piece]:
+        return False
+
+    king_square = lsb(board.pieces[king_piece])
+    enemy_color = BLACK if king_identifier[0] == "W" else WHITE
+
+    attackers = board.attackers_to(king_square, enemy_color)
+
+    if not attackers:
+        return False
+
+    if check_use == True and state is not None:
+        state.checked_king = king_identifier
+        state.check_position = SQUARES[lsb(attackers)]
+
+    return True
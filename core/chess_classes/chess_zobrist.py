@@ -0,0 +1,16 @@
+from random import Random
+
+# Fixed seed, so every worker process hashes a position to the same key
+_random = Random(0x5EED)
+
+# PIECE_KEYS[piece][square], piece is color * 6 + piece type like in chess_bitboard
+PIECE_KEYS = [[_random.getrandbits(64) for _ in range(64)] for _ in range(12)]
+
+# One key per combination of the four castling rights
+CASTLING_KEYS = [_random.getrandbits(64) for _ in range(16)]
+
+# En passant is hashed by the file of the en passant cell
+EN_PASSANT_KEYS = [_random.getrandbits(64) for _ in range(8)]
+
+# Mixed in when black is to move
+SIDE_KEY = _random.getrandbits(64)
@@ -168,3 +168,21 @@ REST_FRAMEWORK = {
         'rest_framework.parsers.MultiPartParser'
      )
 }
+
+# Channel layer for the chess game groups, Redis when REDIS_URL is set so every
+# Daphne process sees the same groups, otherwise in memory for a single process
+if os.environ.get('REDIS_URL'):
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [os.environ.get('REDIS_URL')],
+            },
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        }
+    }
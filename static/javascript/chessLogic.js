@@ -111,6 +111,8 @@ export class ChessLogic {
 
     if (this.state.isCheckmate) {
       this.handleCheckmate();
+    } else if (this.state.isStalemate) {
+      this.handleStalemate();
     }
 
     this.sendMove(body);
@@ -287,6 +289,20 @@ export class ChessLogic {
     document.body.insertBefore(header, document.body.firstChild);
   }
 
+  handleStalemate() {
+    const chessBoard = document.getElementById("board");
+    const header = document.createElement("h1");
+
+    chessBoard.style.pointerEvents = "none";
+
+    const text = document.createTextNode(
+      "Draw by stalemate, you can play again by pressing reset button"
+    );
+    header.appendChild(text);
+
+    document.body.insertBefore(header, document.body.firstChild);
+  }
+
   castle(row, rookColumn, kingColumnAfterCastle, rookColumnAfterCastle) {
     const rookCell = document.getElementById(rookColumn + row);
     const rook = rookCell.querySelector("img");
@@ -319,6 +335,85 @@ export class ChessLogic {
     }
   }
 
+  setCells(changes) {
+    // Puts the pieces of a delta or a snapshot on their cells, "empty" clears one
+    for (const [cellId, pieceName] of Object.entries(changes)) {
+      const cell = document.getElementById(cellId);
+      const current = cell.querySelector("img");
+
+      if (current) {
+        cell.removeChild(current);
+      }
+
+      if (pieceName !== "empty") {
+        const piece = createElementFromString(getPiece(pieceName));
+
+        // The kings are looked up by id for the check effect
+        if (pieceName[1] === "K") {
+          piece.id = pieceName;
+        }
+
+        cell.appendChild(piece);
+      }
+    }
+  }
+
+  clearChecks() {
+    this.cells.forEach((cell) => {
+      cell.classList.remove("check");
+    });
+  }
+
+  applyRemoteMove(data) {
+    // A move the opponent played, broadcast to everyone else in the game
+    this.state.winner = data.winner;
+    this.state.isCheck = data.check;
+    this.state.isCheckmate = data.checkmate;
+    this.state.isStalemate = data.stalemate;
+
+    this.clearChecks();
+    this.setCells(data.changes);
+
+    if (this.state.isCheck) {
+      // Every piece a move puts on a cell is of the side that moved
+      const moved = Object.values(data.changes).find((piece) => piece !== "empty");
+      const color = moved[0] === "W" ? "B" : "W";
+
+      this.addCheckEffect(document.getElementById(color + "K"));
+    }
+
+    if (this.state.isCheckmate) {
+      this.handleCheckmate();
+    } else if (this.state.isStalemate) {
+      this.handleStalemate();
+    }
+  }
+
+  applySync(data) {
+    // The moves missed while disconnected, or the whole board when too far behind
+    this.clearChecks();
+
+    if (data.type === "snapshot") {
+      this.cells.forEach((cell) => {
+        const piece = cell.querySelector("img");
+
+        if (piece) {
+          cell.removeChild(piece);
+        }
+      });
+
+      this.setCells(data.board);
+    } else {
+      for (const delta of data.deltas) {
+        this.setCells(delta.changes);
+      }
+    }
+
+    if (data.checked_king) {
+      this.addCheckEffect(document.getElementById(data.checked_king));
+    }
+  }
+
   isKingCastles(oldCell, newCell) {
     const oldRow = Number(oldCell[1]);
     const newRow = Number(newCell[1]);
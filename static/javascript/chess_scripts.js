@@ -5,7 +5,6 @@ class ChessGame extends ChessLogic {
   constructor(webSocket) {
     super();
     this.cells = document.querySelectorAll(".black-cell, .white-cell");
-    this.ws = webSocket;
     this.state = {
       dragged: undefined,
       startingCell: undefined,
@@ -13,15 +12,121 @@ class ChessGame extends ChessLogic {
       winner: undefined,
       isCheck: undefined,
       isCheckmate: undefined,
+      isStalemate: undefined,
       isCastle: undefined,
       pieceMoved: undefined,
       processedCell: undefined,
       isEnPassant: undefined,
+      targets: [],
+      awaitingReply: false,
     };
     this.sendTime = null;
 
     // Calls initDrag
     this.initDrag();
+
+    // Ply of the last move this page has shown, the page starts at the initial position
+    this.seq = 0;
+    this.setSocket(webSocket);
+  }
+
+  setSocket(webSocket) {
+    // A new socket after a reconnect asks for the moves it missed
+    this.ws = webSocket;
+    this.ws.addEventListener("message", this.handleMessage.bind(this));
+    this.sendMove({ eventType: "sync", seq: this.seq });
+  }
+
+  handleMessage(e) {
+    const data = JSON.parse(e.data);
+
+    if (data.type === "move") {
+      // A move the opponent played, a gap in the numbers means one was missed
+      if (data.seq !== this.seq + 1) {
+        this.sendMove({ eventType: "sync", seq: this.seq });
+        return;
+      }
+
+      this.seq = data.seq;
+      this.applyRemoteMove(data);
+      return;
+    } else if (data.type === "sync" || data.type === "snapshot") {
+      this.seq = data.seq;
+      this.applySync(data);
+      return;
+    } else if (data.type === "targets") {
+      // The cells the piece that was picked up can go to
+      this.showTargets(data);
+      return;
+    }
+
+    if (data.seq !== undefined) {
+      this.seq = data.seq;
+    }
+
+    this.state.winner = data.winner;
+    this.state.isCheckmate = data.checkmate;
+    this.state.isStalemate = data.stalemate;
+    this.state.isCheck = data.check;
+    this.state.isEnPassant = data.en_passant;
+
+    const receiveTime = performance.now();
+    if (this.sendTime !== null) {
+      const latency = receiveTime - this.sendTime;
+      console.log(`WebSocket move round-trip time: ${latency.toFixed(2)} ms`);
+      this.sendTime = null; // Reset for next measurement
+    }
+
+    // The reply to the move just played, the piece is already on its new cell
+    if (this.state.awaitingReply) {
+      this.state.awaitingReply = false;
+      this.applyMoveResult(data);
+    }
+  }
+
+  showTargets(data) {
+    if (data.cell !== this.state.startingCell) {
+      return;
+    }
+
+    this.state.targets = data.targets;
+
+    for (const cell of data.targets) {
+      document.getElementById(cell).classList.add("target");
+    }
+  }
+
+  clearTargets() {
+    this.state.targets = [];
+
+    this.cells.forEach((cell) => {
+      cell.classList.remove("target");
+    });
+  }
+
+  applyMoveResult(data) {
+    // The server didn't play the move, its board replaces the one shown
+    if (!data.move_valid) {
+      this.sendMove({ eventType: "sync", seq: null });
+      return;
+    }
+
+    if (this.state.isEnPassant) {
+      this.state.processedCell = data.processed_cell;
+      this.enPassant();
+    }
+
+    if (this.state.isCheck) {
+      const color = this.state.pieceMoved[0] === "W" ? "B" : "W";
+
+      this.addCheckEffect(document.getElementById(color + "K"));
+    }
+
+    if (this.state.isCheckmate) {
+      this.handleCheckmate();
+    } else if (this.state.isStalemate) {
+      this.handleStalemate();
+    }
   }
 
   sendMove(body) {
@@ -55,6 +160,13 @@ class ChessGame extends ChessLogic {
     this.state.startingCell = event.target.closest(
       ".black-cell, .white-cell"
     ).dataset.cell;
+    this.state.pieceMoved = event.target.dataset.id;
+
+    this.clearTargets();
+    this.sendMove({
+      eventType: "pieceSelected",
+      oldCell: this.state.startingCell,
+    });
   }
 
   handleDragOver(event) {
@@ -64,6 +176,12 @@ class ChessGame extends ChessLogic {
   }
 
   handleDragEnter(event) {
+    const endCell = event.currentTarget.dataset.cell;
+
+    // Drops are checked against the targets, nothing is sent while dragging
+    this.state.validMove = this.state.targets.includes(endCell);
+    this.state.processedCell = endCell;
+
     if (
       !event.currentTarget.classList.contains("dropzone") &&
       this.state.validMove
@@ -71,46 +189,7 @@ class ChessGame extends ChessLogic {
       event.currentTarget.classList.add("dropzone");
     }
 
-    const endCell = event.currentTarget.dataset.cell;
-    this.state.pieceMoved = this.state.dragged.dataset.id;
-    // console.log(this.state.dragged);
-
     this.state.isCastle = this.isKingCastles(this.state.startingCell, endCell);
-
-    const body = {
-      oldCell: this.state.startingCell,
-      newCell: endCell,
-      pieceMoved: this.state.pieceMoved,
-    };
-
-    try {
-      this.sendMove(body);
-
-      this.ws.addEventListener("message", (e) => {
-        const data = JSON.parse(e.data)
-
-        this.state.winner = data.winner;
-        this.state.isCheckmate = data.checkmate;
-        this.state.isCheck = data.check;
-        this.state.validMove = data.move_valid;
-        this.state.processedCell = data.processed_cell;
-        this.state.isEnPassant = data.en_passant;
-
-        const receiveTime = performance.now();
-        if (this.sendTime !== null) {
-          const latency = receiveTime - this.sendTime;
-          console.log(
-            `WebSocket move round-trip time: ${latency.toFixed(2)} ms`
-          );
-          this.sendTime = null; // Reset for next measurement
-        }
-      });
-    } catch (error) {
-      console.error("Validation error:", error);
-      this.state.validMove = false;
-    } finally {
-      this.state.isValidating = false;
-    }
   }
 
   handleDragLeave(event) {
@@ -121,6 +200,7 @@ class ChessGame extends ChessLogic {
     this.cells.forEach((cell) => {
       cell.classList.remove("dropzone");
     });
+    this.clearTargets();
 
     if (
       this.state.validMove &&
@@ -143,6 +223,7 @@ class ChessGame extends ChessLogic {
       // const data = JSON.stringlify(body);
       // this.ws.send(data);
       // * Both methods work fine but lower one is cleaner
+      this.state.awaitingReply = true;
       this.sendMove(body);
     }
   }
@@ -176,28 +257,7 @@ class ChessGame extends ChessLogic {
           event.currentTarget.classList.remove("dropzone");
         }
         
-        if (this.state.isEnPassant) {
-          this.enPassant();
-        }
-
-        if (this.state.isCheck) {
-          let color;
-          let piece = event.currentTarget.querySelector("img").dataset.id;
-
-          if (piece[0] === "B") {
-            color = "W";
-          } else if (piece[0] === "W") {
-            color = "B";
-          }
-
-          const king = document.getElementById(color + "K");
-
-          this.addCheckEffect(king);
-        }
-
-        if (this.state.isCheckmate) {
-          this.handleCheckmate();
-        }
+        // En passant, check and the end of the game come with the reply to the move
       }
     } catch (error) {
       console.error(error);
@@ -206,8 +266,41 @@ class ChessGame extends ChessLogic {
   }
 }
 
-const webSocket = new WebSocket(`ws://${window.location.host}/ws/chess//`);
+// Every game has its own socket route, shared by both players and the spectators
+const gameId = document.getElementById("board").dataset.gameId;
+const socketUrl = `ws://${window.location.host}/ws/chess/${
+  gameId ? gameId + "/" : ""
+}`;
+// Close code of the server for a game that doesn't exist, see consumers.py
+const GAME_NOT_FOUND = 4404;
+// Reconnects wait twice as long after every failed attempt, up to the maximum
+const RECONNECT_DELAY = 1000;
+const MAX_RECONNECT_DELAY = 30000;
+let game;
+let reconnectDelay = RECONNECT_DELAY;
+
+function openSocket() {
+  const webSocket = new WebSocket(socketUrl);
+
+  webSocket.addEventListener("open", (e) => {
+    reconnectDelay = RECONNECT_DELAY;
+
+    if (game) {
+      game.setSocket(webSocket);
+    } else {
+      game = new ChessGame(webSocket);
+    }
+  });
+
+  // Reconnect, the sync on open brings the board up to date
+  webSocket.addEventListener("close", (e) => {
+    if (e.code === GAME_NOT_FOUND) {
+      return;
+    }
+
+    setTimeout(openSocket, reconnectDelay);
+    reconnectDelay = Math.min(reconnectDelay * 2, MAX_RECONNECT_DELAY);
+  });
+}
 
-webSocket.addEventListener("open", (e) => {
-  new ChessGame(webSocket);
-});
+openSocket();
@@ -0,0 +1,48 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from core.chess_classes.chess_bench import SUITES, TACTICAL_POSITIONS, ReferencePosition
+from core.chess_classes.chess_bitboard import Position
+from core.chess_classes.chess_movegen import generate_legal_moves
+
+
+class ChessBenchTests(TestCase):
+
+    def test_suites(self) -> None:
+        """Test every suite reports a positive time per call"""
+
+        for suite in SUITES.values():
+            for label, seconds in suite(1):
+                self.assertIsInstance(label, str)
+                self.assertGreater(seconds, 0)
+
+    def test_reference_position(self) -> None:
+        """Test the position without a score plays moves like Position"""
+
+        fen = dict(TACTICAL_POSITIONS)["kiwipete"]
+        position, reference = Position.from_fen(fen), ReferencePosition.from_fen(fen)
+
+        for move in generate_legal_moves(position):
+            position.make_move(move)
+            reference.make_move(move)
+
+            self.assertEqual(reference.key, position.key)
+            self.assertEqual(reference.squares, position.squares)
+            self.assertEqual(reference.score, 0)
+
+            position.unmake_move()
+            reference.unmake_move()
+
+    def test_chessbench_command(self) -> None:
+        """Test the chessbench command runs the chosen suites"""
+
+        out = StringIO()
+        call_command("chessbench", "checkmate", "--number", "1", stdout=out)
+
+        self.assertIn("checkmate back_rank_mate (position):", out.getvalue())
+        self.assertNotIn("handle_move", out.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command("chessbench", "nothing")
@@ -0,0 +1,265 @@
+from django.test import TestCase
+from core.base_board import base
+from core.chess_classes.chess_bitboard import (
+    Position,
+    START_FEN,
+    SQUARE_INDEX,
+    PIECE_INDEX,
+    SQUARES,
+    WHITE,
+    BLACK,
+    FULL_BOARD,
+    iter_squares,
+)
+from core.chess_classes.chess_logic import ChessLogic
+from core.chess_classes.chess_movegen import (
+    generate_legal_moves,
+    generate_pseudo_legal_moves,
+)
+from core.chess_classes.chess_pieces import King, Rook, Pawn
+from core.chess_classes.chess_state import GameState
+
+
+def snapshot(position: Position) -> tuple:
+    return (
+        position.pieces.copy(),
+        position.occupancy.copy(),
+        position.occupied,
+        position.squares.copy(),
+        position.turn,
+        position.castling,
+        position.ep_square,
+        position.halfmove_clock,
+        position.fullmove_number,
+        position.key,
+        position.score,
+        len(position.history),
+    )
+
+
+class PositionTests(TestCase):
+
+    def test_grid_round_trip(self) -> None:
+        """Test converting the dict grid to a Position and back"""
+
+        board = base()
+
+        board["e1"] = "WK"
+        board["e8"] = "BK"
+        board["d4"] = "WH"
+        board["h7"] = "BP"
+
+        position = Position.from_grid(board)
+
+        self.assertEqual(position.to_grid(), board)
+        self.assertEqual(position, board)
+
+        self.assertEqual(position.pieces[PIECE_INDEX["WH"]], 1 << SQUARE_INDEX["d4"])
+        self.assertEqual(bin(position.occupancy[WHITE]).count("1"), 2)
+        self.assertEqual(bin(position.occupancy[BLACK]).count("1"), 2)
+        self.assertEqual(position.occupied, position.occupancy[WHITE] | position.occupancy[BLACK])
+
+    def test_dict_interface(self) -> None:
+        """Test the Position can stand in for the dict grid"""
+
+        position = Position.from_grid(base())
+
+        position["a1"] = "WR"
+        position["a1"] = "BQ"
+
+        self.assertEqual(position["a1"], "BQ")
+        self.assertEqual(position.pieces[PIECE_INDEX["WR"]], 0)
+
+        copied = position.copy()
+        copied["a1"] = "empty"
+
+        self.assertEqual(position["a1"], "BQ")
+        self.assertEqual(copied["a1"], "empty")
+        self.assertEqual(copied.occupied, 0)
+
+        self.assertEqual(len(position), 64)
+        self.assertEqual(list(position)[:2], ["a1", "b1"])
+
+        with self.assertRaises(KeyError):
+            position["a9"]
+
+    def test_attackers_to(self) -> None:
+        """Test attackers_to finds every kind of attacker and respects blockers"""
+
+        board = base()
+
+        board["e4"] = "WK"
+        board["d5"] = "BP"
+        board["f6"] = "BH"
+        board["e8"] = "BR"
+        board["a8"] = "BB"
+        board["e6"] = "WP"
+
+        position = Position.from_grid(board)
+
+        attackers = position.attackers_to(SQUARE_INDEX["e4"], BLACK)
+        attacking_cells = {
+            cell
+            for cell in ("d5", "f6", "e8", "a8")
+            if attackers >> SQUARE_INDEX[cell] & 1
+        }
+
+        # Rook on e8 is blocked by the pawn on e6, bishop on a8 is blocked by the pawn on d5
+        self.assertEqual(attacking_cells, {"d5", "f6"})
+        self.assertTrue(position.in_check(WHITE))
+        self.assertFalse(position.in_check(BLACK))
+
+        self.assertEqual(list(iter_squares(0b1010)), [1, 3])
+
+    def test_pieces_run_on_position(self) -> None:
+        """Test the piece classes and ChessLogic give the same answers on a Position"""
+
+        board = base()
+
+        board["e1"] = "WK"
+        board["e7"] = "BR"
+        board["f7"] = "BR"
+        board["d7"] = "BR"
+        board["a2"] = "WP"
+
+        position = Position.from_grid(board)
+
+        self.assertEqual(
+            Rook("black", board).validate_move("e7", "e1"),
+            Rook("black", position).validate_move("e7", "e1"),
+        )
+        self.assertEqual(
+            Pawn("white", board).validate_move("a2", "a4"),
+            Pawn("white", position).validate_move("a2", "a4"),
+        )
+
+        state = GameState()
+
+        self.assertTrue(King.is_king_in_check(position, "white", "WK", True, state))
+        self.assertEqual(state.check_position, "e7")
+
+        self.assertFalse(King.is_king_in_check(position, "black", "BK"))
+        self.assertTrue(ChessLogic().is_checkmate("e7", position, "WK"))
+
+        position["e1"] = "empty"
+        position["h1"] = "WK"
+
+        self.assertEqual(
+            ChessLogic().handle_move("h1", "g1", "WK", position)["move_valid"],
+            ChessLogic().handle_move("h1", "g1", "WK", position.to_grid())["move_valid"],
+        )
+
+    def test_make_unmake_restores_exactly(self) -> None:
+        """Test unmake_move restores castling rights, en passant and captured pieces"""
+
+        fens = [
+            START_FEN,
+            "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+            "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 b kq - 0 1",
+            "4k3/8/8/8/3pP3/8/8/4K3 b - e3 0 1",
+        ]
+
+        for fen in fens:
+            position = Position.from_fen(fen)
+            before = snapshot(position)
+
+            for move in generate_pseudo_legal_moves(position):
+                position.make_move(move)
+
+                self.assertNotEqual(snapshot(position), before)
+
+                self.assertEqual(position.unmake_move(), move)
+                self.assertEqual(snapshot(position), before)
+
+    def test_null_move(self) -> None:
+        """Test a null move passes the turn with the right key and takes back exactly"""
+
+        position = Position.from_fen("4k3/8/8/8/3pP3/8/8/4K3 b - e3 0 1")
+        before = snapshot(position)
+
+        position.make_null_move()
+
+        self.assertEqual(position.turn, WHITE)
+        self.assertIsNone(position.ep_square)
+        self.assertEqual(position.key, position.compute_key())
+
+        position.unmake_null_move()
+        self.assertEqual(snapshot(position), before)
+
+    def test_make_move_updates_state(self) -> None:
+        """Test make_move keeps the castling rights and en passant square up to date"""
+
+        position = Position.from_fen("r3k2r/8/8/8/8/8/4P3/R3K2R w KQkq - 0 1")
+
+        moves = {
+            (move & 63, move >> 6 & 63): move
+            for move in generate_pseudo_legal_moves(position)
+        }
+
+        position.make_move(moves[SQUARE_INDEX["e2"], SQUARE_INDEX["e4"]])
+
+        self.assertEqual(position.ep_square, SQUARE_INDEX["e3"])
+        self.assertEqual(position.turn, BLACK)
+
+        position.unmake_move()
+        position.make_move(moves[SQUARE_INDEX["e1"], SQUARE_INDEX["g1"]])
+
+        self.assertEqual(position["f1"], "WR")
+        self.assertEqual(position["h1"], "empty")
+        self.assertEqual(position.castling, 0b1100)
+
+    def test_check_info(self) -> None:
+        """Test checkers, pinned pieces and the evasion mask of a king"""
+
+        def cells(bitboard: int) -> set:
+            return {SQUARES[square] for square in iter_squares(bitboard)}
+
+        # The rook on e2 is pinned by the queen, the bishop on b4 checks
+        position = Position.from_fen("4k3/8/8/8/1b2q3/8/4R3/4K3 w - - 0 1")
+        checkers, pinned, evasion = position.check_info(WHITE)
+
+        self.assertEqual(cells(checkers), {"b4"})
+        self.assertEqual(cells(pinned), {"e2"})
+        self.assertEqual(cells(evasion), {"b4", "c3", "d2"})
+
+        # Cached until the position changes
+        self.assertIs(position.check_info(WHITE), position.check_info(WHITE))
+
+        position["b4"] = "empty"
+        checkers, pinned, evasion = position.check_info(WHITE)
+
+        self.assertEqual(checkers, 0)
+        self.assertEqual(evasion, FULL_BOARD)
+
+        # Double check leaves only king moves
+        position = Position.from_fen("4k3/8/8/8/1b6/8/3N4/4K2r w - - 0 1")
+        position["d2"] = "empty"
+        position["f3"] = "BH"
+
+        self.assertEqual(cells(position.check_info(WHITE)[0]), {"b4", "f3", "h1"})
+        self.assertEqual(position.check_info(WHITE)[2], 0)
+
+    def test_is_legal_matches_move_generator(self) -> None:
+        """Test is_legal accepts exactly the legal pseudo-legal moves"""
+
+        fens = [
+            START_FEN,
+            "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+            "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+            "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+            "4k3/8/8/8/1b2q3/8/4R3/4K3 w - - 0 1",
+            # En passant would leave the king open along the rank
+            "8/8/8/K2pP2r/8/8/8/7k w - d6 0 1",
+            "8/8/8/8/k2Pp2Q/8/8/3K4 b - d3 0 1",
+        ]
+
+        for fen in fens:
+            position = Position.from_fen(fen)
+            legal = set(generate_legal_moves(position))
+
+            for move in generate_pseudo_legal_moves(position):
+                self.assertEqual(
+                    position.is_legal(move & 63, move >> 6 & 63),
+                    move in legal,
+                    f"{fen} {SQUARES[move & 63]}{SQUARES[move >> 6 & 63]}",
+                )
@@ -0,0 +1,60 @@
+from django.test import TestCase
+from core.chess_classes.chess_bitboard import Position
+from core.chess_classes.chess_encoding import HEADER, decode, decode_position, encode
+from core.chess_classes.chess_fen import BLANK_FEN, parse_fen
+from .test_chess_fen import FENS
+
+
+class EncodingTests(TestCase):
+
+    def test_round_trip(self) -> None:
+        """Test decode gives back the grid and state of the encoded position"""
+
+        for fen in FENS:
+            grid, state = parse_fen(fen)
+            data = encode(grid, state)
+
+            self.assertEqual(decode(data), (grid, state))
+            self.assertEqual(decode_position(data).to_fen(), fen)
+
+            # A Position encodes to the same bytes
+            self.assertEqual(encode(Position.from_fen(fen)), data)
+
+    def test_check_fields(self) -> None:
+        """Test the checked king and the checking piece survive the round trip"""
+
+        grid, state = parse_fen("4k3/8/8/8/8/8/8/4K2r w - - 3 30")
+        state.checked_king = "WK"
+        state.check_position = "h1"
+
+        self.assertEqual(decode(encode(grid, state))[1], state)
+
+    def test_size(self) -> None:
+        """Test the encoding takes the header and half a byte per piece"""
+
+        grid, state = parse_fen(FENS[0])
+
+        self.assertEqual(len(encode(grid, state)), HEADER.size + 16)
+        self.assertEqual(len(encode(*parse_fen(BLANK_FEN))), HEADER.size)
+        self.assertEqual(len(encode(*parse_fen(FENS[-1]))), HEADER.size + 5)
+
+    def test_invalid_data(self) -> None:
+        """Test truncated bytes raise a ValueError"""
+
+        data = encode(*parse_fen(FENS[0]))
+
+        for broken in (data[:5], data[:-1], data + b"\x00"):
+            with self.assertRaises(ValueError):
+                decode(broken)
+
+        # Piece code 15 doesn't exist
+        with self.assertRaises(ValueError):
+            decode(data[:-1] + b"\xff")
+
+    def test_halfmove_clock_is_capped(self) -> None:
+        """Test a halfmove clock over a byte doesn't overflow the header"""
+
+        grid, state = parse_fen(FENS[0])
+        state.halfmove_clock = 300
+
+        self.assertEqual(decode(encode(grid, state))[1].halfmove_clock, 255)
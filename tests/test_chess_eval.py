@@ -0,0 +1,86 @@
+from django.test import TestCase
+from core.chess_classes.chess_bitboard import Position, START_FEN
+from core.chess_classes.chess_eval import (
+    PIECE_VALUES,
+    evaluate,
+    evaluate_from_scratch,
+)
+from core.chess_classes.chess_movegen import generate_legal_moves
+from core.chess_classes.chess_pieces import Pawn, Horse, Bishop, Rook, Queen, King
+
+KIWIPETE = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+PROMOTIONS = "n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1"
+
+
+def mirror(fen: str) -> str:
+    """The same position with the colors swapped and the board turned over"""
+
+    placement, turn, castling, ep_square, *clocks = fen.split()
+
+    return " ".join(
+        (
+            "/".join(reversed(placement.swapcase().split("/"))),
+            "b" if turn == "w" else "w",
+            "".join(sorted(castling.swapcase())) if castling != "-" else "-",
+            ep_square if ep_square == "-" else ep_square[0] + str(9 - int(ep_square[1])),
+            *clocks,
+        )
+    )
+
+
+class EvaluationTests(TestCase):
+
+    def test_piece_values(self) -> None:
+        """Test the material is Piece.weight in centipawns"""
+
+        weights = tuple(
+            piece("white", {}).weight * 100
+            for piece in (Pawn, Horse, Bishop, Rook, Queen, King)
+        )
+
+        self.assertEqual(PIECE_VALUES, weights)
+
+    def test_incremental_score(self) -> None:
+        """Test the score kept by make_move and unmake_move matches a full count"""
+
+        for fen in (START_FEN, KIWIPETE, PROMOTIONS):
+            position = Position.from_fen(fen)
+            score = position.score
+
+            for move in generate_legal_moves(position):
+                position.make_move(move)
+                self.assertEqual(evaluate(position), evaluate_from_scratch(position))
+
+                for reply in generate_legal_moves(position):
+                    position.make_move(reply)
+                    self.assertEqual(
+                        evaluate(position), evaluate_from_scratch(position)
+                    )
+                    position.unmake_move()
+
+                position.make_null_move()
+                self.assertEqual(evaluate(position), evaluate_from_scratch(position))
+                position.unmake_null_move()
+
+                position.unmake_move()
+
+            self.assertEqual(position.score, score)
+            self.assertEqual(position.copy().score, score)
+
+    def test_symmetry(self) -> None:
+        """Test both colors score the mirrored position the same"""
+
+        for fen in (START_FEN, KIWIPETE, PROMOTIONS):
+            self.assertEqual(
+                evaluate(Position.from_fen(fen)),
+                evaluate(Position.from_fen(mirror(fen))),
+            )
+
+    def test_piece_squares(self) -> None:
+        """Test a piece in the center is worth more than on the rim"""
+
+        rim = Position.from_fen("4k3/8/8/8/8/8/8/N3K3 w - - 0 1")
+        center = Position.from_fen("4k3/8/8/8/3N4/8/8/4K3 w - - 0 1")
+
+        self.assertGreater(evaluate(center), evaluate(rim))
+        self.assertGreater(evaluate(rim), 0)
@@ -0,0 +1,56 @@
+from django.test import TestCase
+from core.base_board import base
+from core.chess_classes.chess_bitboard import Position, BLACK
+from core.chess_classes.chess_fen import (
+    BLANK_FEN,
+    START_FEN,
+    fen_to_grid,
+    grid_to_placement,
+    parse_fen,
+    to_fen,
+)
+from core.chess_classes.chess_state import GameState
+
+FENS = [
+    START_FEN,
+    BLANK_FEN,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "rnbqkbnr/pp1ppppp/8/2p5/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq c6 1 2",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 23 41",
+]
+
+
+class FenTests(TestCase):
+
+    def test_round_trip(self) -> None:
+        """Test parse_fen and to_fen give back the same FEN"""
+
+        for fen in FENS:
+            grid, state = parse_fen(fen)
+
+            self.assertEqual(len(grid), 64)
+            self.assertEqual(to_fen(grid, state), fen)
+
+            # And agree with the bitboard position
+            self.assertEqual(Position.from_fen(fen).to_fen(), fen)
+            self.assertEqual(Position.from_fen(fen).to_grid(), grid)
+
+    def test_parse_fen(self) -> None:
+        """Test every FEN field ends up in the grid or the state"""
+
+        grid, state = parse_fen(FENS[3])
+
+        self.assertEqual(grid["c5"], "BP")
+        self.assertEqual(grid["f3"], "WH")
+        self.assertEqual(grid["g1"], "empty")
+        self.assertEqual(
+            state, GameState(BLACK, 0b1111, "c6", halfmove_clock=1, fullmove_number=2)
+        )
+
+        self.assertEqual(fen_to_grid(BLANK_FEN), base())
+        self.assertEqual(grid_to_placement(base()), "8/8/8/8/8/8/8/8")
+
+    def test_invalid_fen(self) -> None:
+        for fen in ["8/8/8 w - - 0 1", "9/8/8/8/8/8/8/8 w - - 0 1", "8/8/8/8/8/8/8/8 w"]:
+            with self.assertRaises((ValueError, KeyError)):
+                parse_fen(fen)
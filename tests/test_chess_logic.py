@@ -1,7 +1,10 @@
 from django.test import TestCase
 from core.base_board import base
+from core.chess_classes.chess_bitboard import Position
+from core.chess_classes.chess_fen import parse_fen
 from core.chess_classes.chess_logic import ChessLogic
-from core.chess_classes.chess_pieces import Pawn, Rook, King
+from core.chess_classes.chess_pieces import Pawn, Rook, King, Bishop
+from core.chess_classes.chess_state import GameState
 
 
 class ChessLogicTests(TestCase):
@@ -55,6 +58,27 @@ class ChessLogicTests(TestCase):
 
             self.assertTrue(move['check'])
 
+    def test_handle_check_with_pin(self) -> None:
+        """Test a pinned piece can't take the checking piece"""
+
+        board = base()
+
+        board['e1'] = 'WK'
+        board['e2'] = 'WB'
+        board['e5'] = 'BQ'
+        board['d3'] = 'BH'
+        board['c2'] = 'WP'
+
+        state = GameState()
+
+        # The bishop could take the horse, but the queen pins it to the king
+        self.assertIsNotNone(self.chess_logic.handle_check('e2', 'd3', Bishop('white', board, state)))
+        self.assertEqual(state.checked_king, 'WK')
+        self.assertEqual(state.check_position, 'd3')
+
+        self.assertIsNone(self.chess_logic.handle_check('c2', 'd3', Pawn('white', board, state)))
+        self.assertEqual(state.checked_king, '')
+
     def test_is_checkmate(self) -> None:
         """Test ChessLogic's is_checkmate method"""
 
@@ -81,6 +105,98 @@ class ChessLogicTests(TestCase):
         self.assertFalse(self.chess_logic.is_checkmate('f7', board, 'WK'))
         self.assertFalse(self.chess_logic.is_checkmate('f7', board, 'BK'))
 
+        # Double check, blocking one of the checks isn't enough
+        board = base()
+
+        board['e8'] = 'BK'
+        board['d8'] = 'BQ'
+        board['f8'] = 'BB'
+        board['f7'] = 'BP'
+        board['e1'] = 'WR'
+        board['b5'] = 'WB'
+
+        self.assertTrue(self.chess_logic.is_checkmate('b5', board, 'BK'))
+
+        board['f7'] = 'empty'
+
+        self.assertFalse(self.chess_logic.is_checkmate('b5', board, 'BK'))
+
+    def test_en_passant_escapes_mate(self) -> None:
+        """Test capturing the checking pawn en passant isn't reported as mate"""
+
+        fen = '8/8/R7/4k3/2B1p3/8/3PN3/5R1K w - - 0 1'
+
+        for board in (parse_fen(fen)[0], Position.from_fen(fen)):
+            state = parse_fen(fen)[1]
+            move = self.chess_logic.handle_move('d2', 'd4', 'WP', board, state)
+
+            self.assertTrue(move['move_valid'])
+            self.assertTrue(move['check'])
+            self.assertFalse(move['checkmate'])
+            self.assertEqual(board['d2'], 'WP')
+
+        # The same position is mate once the en passant cell is gone
+        after = '8/8/R7/4k3/2BPp3/8/4N3/5R1K b - {} 0 1'
+
+        self.assertFalse(
+            self.chess_logic.is_checkmate('d4', Position.from_fen(after.format('d3')), 'BK')
+        )
+        self.assertTrue(
+            self.chess_logic.is_checkmate('d4', Position.from_fen(after.format('-')), 'BK')
+        )
+
+    def test_castle_onto_the_rook(self) -> None:
+        """Test the king dropped on its rook's cell is probed as the castle it plays"""
+
+        mate = '5k2/3Q2pp/8/8/8/1B6/8/4K2R w K - 0 1'
+        check = '3k4/8/8/8/8/8/8/R3K3 w Q - 0 1'
+
+        for fen, target, checkmate in (
+            (mate, 'h1', True),
+            (mate, 'g1', True),
+            (check, 'a1', False),
+            (check, 'c1', False),
+        ):
+            for board in (parse_fen(fen)[0], Position.from_fen(fen)):
+                state = parse_fen(fen)[1]
+                move = self.chess_logic.handle_move('e1', target, 'WK', board, state)
+
+                self.assertTrue(move['move_valid'])
+                self.assertTrue(move['check'])
+                self.assertEqual(move['checkmate'], checkmate)
+                self.assertEqual(board['e1'], 'WK')
+                self.assertEqual(board[target], 'empty' if target in ('g1', 'c1') else 'WR')
+
+    def test_en_passant_breaks_stalemate(self) -> None:
+        """Test a side whose only move is an en passant capture isn't stalemated"""
+
+        fen = '7k/5K2/5N2/8/4p3/4P3/3P4/8 w - - 0 1'
+
+        for board in (parse_fen(fen)[0], Position.from_fen(fen)):
+            state = parse_fen(fen)[1]
+            move = self.chess_logic.handle_move('d2', 'd4', 'WP', board, state)
+
+            self.assertTrue(move['move_valid'])
+            self.assertFalse(move['stalemate'])
+            self.assertFalse(move['checkmate'])
+
+    def test_handle_move_leaves_board_untouched(self) -> None:
+        """Test handle_move probes the board in place and puts it back"""
+
+        board = base()
+
+        board['e1'] = 'WK'
+        board['e8'] = 'BK'
+        board['a7'] = 'WR'
+        board['h2'] = 'BQ'
+
+        before = board.copy()
+
+        self.chess_logic.handle_move('a7', 'a8', 'WR', board)
+        self.chess_logic.handle_move('h2', 'e2', 'BQ', board)
+
+        self.assertEqual(board, before)
+
     def test_handle_promotion_choice(self) -> None:
         """Test ChessLogic's handle_promotion_choice method"""
 
@@ -105,13 +221,53 @@ class ChessLogicTests(TestCase):
 
         self.assertEqual(type(self.chess_logic.handle_promotion_choice(board)), str)
 
+        # Choosing the piece for the pawn on its cell is valid, anything else isn't
+        board['f8'] = 'empty'
+
+        self.assertTrue(self.chess_logic.handle_move('d7', 'd8', 'WQ', board)['move_valid'])
+        self.assertFalse(self.chess_logic.handle_move('d7', 'd8', 'WK', board)['move_valid'])
+        self.assertFalse(self.chess_logic.handle_move('d7', 'd8', 'BQ', board)['move_valid'])
+        self.assertFalse(self.chess_logic.handle_move('e2', 'e4', 'WP', board)['move_valid'])
+
+    def test_under_promotion(self) -> None:
+        """Test a pawn reaching the last rank is validated as a pawn, whatever it becomes"""
+
+        board, state = parse_fen('3r4/4P1q1/3k4/8/8/8/8/1K6 w - - 0 1')
+
+        for target, promoted_to in (('e8', 'WH'), ('e8', 'WB'), ('d8', 'WR')):
+            move = self.chess_logic.handle_move(
+                'e7', target, 'WP', board, state, promoted_to
+            )
+
+            self.assertTrue(move['move_valid'])
+
+        self.assertFalse(
+            self.chess_logic.handle_move('e7', 'f8', 'WP', board, state, 'WR')['move_valid']
+        )
+
+        # The knight checks the king and forks the queen
+        move = self.chess_logic.handle_move('e7', 'e8', 'WP', board, state, 'WH')
+
+        self.assertTrue(move['check'])
+        self.assertFalse(move['checkmate'])
+
+        board['e8'] = 'BR'
+
+        move = self.chess_logic.handle_move('e7', 'e8', 'WP', board, state, 'WR')
+        self.assertFalse(move['move_valid'])
+
+        board['e8'] = 'empty'
+
+        for promoted_to in ('WK', 'BQ', 'WP'):
+            move = self.chess_logic.handle_move(
+                'e7', 'e8', 'WP', board, state, promoted_to
+            )
+
+            self.assertFalse(move['move_valid'])
+
     def test_handle_move(self) -> None:
         """Test ChessLogic's handle_move method"""
 
-        King.last_checked_king = ''
-        King.last_moved_piece = ''
-        King.enemy_check_position = ''
-
         board = base()
 
         invalid_moves = {
@@ -135,9 +291,26 @@ class ChessLogicTests(TestCase):
 
             board = base()
 
-            King.last_checked_king = ''
-            King.last_moved_piece = ''
-            King.enemy_check_position = ''
-
         self.assertEqual(self.chess_logic.handle_move('e2', 'e4', 'WP', board)['move_valid'], True)
-  
\ No newline at end of file
+  
+
+    def test_handle_move_reports_stalemate(self) -> None:
+        """Test handle_move reports a move that leaves the enemy without moves"""
+
+        board = base()
+
+        board['h8'] = 'BK'
+        board['g6'] = 'WK'
+        board['e7'] = 'WQ'
+
+        move = self.chess_logic.handle_move('e7', 'f7', 'WQ', board)
+
+        self.assertTrue(move['move_valid'])
+        self.assertTrue(move['stalemate'])
+        self.assertFalse(move['checkmate'])
+
+        move = self.chess_logic.handle_move('e7', 'e8', 'WQ', board)
+
+        self.assertTrue(move['move_valid'])
+        self.assertFalse(move['stalemate'])
+        self.assertTrue(move['checkmate'])
@@ -0,0 +1,197 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from core.chess_classes.chess_bitboard import (
+    Position,
+    START_FEN,
+    SQUARES,
+    SQUARE_INDEX,
+    EN_PASSANT,
+)
+from core.chess_classes.chess_movegen import (
+    generate_captures,
+    generate_legal_moves,
+    generate_pseudo_legal_moves,
+    has_legal_move,
+    legal_targets,
+    move_to_uci,
+    perft,
+    run_perft,
+)
+
+# Standard perft positions with their published node counts
+PERFT_SUITE = {
+    "start": (START_FEN, [20, 400, 8902]),
+    "kiwipete": (
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        [48, 2039],
+    ),
+    "position_3": ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812]),
+    "position_4": (
+        "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+        [6, 264, 9467],
+    ),
+    "position_5": (
+        "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+        [44, 1486],
+    ),
+    "position_6": (
+        "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+        [46, 2079],
+    ),
+}
+
+
+class MoveGeneratorTests(TestCase):
+
+    def test_perft_suite(self) -> None:
+        """Test perft against the published node counts"""
+
+        for fen, counts in PERFT_SUITE.values():
+            position = Position.from_fen(fen)
+
+            for depth, nodes in enumerate(counts, start=1):
+                self.assertEqual(perft(position, depth), nodes, f"{fen} at depth {depth}")
+
+    def test_hashed_perft(self) -> None:
+        """Test perft with a transposition cache gives the same node counts"""
+
+        for fen, counts in PERFT_SUITE.values():
+            position = Position.from_fen(fen)
+            cache = {}
+
+            for depth, nodes in enumerate(counts, start=1):
+                self.assertEqual(
+                    perft(position, depth, cache), nodes, f"{fen} at depth {depth}"
+                )
+
+        self.assertTrue(cache)
+
+    def test_has_legal_move(self) -> None:
+        """Test has_legal_move agrees with the full legal move generator"""
+
+        def walk(position: Position, depth: int) -> None:
+            moves = generate_legal_moves(position)
+
+            self.assertEqual(has_legal_move(position), bool(moves))
+
+            if depth == 0:
+                return None
+
+            for move in moves:
+                position.make_move(move)
+                walk(position, depth - 1)
+                position.unmake_move()
+
+        for fen, _ in PERFT_SUITE.values():
+            walk(Position.from_fen(fen), 1)
+
+        no_moves = [
+            # Stalemate
+            "7k/5Q2/6K1/8/8/8/8/8 b - - 0 1",
+            "k7/P7/K7/8/8/8/8/8 b - - 0 1",
+            # Checkmate and double check checkmate
+            "R5k1/5ppp/8/8/8/8/8/6K1 b - - 0 1",
+            "3qkb2/5p2/8/1B6/8/8/8/K3R3 b - - 0 1",
+        ]
+
+        for fen in no_moves:
+            position = Position.from_fen(fen)
+
+            self.assertFalse(has_legal_move(position), fen)
+            self.assertEqual(generate_legal_moves(position), [], fen)
+
+        # Only en passant saves the king
+        position = Position.from_fen("8/8/8/2k5/3Pp3/8/8/2K2Q2 b - d3 0 1")
+        self.assertEqual(has_legal_move(position), bool(generate_legal_moves(position)))
+
+    def test_special_moves(self) -> None:
+        """Test castling, en passant and promotion are generated"""
+
+        castling = Position.from_fen("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+        moves = {move_to_uci(move) for move in generate_legal_moves(castling)}
+
+        self.assertIn("e1g1", moves)
+        self.assertIn("e1c1", moves)
+
+        # The rook on f8 attacks f1, so short castle is illegal
+        castling = Position.from_fen("r3kr2/8/8/8/8/8/8/R3K2R w KQq - 0 1")
+        moves = {move_to_uci(move) for move in generate_legal_moves(castling)}
+
+        self.assertNotIn("e1g1", moves)
+        self.assertIn("e1c1", moves)
+
+        en_passant = Position.from_fen("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1")
+        moves = {move_to_uci(move) for move in generate_legal_moves(en_passant)}
+
+        self.assertIn("e5d6", moves)
+
+        promotion = Position.from_fen("4k3/P7/8/8/8/8/8/4K3 w - - 0 1")
+        moves = {move_to_uci(move) for move in generate_legal_moves(promotion)}
+
+        self.assertTrue({"a7a8q", "a7a8r", "a7a8b", "a7a8n"} <= moves)
+        self.assertNotIn("a7a8", moves)
+
+    def test_captures(self) -> None:
+        """Test the captures are the pseudo-legal moves that take or promote"""
+
+        for fen, _ in PERFT_SUITE.values():
+            position = Position.from_fen(fen)
+
+            # Both sides, from the position and after each of its moves
+            for move in [None] + generate_legal_moves(position):
+                if move is not None:
+                    position.make_move(move)
+
+                expected = {
+                    move
+                    for move in generate_pseudo_legal_moves(position)
+                    if position.squares[move >> 6 & 63] is not None
+                    or move >> 12 & 7
+                    or move >> 15 == EN_PASSANT
+                }
+
+                self.assertEqual(set(generate_captures(position)), expected, fen)
+
+                if move is not None:
+                    position.unmake_move()
+
+    def test_legal_targets(self) -> None:
+        """Test the targets of a single piece, for either side"""
+
+        def targets(fen: str, cell: str) -> list:
+            position = Position.from_fen(fen)
+            squares = legal_targets(position, SQUARE_INDEX[cell])
+
+            return [SQUARES[square] for square in squares]
+
+        self.assertEqual(targets(START_FEN, "e2"), ["e3", "e4"])
+        self.assertEqual(targets(START_FEN, "g8"), ["f6", "h6"])
+        self.assertEqual(targets(START_FEN, "e4"), [])
+
+        # The bishop is pinned to the king by the rook
+        self.assertEqual(targets("4r1k1/8/8/8/8/8/4B3/4K3 w - - 0 1", "e2"), [])
+
+        # Castling targets both the king's cell and the rook's
+        castling = "r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1"
+        self.assertTrue({"a1", "c1", "g1", "h1"} <= set(targets(castling, "e1")))
+
+        # Only the side to move can capture en passant
+        en_passant = "4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1"
+        self.assertEqual(targets(en_passant, "e5"), ["d6", "e6"])
+        self.assertEqual(targets(en_passant, "d5"), ["d4"])
+
+    def test_run_perft_reports_throughput(self) -> None:
+        """Test run_perft and the perft command report nodes per second"""
+
+        report = run_perft(Position.from_fen(START_FEN), 2)
+
+        self.assertEqual(report["nodes"], 400)
+        self.assertGreater(report["nps"], 0)
+
+        out = StringIO()
+        call_command("perft", "2", stdout=out)
+
+        self.assertIn("depth 2: 400 nodes", out.getvalue())
+        self.assertIn("nps", out.getvalue())
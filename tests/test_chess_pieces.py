@@ -1,9 +1,7 @@
 from django.test import TestCase
 from core.base_board import base
-from core.chess_classes.chess_utils import (
-    update_king_move_count,
-    update_rook_move_count,
-)
+from core.chess_classes.chess_bitboard import Position
+from core.chess_classes.chess_state import GameState
 from core.chess_classes.chess_pieces import (
     Piece,
     Rook,
@@ -105,32 +103,23 @@ class PawnClass(TestCase):
             "black_capture_twice_moved_pawn": [("d4", "c3"), ("WP", "c3", "c4")],
         }
 
-        white_pawn = Pawn("white", base())
-        black_pawn = Pawn("black", base())
-
         for key, value in valid_moves.items():
-            if key.startswith("white"):
+            state = GameState()
+            state.record_move(*value[1])
 
-                Pawn.last_moved_piece = value[1]
-
-                self.assertTrue(white_pawn.en_passant(*value[0]))
-                self.assertTrue(Pawn.is_en_passant)
+            if key.startswith("white"):
+                self.assertTrue(Pawn("white", base(), state).en_passant(*value[0]))
             else:
-
-                Pawn.last_moved_piece = value[1]
-
-                self.assertTrue(black_pawn.en_passant(*value[0]))
-                self.assertTrue(Pawn.is_en_passant)
+                self.assertTrue(Pawn("black", base(), state).en_passant(*value[0]))
 
         for key, value in invalid_moves.items():
-            if key.startswith("white"):
+            state = GameState()
+            state.record_move(*value[1])
 
-                Pawn.last_moved_piece = value[1]
-                self.assertFalse(white_pawn.en_passant(*value[0]))
+            if key.startswith("white"):
+                self.assertFalse(Pawn("white", base(), state).en_passant(*value[0]))
             else:
-
-                Pawn.last_moved_piece = value[1]
-                self.assertFalse(black_pawn.en_passant(*value[0]))
+                self.assertFalse(Pawn("black", base(), state).en_passant(*value[0]))
 
     def test_pawn_validate_move_forward(self) -> None:
         """Test if Pawn's validate_move_forward works"""
@@ -303,36 +292,66 @@ class KingTests(TestCase):
         board["e8"] = "BK"
         board["h5"] = "WQ"
 
-        King.last_checked_king = "BK"
+        state = GameState(checked_king="BK")
 
-        self.assertTrue(King.is_king_in_check(board, "white", "WK"))
+        self.assertTrue(King.is_king_in_check(board, "white", "WK", state=state))
 
-        King.last_checked_king = ""
+        state.clear_check()
 
-        self.assertFalse(King.is_king_in_check(board, "white", "WK"))
+        self.assertFalse(King.is_king_in_check(board, "white", "WK", state=state))
         self.assertFalse(King.is_king_in_check(board, "white"))
 
         board["f2"] = "BP"
 
-        self.assertTrue(King.is_king_in_check(board, "white", "WK", True))
+        self.assertTrue(King.is_king_in_check(board, "white", "WK", True, state))
+
+        self.assertEqual(state.check_position, "f2")
+        self.assertEqual(state.checked_king, "WK")
+
+        state.clear_check()
 
-        self.assertEqual(King.enemy_check_position, "f2")
-        self.assertEqual(King.last_checked_king, "WK")
+        self.assertTrue(King.is_king_in_check(board, "black", "BK", True, state))
 
-        King.last_checked_king = ""
-        King.enemy_check_position = ""
+        self.assertEqual(state.check_position, "h5")
+        self.assertEqual(state.checked_king, "BK")
 
-        self.assertTrue(King.is_king_in_check(board, "black", "BK", True))
+        # Another game's state is left alone
+        self.assertEqual(GameState().checked_king, "")
 
-        self.assertEqual(King.enemy_check_position, "h5")
-        self.assertEqual(King.last_checked_king, "BK")
+    def test_king_is_stalemate(self) -> None:
+        """Test the King's is_stalemate classmethod"""
+
+        board = base()
+
+        board["h8"] = "BK"
+        board["g6"] = "WK"
+        board["f7"] = "WQ"
+
+        self.assertTrue(King.is_stalemate(board, "BK"))
+        self.assertFalse(King.is_stalemate(board, "WK"))
+
+        # A pawn that can still move breaks the stalemate
+        board["a6"] = "BP"
+        self.assertFalse(King.is_stalemate(board, "BK"))
+
+        # Checkmate isn't stalemate
+        board["a6"] = "empty"
+        board["f7"] = "empty"
+        board["g7"] = "WQ"
+        self.assertFalse(King.is_stalemate(board, "BK"))
+
+        # No king on the board
+        self.assertFalse(King.is_stalemate(base(), "BK"))
+
+        # The pawn's only move is taking en passant
+        after = "7k/5K2/5N2/8/3Pp3/4P3/8/8 b - {} 0 1"
+
+        self.assertFalse(King.is_stalemate(Position.from_fen(after.format("d3")), "BK"))
+        self.assertTrue(King.is_stalemate(Position.from_fen(after.format("-")), "BK"))
 
     def test_king_castle_method(self) -> None:
         """Test the castle method of King's class"""
 
-        King.last_checked_king = ''
-        King.enemy_check_position = ''
-
         initial_board = base()
 
         initial_board["h1"] = "WR"
@@ -392,10 +411,7 @@ class KingTests(TestCase):
         for key, value in invalid_moves.items():
 
             white_king.grid = black_king.grid = initial_board.copy()
-
-            Rook.white_right_move_count = Rook.black_right_move_count = 0
-            Rook.white_left_move_count = Rook.black_left_move_count = 0
-            King.black_move_count = King.white_move_count = 0
+            white_king.state = black_king.state = GameState()
 
             if key.startswith("white"):
 
@@ -405,9 +421,9 @@ class KingTests(TestCase):
                 elif type(value[1]) == str:
 
                     if value[1].startswith("white"):
-                        update_king_move_count("WK")
+                        white_king.state.record_move("WK", "e1", "e2")
                     else:
-                        update_rook_move_count(value[0][1], "WR")
+                        white_king.state.record_move("WR", value[0][1], value[0][1][0] + "5")
 
                 elif type(value[1]) == tuple:
                     white_king.grid[value[1][0]] = value[1][1]
@@ -422,9 +438,9 @@ class KingTests(TestCase):
                 elif type(value[1]) == str:
 
                     if value[1].startswith("black"):
-                        update_king_move_count("BK")
+                        black_king.state.record_move("BK", "e8", "e7")
                     else:
-                        update_rook_move_count(value[0][1], "BR")
+                        black_king.state.record_move("BR", value[0][1], value[0][1][0] + "5")
 
                 elif type(value[1]) == tuple:
                     black_king.grid[value[1][0]] = value[1][1]
@@ -0,0 +1,164 @@
+from django.test import TestCase
+from core.chess_classes.chess_bitboard import (
+    Position,
+    START_FEN,
+    SQUARE_INDEX,
+    encode_move,
+)
+from core.chess_classes.chess_search import (
+    MATE,
+    PIECE_VALUES,
+    evaluate,
+    mvv_lva,
+    parallel_search,
+    search,
+    search_fen,
+)
+
+BACK_RANK = "6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1"
+KIWIPETE = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+TECHNIQUES = ("null_move", "reductions", "killers", "history")
+
+
+class SearchTests(TestCase):
+
+    def test_finds_mate_in_one(self) -> None:
+        """Test the search plays the mate and scores it as one"""
+
+        result = search(Position.from_fen(BACK_RANK), depth=4)
+
+        self.assertEqual(result["uci"], "a1a8")
+        self.assertEqual(result["score"], MATE - 1)
+
+    def test_wins_material(self) -> None:
+        """Test a hanging queen is taken"""
+
+        result = search(Position.from_fen("4k3/8/8/3q4/8/8/8/3RK3 w - - 0 1"), depth=2)
+
+        self.assertEqual(result["uci"], "d1d5")
+
+    def test_position_is_restored(self) -> None:
+        """Test the searched position is left the way it was, even when aborted"""
+
+        for fen in (START_FEN, KIWIPETE):
+            for nodes in (300, 1000, 3000):
+                position = Position.from_fen(fen)
+                key = position.key
+
+                search(position, nodes=nodes)
+
+                self.assertEqual(position.key, key)
+                self.assertEqual(position.to_fen(), fen)
+                self.assertEqual(position.history, [])
+
+    def test_node_budget(self) -> None:
+        """Test the node budget stops the search and a move is still found"""
+
+        result = search(Position.from_fen(START_FEN), nodes=500)
+
+        self.assertLessEqual(result["nodes"], 500)
+        self.assertTrue(result["move"])
+
+    def test_time_budget(self) -> None:
+        """Test the time budget stops the search close to the limit"""
+
+        result = search(Position.from_fen(START_FEN), time_limit=0.2)
+
+        self.assertLess(result["seconds"], 0.4)
+        self.assertGreaterEqual(result["depth"], 1)
+
+    def test_no_moves(self) -> None:
+        """Test a mated side gets no move"""
+
+        result = search_fen("R5k1/5ppp/8/8/8/8/8/6K1 b - - 0 1", depth=3)
+
+        self.assertEqual(result["move"], 0)
+        self.assertIsNone(result["uci"])
+
+    def test_quiescence_sees_the_recapture(self) -> None:
+        """Test a defended pawn isn't taken with the queen at the horizon"""
+
+        fen = "4k3/8/2p5/3p4/8/8/8/3QK3 w - - 0 1"
+        horizon = search(Position.from_fen(fen), depth=1, quiescence=False)
+
+        self.assertEqual(horizon["uci"], "d1d5")
+        self.assertNotEqual(search(Position.from_fen(fen), depth=1)["uci"], "d1d5")
+
+    def test_mvv_lva(self) -> None:
+        """Test the most valuable victim comes first, then the cheapest attacker"""
+
+        position = Position.from_fen("4k3/8/8/1r1q4/2P2N2/8/8/3RK3 w - - 0 1")
+        pawn_takes_rook = encode_move(SQUARE_INDEX["c4"], SQUARE_INDEX["b5"])
+        pawn_takes_queen = encode_move(SQUARE_INDEX["c4"], SQUARE_INDEX["d5"])
+        horse_takes_queen = encode_move(SQUARE_INDEX["f4"], SQUARE_INDEX["d5"])
+        rook_takes_queen = encode_move(SQUARE_INDEX["d1"], SQUARE_INDEX["d5"])
+
+        self.assertGreater(
+            mvv_lva(position, pawn_takes_queen), mvv_lva(position, horse_takes_queen)
+        )
+        self.assertGreater(
+            mvv_lva(position, horse_takes_queen), mvv_lva(position, rook_takes_queen)
+        )
+        self.assertGreater(
+            mvv_lva(position, rook_takes_queen), mvv_lva(position, pawn_takes_rook)
+        )
+        self.assertEqual(PIECE_VALUES, (100, 300, 300, 500, 900, 0))
+
+    def test_techniques_can_be_switched_off(self) -> None:
+        """Test every technique alone still finds the mate, and together they prune"""
+
+        baseline = dict.fromkeys(TECHNIQUES, False)
+
+        for name in TECHNIQUES:
+            options = {**baseline, name: True}
+            result = search(Position.from_fen(BACK_RANK), depth=4, **options)
+
+            self.assertEqual(result["uci"], "a1a8", name)
+
+        start = Position.from_fen(START_FEN)
+
+        self.assertLess(
+            search(start, depth=4)["nodes"],
+            search(start, depth=4, **baseline)["nodes"],
+        )
+
+    def test_no_null_move_in_pawn_endings(self) -> None:
+        """Test null move pruning is left out when only pawns and kings are left"""
+
+        fen = "8/5k2/3p4/1p1Pp2p/pP2Pp1P/P4P1K/8/8 b - - 0 1"
+
+        self.assertEqual(
+            search(Position.from_fen(fen), depth=5)["nodes"],
+            search(Position.from_fen(fen), depth=5, null_move=False)["nodes"],
+        )
+
+    def test_parallel_search(self) -> None:
+        """Test the workers agree on the mate and report their nodes together"""
+
+        position = Position.from_fen(BACK_RANK)
+        single = search(Position.from_fen(BACK_RANK), depth=4)
+        result = parallel_search(position, workers=2, depth=4)
+
+        self.assertEqual(result["uci"], "a1a8")
+        self.assertEqual(result["score"], MATE - 1)
+        self.assertEqual(result["workers"], 2)
+        self.assertGreaterEqual(result["nodes"], single["nodes"])
+        self.assertEqual(position.to_fen(), BACK_RANK)
+
+    def test_parallel_search_budget(self) -> None:
+        """Test the time budget holds for every worker"""
+
+        result = parallel_search(Position.from_fen(START_FEN), 2, time_limit=0.2)
+
+        self.assertLess(result["seconds"], 1)
+        self.assertTrue(result["move"])
+
+    def test_evaluate(self) -> None:
+        """Test the score is given for the side to move, a rook against 3 pawns"""
+
+        white = evaluate(Position.from_fen(BACK_RANK))
+        black = evaluate(Position.from_fen("6k1/5ppp/8/8/8/8/8/R5K1 b - - 0 1"))
+
+        self.assertEqual(evaluate(Position.from_fen(START_FEN)), 0)
+        self.assertGreater(white, 100)
+        self.assertEqual(black, -white)
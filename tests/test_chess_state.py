@@ -0,0 +1,91 @@
+from django.test import TestCase
+from core.base_board import base
+from core.chess_classes.chess_bitboard import WHITE, BLACK
+from core.chess_classes.chess_logic import ChessLogic
+from core.chess_classes.chess_state import GameState
+
+
+class GameStateTests(TestCase):
+
+    def test_record_move(self) -> None:
+        """Test record_move updates side to move, castling rights and en passant"""
+
+        state = GameState()
+
+        state.record_move("WP", "e2", "e4")
+
+        self.assertEqual(state.en_passant, "e3")
+        self.assertEqual(state.side_to_move, BLACK)
+
+        state.record_move("BH", "g8", "f6")
+
+        self.assertEqual(state.en_passant, "")
+        self.assertEqual(state.side_to_move, WHITE)
+
+        state.record_move("WK", "e1", "e2")
+
+        self.assertFalse(state.can_castle("white", short=True))
+        self.assertFalse(state.can_castle("white", short=False))
+
+        # Capturing the rook on its corner takes the right away as well
+        state.record_move("WB", "c4", "h8")
+
+        self.assertFalse(state.can_castle("black", short=True))
+        self.assertTrue(state.can_castle("black", short=False))
+
+    def test_record_move_clocks(self) -> None:
+        """Test record_move counts the move clocks like FEN does"""
+
+        state = GameState()
+
+        state.record_move("WH", "g1", "f3")
+        state.record_move("BH", "g8", "f6")
+
+        self.assertEqual(state.halfmove_clock, 2)
+        self.assertEqual(state.fullmove_number, 2)
+
+        state.record_move("WH", "f3", "e5")
+        state.record_move("BH", "f6", "e4", captured=True)
+
+        self.assertEqual(state.halfmove_clock, 0)
+
+        state.record_move("WP", "d2", "d3")
+
+        self.assertEqual(state.halfmove_clock, 0)
+        self.assertEqual(state.fullmove_number, 3)
+
+    def test_dict_round_trip(self) -> None:
+        """Test the state survives being stored as a dict"""
+
+        state = GameState(BLACK, 0b0101, "d6", "WK", "b4")
+
+        self.assertEqual(GameState.from_dict(state.to_dict()), state)
+        self.assertEqual(GameState.from_dict({}), GameState())
+        self.assertEqual(state.copy(), state)
+
+    def test_games_are_independent(self) -> None:
+        """Test two games validated by one ChessLogic don't share any state"""
+
+        logic = ChessLogic()
+
+        first_game, second_game = GameState(), GameState()
+
+        board = base()
+
+        board["e1"] = "WK"
+        board["e8"] = "BK"
+        board["e5"] = "WP"
+        board["d5"] = "BP"
+
+        # Only in the first game the black pawn has just made a double jump
+        first_game.record_move("BP", "d7", "d5")
+        second_game.record_move("BP", "d6", "d5")
+
+        move = logic.handle_move("e5", "d6", "WP", board, first_game)
+
+        self.assertTrue(move["move_valid"])
+        self.assertTrue(move["en_passant"])
+
+        move = logic.handle_move("e5", "d6", "WP", board, second_game)
+
+        self.assertFalse(move["move_valid"])
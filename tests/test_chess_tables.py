@@ -0,0 +1,74 @@
+from django.test import TestCase
+from core.chess_classes.chess_bitboard import SQUARE_INDEX, SQUARES, iter_squares
+from core.chess_classes.chess_tables import (
+    BETWEEN,
+    LINE,
+    HORSE_ATTACKS,
+    KING_ATTACKS,
+    PAWN_ATTACKS,
+    ROOK_LINES,
+    BISHOP_LINES,
+    rook_attacks,
+    bishop_attacks,
+)
+
+
+def cells(bitboard: int) -> set:
+    return {SQUARES[square] for square in iter_squares(bitboard)}
+
+
+class ChessTablesTests(TestCase):
+
+    def test_step_tables(self) -> None:
+        """Test the horse, king and pawn attack tables"""
+
+        self.assertEqual(cells(HORSE_ATTACKS[SQUARE_INDEX["a1"]]), {"b3", "c2"})
+        self.assertEqual(len(cells(HORSE_ATTACKS[SQUARE_INDEX["d4"]])), 8)
+
+        self.assertEqual(cells(KING_ATTACKS[SQUARE_INDEX["h8"]]), {"g8", "g7", "h7"})
+
+        self.assertEqual(cells(PAWN_ATTACKS[0][SQUARE_INDEX["a2"]]), {"b3"})
+        self.assertEqual(cells(PAWN_ATTACKS[1][SQUARE_INDEX["e7"]]), {"d6", "f6"})
+
+    def test_lines_and_between(self) -> None:
+        """Test the sliding lines and the BETWEEN table"""
+
+        self.assertEqual(len(cells(ROOK_LINES[SQUARE_INDEX["d4"]])), 14)
+        self.assertEqual(len(cells(BISHOP_LINES[SQUARE_INDEX["a1"]])), 7)
+
+        between = {
+            ("a1", "a8"): {"a2", "a3", "a4", "a5", "a6", "a7"},
+            ("h8", "a1"): {"b2", "c3", "d4", "e5", "f6", "g7"},
+            ("e4", "e5"): set(),
+            ("g1", "f3"): set(),  # not on a line
+        }
+
+        for (start, end), value in between.items():
+            self.assertEqual(cells(BETWEEN[SQUARE_INDEX[start]][SQUARE_INDEX[end]]), value)
+            self.assertEqual(cells(BETWEEN[SQUARE_INDEX[end]][SQUARE_INDEX[start]]), value)
+
+        line = {"a1", "b2", "c3", "d4", "e5", "f6", "g7", "h8"}
+
+        self.assertEqual(cells(LINE[SQUARE_INDEX["c3"]][SQUARE_INDEX["e5"]]), line)
+        self.assertEqual(cells(LINE[SQUARE_INDEX["h8"]][SQUARE_INDEX["a1"]]), line)
+        self.assertEqual(len(cells(LINE[SQUARE_INDEX["e1"]][SQUARE_INDEX["e2"]])), 8)
+        self.assertEqual(LINE[SQUARE_INDEX["g1"]][SQUARE_INDEX["f3"]], 0)
+        self.assertEqual(LINE[SQUARE_INDEX["e4"]][SQUARE_INDEX["e4"]], 0)
+
+    def test_sliding_attacks(self) -> None:
+        """Test the sliding attacks stop at the first piece on every ray"""
+
+        occupied = (1 << SQUARE_INDEX["d6"]) | (1 << SQUARE_INDEX["f4"])
+
+        attacks = cells(rook_attacks(SQUARE_INDEX["d4"], occupied))
+
+        self.assertIn("d6", attacks)
+        self.assertNotIn("d7", attacks)
+        self.assertIn("f4", attacks)
+        self.assertNotIn("g4", attacks)
+        self.assertIn("a4", attacks)
+        self.assertIn("d1", attacks)
+
+        attacks = cells(bishop_attacks(SQUARE_INDEX["c1"], 1 << SQUARE_INDEX["e3"]))
+
+        self.assertEqual(attacks, {"b2", "a3", "d2", "e3"})
@@ -0,0 +1,102 @@
+from django.test import TestCase
+from core.chess_classes.chess_bitboard import Position, START_FEN
+from core.chess_classes.chess_transposition import (
+    TranspositionTable,
+    SharedTranspositionTable,
+    EXACT,
+    LOWER_BOUND,
+    UPPER_BOUND,
+)
+
+
+class TranspositionTableTests(TestCase):
+
+    def test_store_and_probe(self) -> None:
+        """Test stored entries come back and unknown keys miss"""
+
+        table = TranspositionTable(1000)
+        key = Position.from_fen(START_FEN).key
+
+        self.assertEqual(len(table), 512)
+        self.assertIsNone(table.probe(key))
+
+        table.store(key, 5, -320, LOWER_BOUND, 0x1234)
+        self.assertEqual(table.probe(key), (0x1234, -320, 5, LOWER_BOUND))
+
+        # Same slot, different key
+        self.assertIsNone(table.probe(key ^ (1 << 40)))
+
+        table.store(key, 6, 15, EXACT)
+        self.assertEqual(table.probe(key), (0, 15, 6, EXACT))
+
+        table.clear()
+        self.assertIsNone(table.probe(key))
+
+    def test_replacement_policy(self) -> None:
+        """Test deeper entries of the current search are kept, stale ones replaced"""
+
+        table = TranspositionTable(16)
+        first, second = 3, 3 | 1 << 50
+
+        table.store(first, 8, 100, EXACT)
+        table.store(second, 2, 50, UPPER_BOUND)
+
+        self.assertIsNotNone(table.probe(first))
+        self.assertIsNone(table.probe(second))
+
+        table.store(second, 8, 50, UPPER_BOUND)
+
+        self.assertIsNone(table.probe(first))
+        self.assertEqual(table.probe(second), (0, 50, 8, UPPER_BOUND))
+
+        # Entries from an older search give way even to shallower ones
+        table.new_search()
+        table.store(first, 1, 7, EXACT)
+
+        self.assertEqual(table.probe(first), (0, 7, 1, EXACT))
+
+    def test_torn_entry_misses(self) -> None:
+        """Test an entry whose words don't belong together reads as a miss"""
+
+        table = TranspositionTable(16)
+        table.store(5, 4, 10, EXACT, 77)
+
+        table.words[5 * 2 + 1] ^= 1 << 20
+
+        self.assertIsNone(table.probe(5))
+
+    def test_hashfull(self) -> None:
+        table = TranspositionTable(16)
+
+        for key in range(8):
+            table.store(key, 1, 0, EXACT)
+
+        self.assertEqual(table.hashfull(), 500)
+
+        table.new_search()
+        self.assertEqual(table.hashfull(), 0)
+
+    def test_shared_table(self) -> None:
+        """Test a table attached by name sees the entries of its owner and back"""
+
+        table = SharedTranspositionTable(1000)
+        other = SharedTranspositionTable(*table.attach_args())
+
+        try:
+            self.assertEqual(len(other), 512)
+
+            table.store(7, 3, -50, UPPER_BOUND, 99)
+            self.assertEqual(other.probe(7), (99, -50, 3, UPPER_BOUND))
+
+            other.store(8, 2, 40, EXACT)
+            self.assertEqual(table.probe(8), (0, 40, 2, EXACT))
+
+            # Torn the same way as a plain table
+            other.words[7 * 2] ^= 1
+            self.assertIsNone(table.probe(7))
+
+            table.clear()
+            self.assertIsNone(other.probe(8))
+        finally:
+            other.close()
+            table.close()
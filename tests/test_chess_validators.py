@@ -0,0 +1,95 @@
+from unittest import mock
+
+from django.test import TestCase
+from core.base_board import base
+from core.chess_classes.chess_bitboard import (
+    Position,
+    START_FEN,
+    SQUARES,
+    CASTLE,
+    EN_PASSANT,
+)
+from core.chess_classes.chess_movegen import generate_pseudo_legal_moves
+from core.chess_classes.chess_pieces import Piece, Rook
+from core.chess_classes.chess_state import GameState
+from core.chess_classes.chess_validators import (
+    VALIDATORS,
+    ATTACKS,
+    is_king_in_check,
+)
+
+
+class ValidatorTests(TestCase):
+
+    def test_validators_accept_generated_moves(self) -> None:
+        """Test every generated move passes the validator of its piece"""
+
+        fens = [
+            START_FEN,
+            "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+            "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 b kq - 0 1",
+        ]
+
+        for fen in fens:
+            position = Position.from_fen(fen)
+            grid = position.to_grid()
+            side = "white" if position.turn == 0 else "black"
+            state = GameState(castling=position.castling)
+
+            for move in generate_pseudo_legal_moves(position):
+                if move >> 15 in (CASTLE, EN_PASSANT):
+                    continue
+
+                current, target = SQUARES[move & 63], SQUARES[move >> 6 & 63]
+                validate = VALIDATORS[grid[current][1]]
+
+                self.assertTrue(validate(grid, side, current, target, state), fen)
+                self.assertTrue(validate(position, side, current, target, state), fen)
+
+    def test_validators_reject_illegal_moves(self) -> None:
+        """Test the validators refuse moves breaking the piece rules"""
+
+        grid = Position.from_fen(START_FEN).to_grid()
+        state = GameState()
+
+        self.assertFalse(VALIDATORS["R"](grid, "white", "a1", "a3", state))
+        self.assertFalse(VALIDATORS["B"](grid, "white", "c1", "e3", state))
+        self.assertFalse(VALIDATORS["H"](grid, "white", "g1", "e2", state))
+        self.assertFalse(VALIDATORS["P"](grid, "white", "e2", "e5", state))
+        self.assertFalse(VALIDATORS["K"](grid, "white", "e1", "g1", state))
+        self.assertFalse(VALIDATORS["Q"](grid, "black", "d8", "z9", state))
+
+        # Pawns attack diagonally only, and only pieces
+        self.assertFalse(ATTACKS["P"](grid, "white", "e2", "d3"))
+
+    def test_check_scan_allocates_no_pieces(self) -> None:
+        """Test is_king_in_check scans the grid without creating piece objects"""
+
+        board = base()
+
+        board["e1"] = "WK"
+        board["e8"] = "BK"
+        board["a5"] = "BQ"
+        board["h4"] = "BB"
+        board["c3"] = "BP"
+
+        with mock.patch.object(Piece, "__init__", side_effect=AssertionError):
+            self.assertTrue(is_king_in_check(board, "white", "WK"))
+
+            board["f2"] = "WP"
+            self.assertFalse(is_king_in_check(board, "white", "WK"))
+
+    def test_piece_wrappers(self) -> None:
+        """Test the piece classes keep working as thin wrappers"""
+
+        board = base()
+        board["a1"] = "WR"
+
+        rook = Rook("white", board)
+
+        self.assertTrue(rook.validate_move("a1", "a8"))
+        self.assertFalse(rook.validate_move("a1", "b2"))
+        self.assertEqual(rook.enemy_side, "black")
+
+        with self.assertRaises(AttributeError):
+            rook.color = "white"
@@ -0,0 +1,117 @@
+from django.test import TestCase
+from core.chess_classes.chess_bitboard import Position, START_FEN
+from core.chess_classes.chess_movegen import generate_legal_moves, move_to_uci
+
+
+def find_move(position: Position, uci: str) -> int:
+    for move in generate_legal_moves(position):
+        if move_to_uci(move) == uci:
+            return move
+
+    raise ValueError(uci)
+
+
+def play(position: Position, *moves: str) -> None:
+    for uci in moves:
+        position.make_move(find_move(position, uci))
+
+
+class ZobristTests(TestCase):
+
+    def walk(self, position: Position, depth: int) -> None:
+        """Checks the incremental key against a full recompute in every node"""
+
+        self.assertEqual(position.key, position.compute_key())
+
+        if depth == 0:
+            return None
+
+        key = position.key
+
+        for move in generate_legal_moves(position):
+            position.make_move(move)
+            self.walk(position, depth - 1)
+            position.unmake_move()
+
+            self.assertEqual(position.key, key)
+
+    def test_incremental_key(self) -> None:
+        """Test make/unmake keep the key equal to a recomputed one"""
+
+        fens = [
+            START_FEN,
+            "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+            "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+        ]
+
+        for fen in fens:
+            self.walk(Position.from_fen(fen), 2)
+
+    def test_key_covers_the_state(self) -> None:
+        """Test side to move, castling rights and en passant change the key"""
+
+        keys = {
+            Position.from_fen(fen).key
+            for fen in [
+                "r3k2r/8/8/8/4p3/8/3P4/R3K2R w KQkq - 0 1",
+                "r3k2r/8/8/8/4p3/8/3P4/R3K2R b KQkq - 0 1",
+                "r3k2r/8/8/8/4p3/8/3P4/R3K2R w Kkq - 0 1",
+                "r3k2r/8/8/8/3Pp3/8/8/R3K2R b KQkq d3 0 1",
+                "r3k2r/8/8/8/3Pp3/8/8/R3K2R b KQkq - 0 1",
+            ]
+        }
+
+        self.assertEqual(len(keys), 5)
+
+    def test_transpositions_share_the_key(self) -> None:
+        """Test different move orders reaching one position give the same key"""
+
+        first = Position.from_fen(START_FEN)
+        play(first, "g1f3", "g8f6", "b1c3", "b8c6")
+
+        second = Position.from_fen(START_FEN)
+        play(second, "b1c3", "b8c6", "g1f3", "g8f6")
+
+        self.assertEqual(first.key, second.key)
+        self.assertEqual(
+            first.key,
+            Position.from_fen(
+                "r1bqkb1r/pppppppp/2n2n2/8/8/2N2N2/PPPPPPPP/R1BQKB1R w KQkq - 4 3"
+            ).key,
+        )
+
+        # The en passant cell only counts when a pawn can capture on it
+        third = Position.from_fen(START_FEN)
+        play(third, "e2e4")
+
+        self.assertEqual(
+            third.key,
+            Position.from_fen(
+                "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"
+            ).key,
+        )
+
+        fourth = Position.from_fen("4k3/8/8/8/3p4/8/4P3/4K3 w - - 0 1")
+        play(fourth, "e2e4")
+        after = "4k3/8/8/8/3pP3/8/8/4K3 b -"
+
+        self.assertEqual(fourth.key, Position.from_fen(after + " e3 0 1").key)
+        self.assertNotEqual(fourth.key, Position.from_fen(after + " - 0 1").key)
+
+    def test_repetitions(self) -> None:
+        """Test repetitions counts earlier occurrences since the last pawn move"""
+
+        position = Position.from_fen(START_FEN)
+        play(position, "e2e4", "e7e5")
+
+        self.assertEqual(position.repetitions(), 0)
+
+        play(position, "g1f3", "g8f6", "f3g1", "f6g8")
+        self.assertEqual(position.repetitions(), 1)
+
+        play(position, "g1f3", "g8f6", "f3g1", "f6g8")
+        self.assertEqual(position.repetitions(), 2)
+
+        # A pawn move makes the earlier positions unreachable
+        play(position, "d2d4")
+        self.assertEqual(position.repetitions(), 0)